@@ -0,0 +1,310 @@
+import json
+import re
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from agents.fast_classifier import fast_classifier, EVAL_FILE, NEGATION_PATTERN
+from services.data_loader import data_store, CAPABILITY_CATEGORIES, CAPABILITY_KEYWORDS, REGION_POPULATIONS
+
+
+# Requests for explanation or judgement go to the LLM, even when the data is countable
+NARRATIVE_PATTERN = re.compile(
+    r"\b(why|explain|describe|summar\w*|tell me about|insight\w*|analy[sz]e|recommend\w*|should|"
+    r"assess|evaluate|impact|what does .* mean)\b"
+)
+COUNT_PATTERN = re.compile(r"\b(how many|number of)\b")
+LIST_PATTERN = re.compile(r"\b(list|show|which|find|what|give me|are there|do any)\b")
+RANK_PATTERN = re.compile(r"\b(top|most|fewest|least|highest|lowest|rank\w*)\b")
+TOP_N_PATTERN = re.compile(r"\btop\s+(\d+)\b")
+REGION_WORD = re.compile(r"\bregions?\b")
+# "not", "without", "outside", "except" ... select the complement of the filters
+NEGATION = re.compile(NEGATION_PATTERN)
+# Thresholds, dates and quantities the filters cannot express ("more than 10 doctors", "after 2000", "beds")
+UNPARSED_PATTERN = re.compile(
+    r"\b(more|less|fewer|greater) than\b|\b(over|under|above|below|at least|at most|larger|bigger|smaller|"
+    r"between|after|before|since|until|established|founded|opened|built|years?|recent\w*|newest|oldest|"
+    r"latest|total|sum|average|mean|median|capacity|beds?|staff\w*|nurses?|employees?|patients?|"
+    r"percent\w*|ratio)\b"
+)
+# Numbers the engine does parse: "top 5" and "per 100k"
+PARSED_NUMBER_PATTERN = re.compile(r"\btop\s+\d+\b|\bper\s+100[\d,]*k?\b")
+
+TYPE_NOUNS = {"hospital": ("hospital", "hospitals"), "clinic": ("clinic", "clinics"),
+              "farmacy": ("pharmacy", "pharmacies"), "dentist": ("dentist", "dentists"),
+              "doctor": ("doctor", "doctors")}
+# Capabilities implied by the facility type itself ("dentists" also matches the Dental keywords)
+IMPLIED_CAPABILITIES = {("dentist", "Dental")}
+# Capitalised words that do not name a facility
+COMMON_NAMES = {"i", "region", "regions", "ghana", "gh"}
+
+LIST_LIMIT = 20
+
+
+class AnswerEngine:
+    """Exact answers for count, list, ranking and two-region comparison queries.
+
+    A classified query is compiled into a boolean mask over per-version
+    facility columns (region, type, capability matrix, specialties) and the
+    answer is rendered from templates with the matching facilities as
+    citations, so no retrieval or generation is needed. Anything the
+    filters do not fully capture returns None and takes the LLM path:
+    explanation or advice, negation or exclusion, thresholds, dates and
+    quantities, superlatives other than region rankings, several types or
+    capabilities, cities rather than regions, count/list queries naming
+    several regions, and filters outside the dataset's vocabulary.
+    """
+
+    def __init__(self):
+        self.version = -1
+        self._regions = np.zeros(0, dtype=object)
+        self._types = np.zeros(0, dtype=object)
+        self._lock = threading.Lock()
+
+    def _columns(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Region and lowercase type columns for the current data version (tools call this from threads)."""
+        with self._lock:
+            if self.version != data_store.version:
+                facilities = data_store.facilities
+                self._regions = np.array([f.normalized_region for f in facilities], dtype=object)
+                self._types = np.array([(f.facility_type or "").lower() for f in facilities], dtype=object)
+                self.version = data_store.version
+            return self._regions, self._types
+
+    def mask(self, region: Optional[str], facility_type: Optional[str],
+              capability: Optional[str], specialty: Optional[str]) -> np.ndarray:
+        """Boolean mask over ``data_store.facilities`` for the given filters (None means any)."""
+        regions, types = self._columns()
+        mask = np.ones(len(regions), dtype=bool)
+        if region:
+            mask &= regions == region
+        if facility_type:
+            mask &= types == facility_type.lower()
+        if capability in CAPABILITY_CATEGORIES:
+            mask &= data_store.capability_matrix[:, CAPABILITY_CATEGORIES.index(capability)]
+        if specialty:
+            needle = specialty.lower()
+            candidates = np.flatnonzero(mask)
+            keep = [i for i in candidates if any(needle in s.lower() for s in data_store.facilities[i].specialties)]
+            mask = np.zeros_like(mask)
+            mask[keep] = True
+        return mask
+
+    def try_answer(self, message: str, classification: dict, context: str = "") -> Optional[dict]:
+        """Answer from the DataStore when the query is a plain count/list/rank/compare.
+
+        ``context`` is the standalone question a follow-up refines ("How many
+        hospitals in Ashanti?" for "And clinics?"): its operation cues apply,
+        while the entities come from the (already merged) classification.
+        Returns ``{"answer", "sources", "visualization_hint", "plan", "elapsed_ms"}``
+        or None when the query needs the LLM.
+        """
+        started = time.perf_counter()
+        text = f"{context} {message}".lower() if context else message.lower()
+        category = classification.get("category", "basic")
+        if category not in ("basic", "comparison") or NARRATIVE_PATTERN.search(text) or NEGATION.search(text):
+            return None
+        if UNPARSED_PATTERN.search(text) or re.search(r"\d", PARSED_NUMBER_PATTERN.sub(" ", text)):
+            return None
+        # LLM filters arrive as free text ("Ashanti Region", "pharmacy"); any value the mask cannot apply declines
+        filters = fast_classifier.canonical_filters(classification.get("filters") or {})
+        if filters is None:
+            return None
+        if (filters.get("facility_type"), filters.get("capability")) in IMPLIED_CAPABILITIES:
+            del filters["capability"]
+        # A named facility or an unrecognised term means the filters do not capture the question
+        if (fast_classifier.unresolved_names(message) | fast_classifier.unresolved_names(context)) - COMMON_NAMES:
+            return None
+        # Several types or capabilities ("surgery or cardiology") and cities ("in Tamale") are not single filters;
+        # the follow-up and the question it refines are checked apart, so "And clinics?" may swap the type
+        for part in (message, context):
+            if len(fast_classifier.facility_types(part)) > 1 or len(fast_classifier.capabilities(part)) > 1 \
+                    or fast_classifier.localities(part):
+                return None
+        # A follow-up's own regions replace those of the question it refines
+        regions = [r for r in fast_classifier.regions(message) or fast_classifier.regions(context)
+                   if r in REGION_POPULATIONS]
+
+        if RANK_PATTERN.search(text) and REGION_WORD.search(text) and len(regions) < 2 \
+                and not filters.get("region"):
+            result = self._rank(text, filters)
+        elif category == "comparison":
+            if len(regions) != 2:
+                return None
+            result = self._compare(regions, filters)
+        elif len(regions) > 1 or RANK_PATTERN.search(text):
+            # Several regions outside a comparison ("in Western or Central") is a disjunction the filters drop,
+            # and a superlative outside a region ranking ("the hospital with the most doctors") is not a filter
+            return None
+        elif COUNT_PATTERN.search(text) and filters:
+            result = self._count(filters)
+        elif LIST_PATTERN.search(text) and filters:
+            result = self._list(filters)
+        else:
+            return None
+        result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return result
+
+    def _describe(self, filters: dict, with_region: bool = True, count: int = 2) -> str:
+        singular, plural = TYPE_NOUNS.get(filters.get("facility_type"), ("facility", "facilities"))
+        phrase = singular if count == 1 else plural
+        if filters.get("capability"):
+            phrase += f" offering {filters['capability'].lower()}"
+        if filters.get("specialty"):
+            phrase += f" with {re.sub(r'(?<!^)(?=[A-Z])', ' ', filters['specialty']).lower()}"
+        if with_region and filters.get("region"):
+            phrase += f" in {filters['region']}"
+        return phrase
+
+    def _count(self, filters: dict) -> dict:
+        mask = self.mask(filters.get("region"), filters.get("facility_type"),
+                          filters.get("capability"), filters.get("specialty"))
+        positions = np.flatnonzero(mask)
+        verb = "is" if len(positions) == 1 else "are"
+        lines = [f"There {verb} **{len(positions)}** {self._describe(filters, count=len(positions))} in the dataset."]
+        if not filters.get("facility_type") and len(positions):
+            types, counts = np.unique(self._columns()[1][positions], return_counts=True)
+            breakdown = ", ".join(f"{t or 'unspecified type'}: {c}" for t, c in
+                                  sorted(zip(types, counts), key=lambda p: -p[1]))
+            lines.append(f"By type: {breakdown}.")
+        if 0 < len(positions) <= 10:
+            lines.append("They are: " + "; ".join(self._label(i) for i in positions) + ".")
+        return {
+            "answer": "\n\n".join(lines),
+            "sources": self._sources(positions, filters),
+            "visualization_hint": None,
+            "plan": {"operation": "count", "filters": filters, "matches": int(len(positions))},
+        }
+
+    def _list(self, filters: dict) -> dict:
+        mask = self.mask(filters.get("region"), filters.get("facility_type"),
+                          filters.get("capability"), filters.get("specialty"))
+        positions = np.flatnonzero(mask)
+        # Most complete records first
+        positions = sorted(positions, key=lambda i: -data_store.facilities[i].data_completeness)
+        if not positions:
+            answer = f"No {self._describe(filters)} were found in the dataset."
+        else:
+            lines = [f"Found **{len(positions)}** {self._describe(filters, count=len(positions))}:"]
+            lines += [f"- {self._label(i)}" for i in positions[:LIST_LIMIT]]
+            if len(positions) > LIST_LIMIT:
+                lines.append(f"...and {len(positions) - LIST_LIMIT} more.")
+            answer = "\n".join(lines)
+        return {
+            "answer": answer,
+            "sources": self._sources(positions, filters),
+            "visualization_hint": "map" if positions else None,
+            "plan": {"operation": "list", "filters": filters, "matches": len(positions), "limit": LIST_LIMIT},
+        }
+
+    def _rank(self, text: str, filters: dict) -> dict:
+        mask = self.mask(None, filters.get("facility_type"), filters.get("capability"), filters.get("specialty"))
+        regions = list(REGION_POPULATIONS)
+        region_column = self._columns()[0]
+        counts = np.array([int(np.count_nonzero(mask & (region_column == r))) for r in regions])
+        ascending = bool(re.search(r"\b(fewest|least|lowest)\b", text))
+        per_capita = "capita" in text or "per 100" in text or "density" in text
+        values = counts / np.array([REGION_POPULATIONS[r] for r in regions]) * 100_000 if per_capita else counts
+        order = np.argsort(values if ascending else -values, kind="stable")
+        top = TOP_N_PATTERN.search(text)
+        n = min(int(top.group(1)), len(regions)) if top else 5
+        measure = "per 100k people" if per_capita else ""
+        noun = self._describe(filters, with_region=False)
+        lines = [f"Regions ranked by {noun}{' ' + measure if measure else ''} "
+                 f"({'lowest' if ascending else 'highest'} first):"]
+        for rank, r in enumerate(order[:n], 1):
+            value = f"{values[r]:.1f}" if per_capita else str(counts[r])
+            lines.append(f"{rank}. {regions[r]}: {value}" + (f" ({counts[r]} total)" if per_capita else ""))
+        return {
+            "answer": "\n".join(lines),
+            "sources": [],
+            "visualization_hint": "chart",
+            "plan": {"operation": "rank_regions", "filters": filters, "per_capita": per_capita,
+                     "ascending": ascending, "top": n},
+        }
+
+    def _compare(self, regions: List[str], filters: dict) -> dict:
+        rows = []
+        for region in regions:
+            mask = self.mask(region, filters.get("facility_type"), filters.get("capability"),
+                              filters.get("specialty"))
+            positions = np.flatnonzero(mask)
+            coverage = data_store.capability_matrix[positions].sum(axis=0) if len(positions) else np.zeros(
+                len(CAPABILITY_CATEGORIES), dtype=int)
+            rows.append((region, positions, coverage))
+
+        noun = self._describe(filters, with_region=False)
+        lines = [f"Comparison of {noun}: {regions[0]} vs {regions[1]}", ""]
+        lines.append(f"| Measure | {regions[0]} | {regions[1]} |")
+        lines.append("|---|---|---|")
+        lines.append(f"| {noun.capitalize()} | {len(rows[0][1])} | {len(rows[1][1])} |")
+        per_100k = [len(p) / REGION_POPULATIONS[r] * 100_000 for r, p, _ in rows]
+        lines.append(f"| Per 100k people | {per_100k[0]:.1f} | {per_100k[1]:.1f} |")
+        # Capability coverage rows, unless the comparison is already restricted to one capability
+        capabilities = [] if filters.get("capability") in CAPABILITY_CATEGORIES else CAPABILITY_CATEGORIES
+        for cap in capabilities:
+            c = CAPABILITY_CATEGORIES.index(cap)
+            lines.append(f"| {cap} | {int(rows[0][2][c])} | {int(rows[1][2][c])} |")
+        positions = np.concatenate([rows[0][1], rows[1][1]])
+        return {
+            "answer": "\n".join(lines),
+            "sources": self._sources(positions, filters),
+            "visualization_hint": "chart",
+            "plan": {"operation": "compare_regions", "regions": regions, "filters": filters},
+        }
+
+    @staticmethod
+    def _label(i: int) -> str:
+        f = data_store.facilities[i]
+        where = ", ".join(p for p in [f.address_city, f.normalized_region] if p)
+        return f"{f.name} ({where})" if where else f.name
+
+    @staticmethod
+    def _sources(positions, filters: dict, limit: int = 10) -> List[dict]:
+        """Citations in the chat source format, with the fields that matched each filter."""
+        sources = []
+        capability = filters.get("capability")
+        for i in list(positions)[:limit]:
+            f = data_store.facilities[i]
+            evidence = []
+            if filters.get("facility_type"):
+                evidence.append({"field": "facility_type", "text": f.facility_type})
+            if capability in CAPABILITY_KEYWORDS:
+                # The entries that set the capability flag (same keyword match as the capability matrix)
+                keywords = CAPABILITY_KEYWORDS[capability]
+                matched = [(field, text) for field, values in
+                           (("capability", f.capabilities), ("procedure", f.procedures), ("equipment", f.equipment))
+                           for text in values if any(kw in f"{text.lower()} " for kw in keywords)]
+                evidence += [{"field": field, "text": text} for field, text in matched[:2]]
+            if filters.get("specialty"):
+                evidence += [{"field": "specialty", "text": s} for s in f.specialties
+                             if filters["specialty"].lower() in s.lower()][:1]
+            sources.append({
+                "facility_id": f.unique_id,
+                "facility_name": f.name,
+                "region": f.normalized_region or "",
+                "relevance": 1.0,
+                "row_id": f.unique_id,
+                "evidence": evidence,
+            })
+        return sources
+
+
+# Global answer engine instance
+answer_engine = AnswerEngine()
+
+
+if __name__ == "__main__":
+    # python -m agents.answer_engine: check the queries that must be left to the LLM are declined
+    data_store.load()
+    with open(EVAL_FILE) as f:
+        declines = json.load(f)["answer_engine_declines"]
+    answered = [
+        {"query": q, "answer": result["answer"][:120]}
+        for q in declines
+        for result in [answer_engine.try_answer(q, fast_classifier.classify(q)[0])] if result is not None
+    ]
+    print(json.dumps({"queries": len(declines), "declined": len(declines) - len(answered), "answered": answered},
+                     indent=2))
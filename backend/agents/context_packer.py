@@ -0,0 +1,312 @@
+import json
+import logging
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+# Facility columns in display order; ids and relevance scores carry no facts for the answer
+FACILITY_COLUMNS = ["name", "type", "city", "region", "distance_km", "data_completeness", "specialties",
+                    "capabilities", "procedures", "equipment", "description", "anomalies"]
+DROPPED_KEYS = {"unique_id", "score"}
+STATUS_RANK = {"critical": 0, "underserved": 1, "adequate": 2}
+DESCRIPTION_CHARS = 300
+# Free-text capability/procedure/equipment entries are often whole paragraphs
+LIST_ITEM_CHARS = 100
+STATS_LIST_ITEMS = 15
+# Rows every section gets before any section gets more
+MIN_SECTION_ROWS = 5
+# Room kept for the "... rows omitted" line when a section is cut
+OMITTED_NOTE_TOKENS = 12
+
+# Sections that lead the context for each category; the rest follow in default order
+DEFAULT_ORDER = ["facilities", "stats", "geospatial", "referrals", "desert_data", "nearest_capable", "anomaly_data"]
+CATEGORY_FIRST = {
+    "medical_desert": ["desert_data", "nearest_capable"],
+    "recommendation": ["desert_data", "nearest_capable"],
+    "anomaly": ["anomaly_data"],
+    "geospatial": ["geospatial", "facilities", "referrals"],
+}
+
+
+@lru_cache()
+def _encoding():
+    """tiktoken encoding for the chat model, or None when tiktoken (or its BPE files) is unavailable."""
+    try:
+        import tiktoken
+    except ImportError:
+        logger.info("tiktoken not installed; estimating context tokens from length")
+        return None
+    try:
+        return tiktoken.encoding_for_model(get_settings().chat_model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        logger.warning(f"tiktoken encoding unavailable ({e}); estimating context tokens from length")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def _cell(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "yes" if value else "no"
+    if isinstance(value, float):
+        return f"{value:.2f}".rstrip("0").rstrip(".")
+    if isinstance(value, (list, tuple)):
+        return "; ".join(_cell(v) for v in value if v not in (None, ""))
+    if isinstance(value, dict):
+        return ", ".join(f"{k}={_cell(v)}" for k, v in value.items() if k not in DROPPED_KEYS and v is not None)
+    return str(value).replace("|", "/").replace("\n", " ")
+
+
+def _stat(value) -> str:
+    if isinstance(value, list) and len(value) > STATS_LIST_ITEMS:
+        return f"{_cell(value[:STATS_LIST_ITEMS])} (+{len(value) - STATS_LIST_ITEMS} more)"
+    return _cell(value)
+
+
+def _flatten(row: dict, prefix: str = "") -> dict:
+    """One table cell per leaf; nested dicts become ``parent.child`` columns."""
+    flat = {}
+    for key, value in row.items():
+        if key in DROPPED_KEYS:
+            continue
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+class Table:
+    """Rows sharing a header: columns named once, constant columns hoisted into one line."""
+
+    def __init__(self, title: str, rows: List[dict], columns: Optional[List[str]] = None,
+                 min_rows: int = MIN_SECTION_ROWS):
+        self.title = title
+        self.min_rows = min_rows
+        flat = [_flatten(r) for r in rows]
+        order = columns or []
+        seen = list(order) + [k for r in flat for k in r if k not in order]
+        keys = [k for k in dict.fromkeys(seen) if any(_cell(r.get(k)) for r in flat)]
+        cells = [[_cell(r.get(k)) for k in keys] for r in flat]
+
+        # Columns with one value across every row are stated once instead of per row
+        constant = [i for i in range(len(keys)) if len(cells) > 1 and len({row[i] for row in cells}) == 1]
+        self.common = ", ".join(f"{keys[i]}={cells[0][i]}" for i in constant)
+        varying = [i for i in range(len(keys)) if i not in constant]
+        self.columns = [keys[i] for i in varying]
+        self.rows = [" | ".join(row[i] for i in varying) for row in cells]
+
+    def header(self) -> str:
+        lines = [f"## {self.title} ({len(self.rows)} rows)"]
+        if self.common:
+            lines.append(f"all rows: {self.common}")
+        if self.columns:
+            lines.append(" | ".join(self.columns))
+        return "\n".join(lines)
+
+
+class ContextPacker:
+    """Compact, token-budgeted serialization of the response generator's context.
+
+    Facility, referral and anomaly lists are encoded as tables (header once,
+    then ``|``-separated rows) with ids dropped and constant columns hoisted;
+    the desert matrix becomes a region x capability pivot. Sections are
+    ordered for the query category and rows by relevance (distance, search
+    rank, or gap severity). Rows are added greedily, each section's top rows
+    and every facility row first, until ``context_token_budget`` real tokens
+    are used, so whatever is cut is the least relevant, never half a record.
+    """
+
+    def tables(self, context: dict) -> dict:
+        sections = {}
+        stats = {k: v for k, v in context.get("stats", {}).items() if k != "regions"}
+        if stats:
+            region = stats.pop("region", None)
+            lines = [f"{k}: {_stat(v)}" for k, v in stats.items() if not isinstance(v, list) or v]
+            if region:
+                lines += [f"region.{k}: {_stat(v)}" for k, v in region.items() if v not in (None, [], {})]
+            sections["stats"] = ("## Stats", lines)
+
+        facilities = [dict(f) for f in context.get("facilities", [])]
+        if any(f.get("distance_km") is not None for f in facilities):
+            facilities.sort(key=lambda f: f["distance_km"] if f.get("distance_km") is not None else 1e9)
+        else:
+            facilities.sort(key=lambda f: -(f.get("score") or 0))
+        for f in facilities:
+            if f.get("description") and len(f["description"]) > DESCRIPTION_CHARS:
+                f["description"] = f["description"][:DESCRIPTION_CHARS] + "..."
+            for key in ("capabilities", "procedures", "equipment"):
+                f[key] = [v if len(v) <= LIST_ITEM_CHARS else v[:LIST_ITEM_CHARS] + "..." for v in f.get(key) or []]
+        if facilities:
+            sections["facilities"] = Table("Facilities, most relevant first", facilities, FACILITY_COLUMNS)
+
+        geo = context.get("geospatial")
+        if geo:
+            # Within-radius and nearest lists are already the facility rows (with distance_km)
+            location = geo.get("location") or {}
+            lines = [f"location: {_cell({k: v for k, v in location.items() if k != 'source'})}"]
+            lines += [f"{k}: {_cell(geo[k])}" for k in ("radius_km", "time_hours", "facility_type",
+                                                         "capability_category") if geo.get(k) is not None]
+            if geo.get("cold_spots"):
+                lines.append("cold spots (regions beyond radius): " + _cell(
+                    [f"{c['region']} {_cell(c.get('distance_km'))} km" for c in geo["cold_spots"]]))
+            sections["geospatial"] = ("## Geospatial", lines)
+
+        referrals = context.get("referrals")
+        if referrals and referrals.get("nearest_capable"):
+            sections["referrals"] = Table(f"Referral options from {referrals['from_facility']}",
+                                          referrals["nearest_capable"])
+
+        desert = context.get("desert_data", [])
+        if desert:
+            # Region x capability pivot of facility counts: 0 is critical, 1-2 underserved
+            pivot = {}
+            for entry in desert:
+                pivot.setdefault(entry["region"], {"region": entry["region"]})[entry["capability"]] = \
+                    entry["facility_count"]
+            severity = {e["region"]: 0 for e in desert}
+            for entry in desert:
+                severity[entry["region"]] += 2 - STATUS_RANK.get(entry["status"], 2)
+            rows = sorted(pivot.values(), key=lambda row: -severity[row["region"]])
+            sections["desert_data"] = Table("Facilities per capability (0 = critical gap, 1-2 = underserved), "
+                                            "most severe region first", rows, min_rows=len(rows))
+
+        nearest = [e for e in context.get("nearest_capable", []) if e]
+        if nearest:
+            sections["nearest_capable"] = Table("Nearest capable region and facility per gap", nearest)
+
+        anomalies = context.get("anomaly_data", [])
+        if anomalies:
+            sections["anomaly_data"] = Table("Facilities with anomalies", anomalies)
+        return sections
+
+    def pack(self, context: dict, category: str = "basic", budget: Optional[int] = None) -> Tuple[str, dict]:
+        """Return ``(text, report)``; the report gives tokens used and rows kept per section."""
+        budget = budget or get_settings().context_token_budget
+        sections = self.tables(context)
+        first = CATEGORY_FIRST.get(category, [])
+        order = first + [s for s in DEFAULT_ORDER if s not in first]
+
+        # Greedy fill: each section's top rows in section order, with every facility row counted as a top
+        # row (facilities are what answers cite), then the rest interleaved by rank. Line sections (stats,
+        # geospatial) are small and kept whole.
+        parts = []
+        for name in (n for n in order if n in sections):
+            section = sections[name]
+            if isinstance(section, Table):
+                parts.append((name, section.header(), section.rows, section.min_rows))
+            else:
+                parts.append((name, section[0], section[1], len(section[1])))
+        candidates = sorted(
+            (False, MIN_SECTION_ROWS, part, rank) if name == "facilities"
+            else (rank >= min_rows, max(rank, MIN_SECTION_ROWS), part, rank)
+            for part, (name, _, rows, min_rows) in enumerate(parts) for rank in range(len(rows))
+        )
+        kept = [[] for _ in parts]
+        full = set()
+        used = 0
+        for _, _, part, rank in candidates:
+            if part in full:
+                continue
+            name, header, rows, _ = parts[part]
+            cost = count_tokens(rows[rank]) + 1
+            if not kept[part]:
+                cost += count_tokens(header) + 1 + OMITTED_NOTE_TOKENS
+            if used + cost > budget:
+                # Rows are ranked, so a section stops at its first row that does not fit
+                full.add(part)
+                continue
+            kept[part].append(rank)
+            used += cost
+
+        lines: List[str] = []
+        report = {"budget": budget, "sections": {}}
+        for (name, header, rows, _), ranks in zip(parts, kept):
+            report["sections"][name] = {"rows": len(ranks), "total": len(rows)}
+            if not ranks:
+                continue
+            lines.append(header)
+            lines += [rows[rank] for rank in sorted(ranks)]
+            if len(ranks) < len(rows):
+                lines.append(f"... {len(rows) - len(ranks)} less relevant rows omitted")
+        text = "\n".join(lines)
+        report["tokens"] = count_tokens(text)
+        return text, report
+
+
+# Global context packer instance
+context_packer = ContextPacker()
+
+
+def benchmark(budget: Optional[int] = None) -> dict:
+    """Prompt tokens of the packed context against the old ``json.dumps(indent=2)[:8000]`` form.
+
+    Runs the labelled queries in ``data/classifier_eval.json`` through the
+    fast classifier and the supervisor's context gathering. A facility is a
+    "cited fact" if its name appears in the old context; ``lost`` counts those
+    missing from the packed one. Without a vector index, the filter matches
+    stand in for the semantic-search facilities.
+    """
+    import asyncio
+
+    import numpy as np
+
+    from agents.answer_engine import answer_engine
+    from agents.fast_classifier import fast_classifier, EVAL_FILE
+    from agents.supervisor import agent_supervisor, facility_context
+    from services.data_loader import data_store
+    from services.vector_store import vector_store
+
+    with open(EVAL_FILE) as f:
+        queries = [case["query"] for case in json.load(f)["queries"]]
+    rows = []
+    for query in queries:
+        classification, _ = fast_classifier.classify(query)
+        context = asyncio.run(agent_supervisor._gather_context(query, classification))
+        if vector_store.index is None and not context["facilities"]:
+            filters = classification["filters"]
+            positions = np.flatnonzero(answer_engine.mask(filters.get("region"), filters.get("facility_type"),
+                                                          filters.get("capability"), filters.get("specialty")))
+            context["facilities"] = [facility_context(data_store.facilities[i], score=1.0) for i in positions[:15]]
+        old = json.dumps(context, indent=2, default=str)
+        old = old[:8000] + "\n... (truncated)" if len(old) > 8000 else old
+        new, report = context_packer.pack(context, classification["category"], budget)
+        names = {f["name"] for f in context["facilities"] + context.get("anomaly_data", [])}
+        cited_old = {n for n in names if n in old}
+        cited_new = {n for n in names if n in new}
+        rows.append((count_tokens(old), report["tokens"], len(cited_old), len(cited_new), len(cited_old - cited_new)))
+
+    old_tokens, new_tokens, cited_old, cited_new, lost = (sum(column) for column in zip(*rows))
+    return {
+        "queries": len(rows),
+        "tokenizer": "tiktoken" if _encoding() is not None else "length estimate",
+        "old_tokens_mean": round(old_tokens / len(rows), 1),
+        "packed_tokens_mean": round(new_tokens / len(rows), 1),
+        "token_reduction": round(1 - new_tokens / old_tokens, 3),
+        "facilities_cited_old": cited_old,
+        "facilities_cited_packed": cited_new,
+        "facilities_lost": lost,
+    }
+
+
+if __name__ == "__main__":
+    # python -m agents.context_packer [budget]: token benchmark on data/classifier_eval.json
+    import sys
+
+    from services.data_loader import data_store
+
+    data_store.load()
+    print(json.dumps(benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else None), indent=2))
@@ -0,0 +1,352 @@
+import json
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from services.data_loader import data_store, CAPABILITY_KEYWORDS, REGION_POPULATIONS
+
+
+EVAL_FILE = Path(__file__).parent.parent / "data" / "classifier_eval.json"
+
+# Intent cues per category as (pattern, weight); "basic" is the default when none fire
+INTENT_PATTERNS: Dict[str, List[Tuple[str, float]]] = {
+    "geospatial": [
+        (r"\b(nearest|closest)\b", 1.5),
+        (r"\bnear(by)?\b|\bclose to\b", 1.0),
+        (r"\bwithin\s+\d", 1.5),
+        (r"\b\d+(\.\d+)?\s*(km|kilomet\w*|mi|miles|hours?|hrs?|minutes?)\b", 1.5),
+        (r"\bhow far\b|\bdistances?\b|\btravel\b", 1.5),
+        (r"\bmap\b|\bdistribution\b", 1.0),
+        (r"-?\d+\.\d+\s*,\s*-?\d+\.\d+", 2.0),
+    ],
+    "anomaly": [
+        (r"\b(anomal\w*|suspicious|inconsisten\w*|mismatch\w*|unrealistic|implausible|duplicates?|outliers?)\b", 1.5),
+        (r"\bdata quality\b", 2.0),
+        (r"\bincomplete\b|\bmissing (data|fields?|information)\b", 1.5),
+        (r"\b(facilities|hospitals|clinics|records|entries)( that| which)? (are|is) missing\b", 2.0),
+        (r"\bmissing (an? |the |any )?(phone|e-?mail|address|website|contact|coordinates|gps|location)", 1.5),
+        (r"\b(claim|claims|claimed)\b", 1.0),
+        (r"\b(verify|validate|flag)\b", 1.0),
+    ],
+    "medical_desert": [
+        (r"\b(medical )?deserts?\b", 2.0),
+        (r"\b(lack|lacks|lacking)\b", 1.5),
+        (r"\bgaps?\b", 1.5),
+        (r"\bunderserved\b|\bunder-served\b", 2.0),
+        (r"\b(shortage|scarcity|deficit|unmet)\b", 1.5),
+        (r"\bno\b[\w\s]{0,30}\b(services?|care|facilities|access)\b", 1.5),
+        (r"\b(regions?|areas?|districts?|places)( that)? (with|have|has|having) no\b", 2.0),
+        (r"\bmissing\b", 1.0),
+    ],
+    "comparison": [
+        (r"\bcompar\w*\b", 2.0),
+        (r"\b(vs\.?|versus)\b|\bdifference between\b", 2.0),
+        (r"\brank\w*\b", 1.5),
+        (r"\b(better|worse) than\b|\bwhich (region |one )?has (more|better|fewer|the most)\b", 1.0),
+    ],
+    "recommendation": [
+        (r"\b(recommend\w*|suggest\w*|advise)\b", 2.0),
+        (r"\bshould (we|i|the|a)\b", 2.0),
+        (r"\bwhere (should|would|to)\b", 1.5),
+        (r"\b(prioriti[sz]e|priorities|allocate|invest|deploy|action plan)\b", 1.5),
+        (r"\b(best|ideal|optimal) (location|place|site)\b", 2.0),
+        (r"\b(most|biggest|greatest) impact\b|\bnew (hospital|clinic|facility)\b", 1.0),
+    ],
+}
+
+# Cues for plain lookups, used only when no other intent fires
+BASIC_PATTERN = r"\b(how many|list|count|show|find|which|what|tell me about|do any|does)\b"
+
+# Negation and exclusion invert what the filters select, which the patterns do not model
+NEGATION_PATTERN = r"\b(not|no|without|outside|except|excluding|other than|none)\b|n't\b"
+
+WORD_PATTERN = re.compile(r"[A-Za-z][\w'-]*")
+
+FACILITY_TYPE_TERMS = [
+    (r"\bhospitals?\b", "hospital"),
+    (r"\bclinics?\b", "clinic"),
+    (r"\bpharmac(y|ies)\b|\bchemists?\b", "farmacy"),
+    (r"\bdentists?\b", "dentist"),
+    (r"\bdoctors?\b", "doctor"),
+]
+
+
+def _camel_to_phrase(name: str) -> str:
+    return re.sub(r"(?<!^)(?=[A-Z])", " ", name).lower()
+
+
+class FastClassifier:
+    """Deterministic query classifier for the common cases, with a confidence.
+
+    Filters come from gazetteers: region names and aliases, city and
+    district-locality names, ``CAPABILITY_KEYWORDS``, facility-type terms and
+    the specialty vocabulary. The category is scored from weighted intent
+    patterns; confidence is the winning score over the total plus a fixed
+    prior, so a single weak cue or two competing intents stay below the
+    threshold and go to the LLM classifier. So do queries with no intent cue
+    and no filters, and negated queries (except medical desert ones, whose
+    cues are negations).
+    """
+
+    PRIOR = 0.5
+    NEGATION_PENALTY = 0.7
+
+    def __init__(self):
+        self._gazetteer: Optional[re.Pattern] = None
+        self._place_region: Dict[str, str] = {}
+        self._region_names: Dict[str, str] = {}
+        self._specialties: Dict[str, str] = {}
+        self._intents = {
+            category: [(re.compile(pattern), weight) for pattern, weight in patterns]
+            for category, patterns in INTENT_PATTERNS.items()
+        }
+        self._basic = re.compile(BASIC_PATTERN)
+        self._negation = re.compile(NEGATION_PATTERN)
+        self._types = [(re.compile(pattern), value) for pattern, value in FACILITY_TYPE_TERMS]
+        # Keywords anchored at a word start so "er " does not match "offer "
+        self._capabilities = {
+            category: re.compile("|".join(r"(?<![a-z])" + re.escape(kw) for kw in keywords))
+            for category, keywords in CAPABILITY_KEYWORDS.items()
+        }
+
+    def _build(self):
+        """Gazetteers from the loaded reference data (regions, cities, districts, specialties)."""
+        from services.admin_hierarchy import admin_hierarchy
+
+        places: Dict[str, set] = {}
+        for region in REGION_POPULATIONS:
+            places.setdefault(region.lower(), set()).add(region)
+        for alias, region in data_store._region_map.items():
+            places.setdefault(alias.lower(), set()).add(region)
+        # Region names and aliases, as opposed to the cities and localities inside a region
+        self._region_names = {place: next(iter(regions)) for place, regions in places.items()}
+        for city, region in data_store._city_to_region.items():
+            places.setdefault(city.lower(), set()).add(region)
+        for (region, locality), _ in admin_hierarchy._locality.items():
+            if len(locality) >= 3:
+                places.setdefault(locality, set()).add(region)
+        # Names shared by several regions are not usable as a filter
+        self._place_region = {
+            place: next(iter(regions)) for place, regions in places.items()
+            if len(regions) == 1 and next(iter(regions)) in REGION_POPULATIONS
+        }
+        names = sorted(self._place_region, key=len, reverse=True)
+        self._gazetteer = re.compile(r"\b(" + "|".join(re.escape(n) for n in names) + r")\b")
+        self._specialties = {
+            _camel_to_phrase(s): s
+            for s in {s for f in data_store.facilities for s in f.specialties}
+        }
+
+    def regions(self, message: str) -> List[str]:
+        """Every region named in a query (directly or via a city/district), in order of mention."""
+        if self._gazetteer is None or not self._place_region:
+            self._build()
+        if not self._place_region:
+            return []
+        found = []
+        for match in self._gazetteer.finditer(message.lower()):
+            region = self._place_region[match.group(1)]
+            if region not in found:
+                found.append(region)
+        return found
+
+    def localities(self, message: str) -> List[str]:
+        """Cities and localities named in a query (places below region level), in order of mention."""
+        if self._gazetteer is None or not self._place_region:
+            self._build()
+        if not self._place_region:
+            return []
+        return [m.group(1) for m in self._gazetteer.finditer(message.lower()) if m.group(1) not in self._region_names]
+
+    def facility_types(self, message: str) -> List[str]:
+        """Every facility type a query names, in pattern order."""
+        text = message.lower()
+        return [value for pattern, value in self._types if pattern.search(text)]
+
+    def capabilities(self, message: str) -> List[str]:
+        """Every capability category a query names."""
+        padded = f" {message.lower()} "
+        return [category for category, pattern in self._capabilities.items() if pattern.search(padded)]
+
+    def canonical_filters(self, filters: dict) -> Optional[dict]:
+        """Map filter values (e.g. from the LLM classifier) onto the dataset's vocabulary.
+
+        "Ashanti Region" becomes "Ashanti", "pharmacy" "farmacy" and
+        "surgery" "Surgery". Returns None if any value does not map to
+        exactly one known value, or the filters name an unknown key.
+        """
+        if self._gazetteer is None or not self._place_region:
+            self._build()
+        canonical = {}
+        for key, value in (filters or {}).items():
+            if not value:
+                continue
+            if not isinstance(value, str):
+                return None
+            text = value.strip().lower()
+            if key == "region":
+                matches = {self._region_names[text]} if text in self._region_names else set()
+            elif key == "facility_type":
+                matches = {v for _, v in FACILITY_TYPE_TERMS if v == text} or set(self.facility_types(text))
+            elif key == "capability":
+                matches = {c for c in CAPABILITY_KEYWORDS if c.lower() == text} or set(self.capabilities(text))
+            elif key == "specialty":
+                matches = {s for phrase, s in self._specialties.items() if text in (phrase, s.lower())}
+            else:
+                return None
+            if len(matches) != 1:
+                return None
+            canonical[key] = matches.pop()
+        return canonical
+
+    def unresolved_names(self, message: str) -> set:
+        """Capitalised words (after the first) not covered by any gazetteer or vocabulary match.
+
+        These are usually facility names or terms the filters cannot express,
+        e.g. "Korle Bu" or "ICU".
+        """
+        if self._gazetteer is None or not self._place_region:
+            self._build()
+        text = message.lower()
+        covered = set()
+        matches = list(self._gazetteer.finditer(text)) if self._place_region else []
+        matches += [m for pattern, _ in self._types for m in pattern.finditer(text)]
+        for start, end in [(m.start(), m.end()) for m in matches]:
+            covered.update(range(start, end))
+        for pattern in self._capabilities.values():
+            for m in pattern.finditer(f" {text} "):
+                covered.update(range(m.start() - 1, m.end() - 1))
+        for phrase in self._specialties:
+            start = text.find(phrase)
+            if start >= 0:
+                covered.update(range(start, start + len(phrase)))
+        return {
+            m.group().lower() for m in WORD_PATTERN.finditer(message)
+            if m.start() > 0 and m.group()[0].isupper() and m.start() not in covered
+        }
+
+    def classify(self, message: str) -> Tuple[dict, float]:
+        """Return ``({"category", "filters"}, confidence)`` for a query."""
+        if self._gazetteer is None or not self._place_region:
+            self._build()
+        text = message.lower()
+        padded = f" {text} "
+
+        place = self._gazetteer.search(text) if self._place_region else None
+        region = self._place_region[place.group(1)] if place else None
+
+        type_hits = [(m.start(), value) for pattern, value in self._types for m in [pattern.search(text)] if m]
+        facility_type = min(type_hits)[1] if type_hits else None
+
+        capability_hits = [
+            (m.start(), category) for category, pattern in self._capabilities.items()
+            for m in [pattern.search(padded)] if m
+        ]
+        capability = min(capability_hits)[1] if capability_hits else None
+
+        specialty = None
+        if capability is None:
+            matches = [phrase for phrase in self._specialties if phrase in text]
+            if matches:
+                specialty = self._specialties[max(matches, key=len)]
+
+        scores = {}
+        for category, patterns in self._intents.items():
+            score = sum(weight for pattern, weight in patterns if pattern.search(text))
+            if score:
+                scores[category] = score
+
+        if scores:
+            category = max(scores, key=scores.get)
+            confidence = scores[category] / (sum(scores.values()) + self.PRIOR)
+        else:
+            category = "basic"
+            if region or facility_type or capability or specialty:
+                confidence = 0.8
+            elif self._basic.search(text):
+                confidence = 0.5
+            else:
+                confidence = 0.3
+        if category != "medical_desert" and self._negation.search(text):
+            confidence *= self.NEGATION_PENALTY
+
+        classification = {
+            "category": category,
+            "filters": {
+                "region": region,
+                "facility_type": facility_type,
+                "capability": capability,
+                "specialty": specialty,
+            },
+        }
+        return classification, round(confidence, 3)
+
+
+def evaluate(classify: Callable[[str], Tuple[dict, float]], threshold: float, path: Path = EVAL_FILE,
+             split: str = "queries") -> dict:
+    """Accuracy of a classifier on one split of the labelled query set.
+
+    Category accuracy is reported overall and on the confident subset (the
+    queries that would skip the LLM); filter accuracy is over the labelled
+    filter values only. ``split="held_out"`` holds queries the patterns were
+    not written against.
+    """
+    with open(path) as f:
+        cases = json.load(f)[split]
+    correct = confident = confident_correct = filter_total = filter_correct = 0
+    misses = []
+    started = time.perf_counter()
+    for case in cases:
+        result, confidence = classify(case["query"])
+        hit = result.get("category") == case["category"]
+        correct += hit
+        if confidence >= threshold:
+            confident += 1
+            confident_correct += hit
+        for key, expected in case["filters"].items():
+            filter_total += 1
+            filter_correct += (result.get("filters") or {}).get(key) == expected
+        if not hit:
+            misses.append({"query": case["query"], "expected": case["category"],
+                           "got": result.get("category"), "confidence": confidence})
+    elapsed = time.perf_counter() - started
+    return {
+        "queries": len(cases),
+        "category_accuracy": round(correct / len(cases), 3),
+        "fast_path_coverage": round(confident / len(cases), 3),
+        "fast_path_accuracy": round(confident_correct / confident, 3) if confident else None,
+        "filter_accuracy": round(filter_correct / filter_total, 3) if filter_total else None,
+        "mean_latency_ms": round(elapsed / len(cases) * 1000, 3),
+        "misses": misses,
+    }
+
+
+# Global fast classifier instance
+fast_classifier = FastClassifier()
+
+
+if __name__ == "__main__":
+    # python -m agents.fast_classifier [--llm]: report accuracy on data/classifier_eval.json
+    import asyncio
+
+    from config import get_settings
+
+    data_store.load()
+    threshold = get_settings().fast_classifier_min_confidence
+    splits = ["queries", "held_out"]
+    print(json.dumps({"fast": {split: evaluate(fast_classifier.classify, threshold, split=split)
+                               for split in splits}}, indent=2))
+    if "--llm" in sys.argv:
+        from agents.supervisor import agent_supervisor
+
+        async def llm_labels() -> Dict[str, dict]:
+            with open(EVAL_FILE) as f:
+                cases = json.load(f)
+            queries = [case["query"] for split in splits for case in cases[split]]
+            return {q: await agent_supervisor._classify_with_llm(q) for q in queries}
+
+        labels = asyncio.run(llm_labels())
+        print(json.dumps({"llm": {split: evaluate(lambda message: (labels[message], 1.0), 0.0, split=split)
+                                  for split in splits}}, indent=2))
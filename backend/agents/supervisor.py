@@ -1,14 +1,30 @@
+import asyncio
 import json
+import logging
+import re
 import time
 import uuid
-from typing import List, Optional
-from openai import OpenAI
+from typing import AsyncIterator, List, Optional
 
+import numpy as np
+
+from agents.answer_engine import answer_engine
+from agents.context_packer import context_packer
+from agents.fast_classifier import fast_classifier
+from agents.tool_agent import tool_agent
 from config import get_settings
 from models.queries import AgentStep, ChatResponse
+from services.answer_cache import answer_cache, normalize_query
+from services.conversation_store import conversation_store
 from services.data_loader import data_store, CAPABILITY_CATEGORIES, REGION_POPULATIONS
+from services.llm import llm_gateway
 from services.vector_store import vector_store
 from services.geospatial import build_geospatial_response
+from services.referral_graph import referral_graph
+from services.region_network import region_network
+from services.single_flight import single_flight
+
+logger = logging.getLogger(__name__)
 
 
 SUPERVISOR_SYSTEM_PROMPT = """You are an AI healthcare intelligence agent for the Virtue Foundation.
@@ -51,45 +67,198 @@ Return JSON: {"category": str, "filters": {"region": str|null, "facility_type":
 """
 
 
-class AgentSupervisor:
-    """Orchestrates query handling across specialized sub-agents."""
+# Short messages that only make sense against the previous turn
+FOLLOW_UP_PATTERN = re.compile(
+    r"^(what|how) about\b|^(and|also|same|now|only|just|then)\b|^(in|for|at|near) [\w' -]{1,30}\??$"
+    r"|\b(those|these|them|the same)\b"
+)
+# Previous turns replayed to the generator
+HISTORY_TURNS = 3
+# Facilities passed to the generator, and the semantic search candidates they are filtered from
+CONTEXT_FACILITIES = 15
+CANDIDATE_POOL = 3 * CONTEXT_FACILITIES
+
+
+def facility_context(f, **extra) -> dict:
+    """A facility as it appears in the response generator's context."""
+    return {
+        "name": f.name,
+        "unique_id": f.unique_id,
+        "type": f.facility_type,
+        "city": f.address_city,
+        "region": f.normalized_region,
+        "specialties": f.specialties[:10],
+        "capabilities": f.capabilities[:10],
+        "procedures": f.procedures[:5],
+        "equipment": f.equipment[:5],
+        "description": f.description,
+        "data_completeness": f.data_completeness,
+        "anomalies": f.anomalies,
+        **extra,
+    }
 
-    def __init__(self):
-        self._client: Optional[OpenAI] = None
-        self._conversations: dict = {}
 
-    @property
-    def client(self) -> OpenAI:
-        if self._client is None:
-            settings = get_settings()
-            self._client = OpenAI(api_key=settings.openai_api_key)
-        return self._client
+class AgentSupervisor:
+    """Orchestrates query handling across specialized sub-agents."""
 
-    def handle_query(self, message: str, conversation_id: Optional[str] = None) -> ChatResponse:
-        """Process a natural language query through the agent pipeline."""
+    async def handle_query(self, message: str, conversation_id: Optional[str] = None,
+                           mode: Optional[str] = None) -> ChatResponse:
+        """Process a natural language query through the agent pipeline.
+
+        Every model call is awaited through the shared LLM gateway, so a chat
+        holds no worker thread while it waits on OpenAI. Identical concurrent
+        queries share one run; a duplicate that started a new conversation
+        gets its own copy of the resulting conversation.
+        """
+        mode = mode or get_settings().agent_mode
+        run_id = conversation_id or str(uuid.uuid4())
+
+        async def run() -> ChatResponse:
+            async for event in self.stream_query(message, run_id, mode):
+                if event["type"] == "done":
+                    return event["response"]
+
+        response = await single_flight.run_async("chat", (mode, normalize_query(message), conversation_id), run)
+        if response.conversation_id != run_id:
+            await asyncio.to_thread(conversation_store.fork, response.conversation_id, run_id)
+            response = response.model_copy(update={"conversation_id": run_id})
+        return response
+
+    async def stream_query(self, message: str, conversation_id: Optional[str] = None,
+                           mode: Optional[str] = None) -> AsyncIterator[dict]:
+        """Run the agent pipeline, yielding events as each stage completes.
+
+        Events are ``{"type": "step", "step": AgentStep}`` after each stage,
+        ``{"type": "token", "text": str}`` for answer deltas as the model
+        produces them, and a final ``{"type": "done", "response": ChatResponse}``.
+        ``mode="tools"`` hands the query to the tool-calling agent instead.
+        Repeated (or near-identical) questions are answered from the answer
+        cache with the original trace marked as cached. Each turn is recorded
+        in the conversation store.
+        """
         if not conversation_id:
             conversation_id = str(uuid.uuid4())
-
+        # The store reads and writes SQLite, so it is kept off the event loop
+        conversation = await asyncio.to_thread(conversation_store.get, conversation_id)
+        history = conversation["turns"] if conversation else []
+        # A follow-up ("what about in Volta?") refines the standalone question its chain started from
+        context = ""
+        if history and FOLLOW_UP_PATTERN.search(message.lower()):
+            context = history[-1].get("context") or history[-1]["query"]
+        async for event in self._run(message, conversation_id, mode, conversation, context):
+            if event["type"] == "done":
+                response = event["response"]
+                classification = event.get("classification") or fast_classifier.classify(message)[0]
+                facility_ids = event.get("facility_ids")
+                if facility_ids is None:
+                    facility_ids = [s["facility_id"] for s in response.sources]
+                await asyncio.to_thread(conversation_store.record_turn, conversation_id, message, response.answer,
+                                        classification, facility_ids, context or message)
+            yield event
+
+    async def _run(self, message: str, conversation_id: str, mode: Optional[str],
+                   conversation: Optional[dict], context: str) -> AsyncIterator[dict]:
         start_time = time.time()
+        settings = get_settings()
+        mode = mode or settings.agent_mode
+        history = conversation["turns"] if conversation else []
+        # A follow-up depends on the previous turns, so it bypasses the answer cache
+        follow_up = bool(context)
+        use_cache = settings.answer_cache_enabled and not follow_up
+
+        hit = answer_cache.lookup(message, mode) if use_cache else None
+        if hit is not None:
+            async for event in self._cached_events(hit, [], conversation_id, start_time):
+                yield event
+            return
+
+        if mode == "tools":
+            query_embedding = None
+            if use_cache:
+                hit, query_embedding = await answer_cache.semantic_lookup(message, mode, self._cache_scope(message))
+                if hit is not None:
+                    async for event in self._cached_events(hit, [], conversation_id, start_time):
+                        yield event
+                    return
+            async for event in tool_agent.stream(message, conversation_id, history[-HISTORY_TURNS:]):
+                if event["type"] == "done" and use_cache and event["cacheable"]:
+                    answer_cache.put(message, mode, event["response"], query_embedding, self._cache_scope(message))
+                yield event
+            return
+
         agent_trace = []
 
-        # Step 1: Classify query
-        classification = self._classify_query(message)
+        # Step 1: Classify query. Semantic retrieval does not depend on the classification, so when
+        # the LLM has to classify, the query embedding and search run alongside it
+        classify_start = time.time()
+        prefetch = None
+        if not follow_up and fast_classifier.classify(message)[1] < settings.fast_classifier_min_confidence:
+            prefetch = asyncio.ensure_future(self._prefetch(message, mode, use_cache))
+        classification = await self._classify_query(message)
+        if follow_up:
+            classification = self._resolve_follow_up(classification, conversation)
         agent_trace.append(AgentStep(
             step_number=1,
             agent_name="Supervisor",
             action="classify_query",
             input_summary=f"User query: '{message[:100]}...'",
-            output_summary=f"Category: {classification.get('category', 'basic')}, "
+            output_summary=f"Category: {classification.get('category', 'basic')} "
+                          f"(via {classification.get('classifier', 'llm')} classifier"
+                          f"{', follow-up of the previous turn' if follow_up else ''}), "
                           f"Filters: {json.dumps(classification.get('filters', {}))}",
             data_sources=["user_input"],
             citations=[{"type": "input", "label": "user_query"}],
-            duration_ms=int((time.time() - start_time) * 1000),
+            duration_ms=int((time.time() - classify_start) * 1000),
+            started_ms=int((classify_start - start_time) * 1000),
         ))
-
-        # Step 2: Gather relevant data
-        step2_start = time.time()
-        context_data = self._gather_context(message, classification)
+        yield {"type": "step", "step": agent_trace[-1]}
+
+        # Plain count/list/rank/compare queries are answered exactly from the data store
+        engine_start = time.time()
+        structured = None
+        if settings.deterministic_answers:
+            structured = answer_engine.try_answer(message, classification, context)
+        if structured is not None:
+            if prefetch is not None:
+                prefetch.cancel()
+            async for event in self._structured_events(structured, agent_trace, conversation_id, classification,
+                                                       int((engine_start - start_time) * 1000)):
+                yield event
+            return
+
+        # Step 2: Semantic retrieval, unless it already ran during classification. A follow-up
+        # refines the previous turn's facilities instead
+        retrieved = {"hit": None, "embedding": None, "candidates": None}
+        if not follow_up:
+            if prefetch is None:
+                prefetch = asyncio.ensure_future(self._prefetch(message, mode, use_cache))
+            retrieved = await prefetch
+            classified = classify_start + agent_trace[0].duration_ms / 1000
+            overlap_ms = int(max(0.0, min(classified, retrieved["finished"]) - retrieved["started"]) * 1000)
+            agent_trace.append(AgentStep(
+                step_number=len(agent_trace) + 1,
+                agent_name="Retriever",
+                action="semantic_search",
+                input_summary=f"Query embedding and top {CANDIDATE_POOL} semantic search"
+                              f"{' with answer cache lookup' if use_cache else ''}",
+                output_summary=("Answer cache hit" if retrieved["hit"] is not None
+                                else f"{len(retrieved['candidates'])} candidate facilities")
+                               + (f", overlapped with classification for {overlap_ms}ms" if overlap_ms else ""),
+                data_sources=["answer_cache", "vector_store"] if use_cache else ["vector_store"],
+                duration_ms=int((retrieved["finished"] - retrieved["started"]) * 1000),
+                started_ms=int((retrieved["started"] - start_time) * 1000),
+            ))
+            yield {"type": "step", "step": agent_trace[-1]}
+            if retrieved["hit"] is not None:
+                async for event in self._cached_events(retrieved["hit"], agent_trace, conversation_id, start_time):
+                    yield event
+                return
+        query_embedding = retrieved["embedding"]
+
+        # Step 3: Gather relevant data, filtering the candidates by the classification
+        context_start = time.time()
+        prior_ids = conversation.get("facility_ids", []) if follow_up else None
+        context_data = await self._gather_context(message, classification, retrieved["candidates"], prior_ids)
         step2_citations = [
             {
                 "type": "facility",
@@ -111,25 +280,45 @@ class AgentSupervisor:
             })
 
         agent_trace.append(AgentStep(
-            step_number=2,
+            step_number=len(agent_trace) + 1,
             agent_name=self._get_agent_name(classification),
             action="data_retrieval",
             input_summary=f"Searching with filters: {json.dumps(classification.get('filters', {}))}",
             output_summary=f"Found {len(context_data.get('facilities', []))} relevant facilities, "
                           f"{len(context_data.get('desert_data', []))} desert entries",
             data_sources=[
-                "vector_store",
+                "conversation_memory" if prior_ids is not None else "semantic_candidates",
                 "facility_database",
                 "desert_matrix",
                 "geospatial_calc",
+                "referral_graph",
             ],
             citations=step2_citations,
-            duration_ms=int((time.time() - step2_start) * 1000),
+            duration_ms=int((time.time() - context_start) * 1000),
+            started_ms=int((context_start - start_time) * 1000),
         ))
+        yield {"type": "step", "step": agent_trace[-1]}
+
+        # Step 4: Generate response, streaming tokens as they arrive
+        generate_start = time.time()
+        parts = []
+        sources, viz_hint = [], None
+        failed = True
+        try:
+            async for delta in self._stream_response(message, classification, context_data, history):
+                parts.append(delta)
+                yield {"type": "token", "text": delta}
+            sources = self._build_sources(context_data)
+            viz_hint = self._visualization_hint(classification)
+            failed = False
+        except asyncio.TimeoutError:
+            parts.append(("\n\n" if parts else "") + "The answer took too long to generate. Please try again.")
+            yield {"type": "token", "text": parts[-1]}
+        except Exception as e:
+            parts.append(f"I encountered an error processing your query: {str(e)}")
+            yield {"type": "token", "text": parts[-1]}
+        answer = "".join(parts)
 
-        # Step 3: Generate response
-        step3_start = time.time()
-        answer, sources, viz_hint = self._generate_response(message, classification, context_data)
         step3_citations = [
             {
                 "type": "facility",
@@ -140,17 +329,19 @@ class AgentSupervisor:
             for s in sources[:5]
         ]
         agent_trace.append(AgentStep(
-            step_number=3,
+            step_number=len(agent_trace) + 1,
             agent_name="Response Generator",
             action="synthesize_answer",
             input_summary=f"Context: {len(str(context_data))} chars of data",
             output_summary=f"Generated {len(answer)} char response with {len(sources)} sources",
             data_sources=["openai_gpt"],
             citations=step3_citations,
-            duration_ms=int((time.time() - step3_start) * 1000),
+            duration_ms=int((time.time() - generate_start) * 1000),
+            started_ms=int((generate_start - start_time) * 1000),
         ))
+        yield {"type": "step", "step": agent_trace[-1]}
 
-        return ChatResponse(
+        response = ChatResponse(
             answer=answer,
             sources=sources,
             agent_trace=agent_trace,
@@ -158,12 +349,137 @@ class AgentSupervisor:
             conversation_id=conversation_id,
             geospatial=context_data.get("geospatial"),
         )
+        if use_cache and not failed:
+            answer_cache.put(message, mode, response, query_embedding, self._cache_scope(message))
+        yield {
+            "type": "done",
+            "response": response,
+            "cacheable": not failed,
+            "classification": classification,
+            "facility_ids": [f["unique_id"] for f in context_data["facilities"]],
+        }
+
+    async def _prefetch(self, message: str, mode: str, use_cache: bool) -> dict:
+        """Query embedding, semantic answer cache lookup and candidate search; none need the classification.
+
+        Returns ``{"hit", "embedding", "candidates", "started", "finished"}``;
+        the search is skipped on a cache hit.
+        """
+        started = time.time()
+        hit, embedding, candidates = None, None, []
+        if use_cache:
+            hit, embedding = await answer_cache.semantic_lookup(message, mode, self._cache_scope(message))
+        if hit is None:
+            try:
+                candidates = await vector_store.asearch(message, top_k=CANDIDATE_POOL, embedding=embedding)
+            except asyncio.TimeoutError:
+                logger.warning("Semantic search timed out; answering without vector results")
+        return {"hit": hit, "embedding": embedding, "candidates": candidates,
+                "started": started, "finished": time.time()}
+
+    @staticmethod
+    def _cache_scope(message: str) -> tuple:
+        """Entities a query names; semantically similar queries only share answers within one scope."""
+        classification, _ = fast_classifier.classify(message)
+        filters = classification["filters"]
+        return tuple(fast_classifier.regions(message)), tuple(filters[k] for k in sorted(filters))
+
+    async def _cached_events(self, hit: dict, agent_trace: List[AgentStep],
+                             conversation_id: str, start_time: float) -> AsyncIterator[dict]:
+        """Events for an answer cache hit: a cache step, the original trace marked cached, the answer.
+
+        ``start_time`` is when this request started; replayed steps keep their original timings.
+        """
+        original = hit["response"]
+        match = "Exact" if hit["match"] == "exact" else f"Semantic (similarity {hit['similarity']})"
+        agent_trace = list(agent_trace)
+        agent_trace.append(AgentStep(
+            step_number=len(agent_trace) + 1,
+            agent_name="Answer Cache",
+            action="cache_hit",
+            input_summary=f"User query: '{hit['query'][:100]}...'",
+            output_summary=f"{match} match for a previous query; returning its answer",
+            data_sources=["answer_cache"],
+            duration_ms=0,
+            started_ms=int((time.time() - start_time) * 1000),
+        ))
+        yield {"type": "step", "step": agent_trace[-1]}
+        for step in original.agent_trace:
+            agent_trace.append(step.model_copy(update={"step_number": len(agent_trace) + 1, "cached": True}))
+            yield {"type": "step", "step": agent_trace[-1]}
+        yield {"type": "token", "text": original.answer}
+        yield {"type": "done", "response": original.model_copy(update={
+            "agent_trace": agent_trace,
+            "conversation_id": conversation_id,
+            "cached": True,
+        }), "cacheable": False}
+
+    async def _structured_events(self, structured: dict, agent_trace: List[AgentStep], conversation_id: str,
+                                 classification: dict, started_ms: int) -> AsyncIterator[dict]:
+        """Events for an answer engine result: the executed query, the answer, then done."""
+        plan = structured["plan"]
+        citations = [
+            {"type": "facility", "id": s["facility_id"], "label": s["facility_name"], "region": s["region"]}
+            for s in structured["sources"][:5]
+        ]
+        for region in [plan["filters"].get("region")] + plan.get("regions", []):
+            if region:
+                citations.append({"type": "region", "label": region})
+        agent_trace.append(AgentStep(
+            step_number=2,
+            agent_name="Answer Engine",
+            action=plan["operation"],
+            input_summary=f"Structured query: {json.dumps(plan)}",
+            output_summary=f"Answered from the facility database with {len(structured['sources'])} cited facilities",
+            data_sources=["facility_database", "capability_matrix"],
+            citations=citations,
+            duration_ms=int(structured["elapsed_ms"]),
+            started_ms=started_ms,
+        ))
+        yield {"type": "step", "step": agent_trace[-1]}
+        yield {"type": "token", "text": structured["answer"]}
+        yield {"type": "done", "response": ChatResponse(
+            answer=structured["answer"],
+            sources=structured["sources"],
+            agent_trace=agent_trace,
+            visualization_hint=structured["visualization_hint"],
+            conversation_id=conversation_id,
+        ), "cacheable": False, "classification": classification}
+
+    async def _classify_query(self, message: str) -> dict:
+        """Classify the query type and extract filters.
+
+        The local fast classifier answers when it is confident; otherwise the
+        LLM classifies, falling back to the fast result if that call fails.
+        """
+        classification, confidence = fast_classifier.classify(message)
+        if confidence >= get_settings().fast_classifier_min_confidence:
+            return {**classification, "classifier": "fast", "confidence": confidence}
+        llm_classification = await self._classify_with_llm(message)
+        if llm_classification is None:
+            return {**classification, "classifier": "fast", "confidence": confidence}
+        return {**llm_classification, "classifier": "llm"}
+
+    @staticmethod
+    def _resolve_follow_up(classification: dict, conversation: dict) -> dict:
+        """Carry the previous turn's intent into a follow-up.
+
+        Filters the follow-up names replace the previous ones, the rest are
+        kept; a follow-up with no intent of its own ("basic") keeps the
+        previous category.
+        """
+        previous = conversation.get("classification") or {}
+        filters = {**previous.get("filters", {})}
+        filters.update({k: v for k, v in (classification.get("filters") or {}).items() if v})
+        category = classification.get("category", "basic")
+        if category == "basic":
+            category = previous.get("category") or category
+        return {**classification, "category": category, "filters": filters, "follow_up": True}
 
-    def _classify_query(self, message: str) -> dict:
-        """Classify the query type and extract filters."""
+    async def _classify_with_llm(self, message: str) -> Optional[dict]:
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
+            response = await llm_gateway.chat(
+                get_settings().classify_timeout_s,
                 messages=[
                     {"role": "system", "content": QUERY_CLASSIFIER_PROMPT},
                     {"role": "user", "content": message},
@@ -174,7 +490,7 @@ class AgentSupervisor:
             )
             return json.loads(response.choices[0].message.content)
         except Exception:
-            return {"category": "basic", "filters": {}}
+            return None
 
     def _get_agent_name(self, classification: dict) -> str:
         category = classification.get("category", "basic")
@@ -188,8 +504,16 @@ class AgentSupervisor:
         }
         return names.get(category, "Query Agent")
 
-    def _gather_context(self, message: str, classification: dict) -> dict:
-        """Gather relevant data based on query classification."""
+    async def _gather_context(self, message: str, classification: dict,
+                              candidates: Optional[list] = None,
+                              prior_ids: Optional[List[str]] = None) -> dict:
+        """Gather relevant data based on query classification.
+
+        ``candidates`` are ``(facility, score)`` semantic search results
+        (searched here if not given), ranked with the ones matching the
+        classification's filters first. ``prior_ids`` (a follow-up's previous
+        retrieval) are refined by the filters instead.
+        """
         context = {
             "facilities": [],
             "stats": {},
@@ -200,26 +524,16 @@ class AgentSupervisor:
         filters = classification.get("filters", {})
         category = classification.get("category", "basic")
 
-        # Always do semantic search
-        search_results = vector_store.search(message, top_k=15)
-        context["facilities"] = [
-            {
-                "name": f.name,
-                "unique_id": f.unique_id,
-                "type": f.facility_type,
-                "city": f.address_city,
-                "region": f.normalized_region,
-                "specialties": f.specialties[:10],
-                "capabilities": f.capabilities[:10],
-                "procedures": f.procedures[:5],
-                "equipment": f.equipment[:5],
-                "description": f.description,
-                "data_completeness": f.data_completeness,
-                "anomalies": f.anomalies,
-                "score": round(score, 3),
-            }
-            for f, score in search_results
-        ]
+        if prior_ids is not None:
+            search_results = self._refine(prior_ids, filters)
+        else:
+            if candidates is None:
+                candidates = (await self._prefetch(message, "pipeline", use_cache=False))["candidates"]
+            if any(filters.values()):
+                matching = set(self._matching_ids(filters))
+                candidates = sorted(candidates, key=lambda c: c[0].unique_id not in matching)
+            search_results = candidates[:CONTEXT_FACILITIES]
+        context["facilities"] = [facility_context(f, score=round(score, 3)) for f, score in search_results]
 
         # Add filtered results if filters present
         region = filters.get("region")
@@ -244,6 +558,13 @@ class AgentSupervisor:
             context["stats"]["desert_regions"] = [
                 r for r, s in data_store.region_stats.items() if s.is_medical_desert
             ]
+            # Where each gap can be referred to: nearest capable region and facility
+            gap_regions = [region] if region in data_store.region_stats else context["stats"]["desert_regions"]
+            context["nearest_capable"] = [
+                region_network.nearest(r, gap)
+                for r in gap_regions
+                for gap in data_store.region_stats[r].desert_gaps
+            ]
 
         # Geospatial queries
         if category == "geospatial":
@@ -267,27 +588,25 @@ class AgentSupervisor:
                 for f in data_store.facilities:
                     if f.unique_id not in ranked_ids:
                         continue
-                    ranked_facilities.append({
-                        "name": f.name,
-                        "unique_id": f.unique_id,
-                        "type": f.facility_type,
-                        "city": f.address_city,
-                        "region": f.normalized_region,
-                        "specialties": f.specialties[:10],
-                        "capabilities": f.capabilities[:10],
-                        "procedures": f.procedures[:5],
-                        "equipment": f.equipment[:5],
-                        "description": f.description,
-                        "data_completeness": f.data_completeness,
-                        "anomalies": f.anomalies,
-                        "score": 1.0,
-                        "distance_km": distance_by_id.get(f.unique_id),
-                    })
+                    ranked_facilities.append(
+                        facility_context(f, score=1.0, distance_km=distance_by_id.get(f.unique_id))
+                    )
                 ranked_facilities.sort(
                     key=lambda item: item.get("distance_km") if item.get("distance_km") is not None else 1e9
                 )
                 context["facilities"] = ranked_facilities[:15]
 
+                # Onward referral options from the closest facility
+                closest = ranked_facilities[0]
+                referrals = referral_graph.referrals(
+                    closest["unique_id"], geo.get("capability_category"), limit=3
+                )
+                if referrals:
+                    context["referrals"] = {
+                        "from_facility": closest["name"],
+                        "nearest_capable": referrals,
+                    }
+
         # Add anomaly data
         if category == "anomaly":
             context["anomaly_data"] = [
@@ -302,20 +621,53 @@ class AgentSupervisor:
 
         return context
 
-    def _generate_response(self, message: str, classification: dict, context: dict):
-        """Generate the final response using GPT."""
-        context_str = json.dumps(context, indent=2, default=str)
-
-        # Truncate if too long
-        if len(context_str) > 8000:
-            context_str = context_str[:8000] + "\n... (truncated)"
-
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": SUPERVISOR_SYSTEM_PROMPT},
-                    {"role": "user", "content": f"""Answer this query using the facility data below.
+    @staticmethod
+    def _matching_ids(filters: dict) -> List[str]:
+        """Ids of the facilities matching the classification filters, in data store order."""
+        positions = np.flatnonzero(answer_engine.mask(filters.get("region"), filters.get("facility_type"),
+                                                      filters.get("capability"), filters.get("specialty")))
+        return [data_store.facilities[i].unique_id for i in positions]
+
+    def _refine(self, prior_ids: List[str], filters: dict, top_k: int = CONTEXT_FACILITIES) -> list:
+        """A follow-up's facilities: the previous retrieval narrowed by the filters, topped up from the database.
+
+        Returns ``(facility, score)`` pairs like a semantic search; previous
+        results keep their order ahead of the top-up.
+        """
+        matching = self._matching_ids(filters)
+        matching_set = set(matching)
+        results = [(f, 1.0) for f in map(data_store.get_facility, prior_ids)
+                   if f is not None and f.unique_id in matching_set][:top_k]
+        kept = {f.unique_id for f, _ in results}
+        for fid in matching:
+            if len(results) >= top_k:
+                break
+            if fid not in kept:
+                results.append((data_store.get_facility(fid), 0.5))
+        return results
+
+    async def _stream_response(self, message: str, classification: dict, context: dict,
+                               history: Optional[List[dict]] = None) -> AsyncIterator[str]:
+        """Stream the final answer from GPT as text deltas.
+
+        The context is packed into compact tables within the token budget,
+        most relevant rows first. The last few conversation turns precede
+        the query so follow-ups read in context.
+        """
+        context_str, packed = context_packer.pack(context, classification.get("category", "basic"))
+        logger.debug("Packed context: %s", packed)
+
+        turns = []
+        for turn in (history or [])[-HISTORY_TURNS:]:
+            turns.append({"role": "user", "content": turn["query"]})
+            turns.append({"role": "assistant", "content": turn["answer"]})
+
+        async for delta in llm_gateway.chat_stream(
+            get_settings().generate_timeout_s,
+            messages=[
+                {"role": "system", "content": SUPERVISOR_SYSTEM_PROMPT},
+                *turns,
+                {"role": "user", "content": f"""Answer this query using the facility data below.
 
 QUERY: {message}
 
@@ -326,51 +678,46 @@ RELEVANT DATA:
 
 Provide a clear, concise answer with specific data citations. If showing facilities, mention their names and locations.
 At the end, suggest 2-3 follow-up questions the user might want to ask."""},
-                ],
-                temperature=0.3,
-                max_tokens=1500,
-            )
-
-            answer = response.choices[0].message.content
-
-            # Build sources
-            sources = []
-            for f in context["facilities"][:5]:
-                evidence = []
-                if f.get("description"):
-                    evidence.append({"field": "description", "text": f["description"]})
-                for cap in (f.get("capabilities") or [])[:2]:
-                    evidence.append({"field": "capability", "text": cap})
-                for proc in (f.get("procedures") or [])[:2]:
-                    evidence.append({"field": "procedure", "text": proc})
-                for eq in (f.get("equipment") or [])[:2]:
-                    evidence.append({"field": "equipment", "text": eq})
-                for spec in (f.get("specialties") or [])[:1]:
-                    evidence.append({"field": "specialty", "text": spec})
-
-                sources.append({
-                    "facility_id": f["unique_id"],
-                    "facility_name": f["name"],
-                    "region": f.get("region", ""),
-                    "relevance": f.get("score", 0),
-                    "row_id": f["unique_id"],
-                    "evidence": evidence,
-                })
-
-            # Determine visualization hint
-            category = classification.get("category", "basic")
-            viz_hint = None
-            if category == "geospatial":
-                viz_hint = "map"
-            elif category == "medical_desert":
-                viz_hint = "heatmap"
-            elif category == "comparison":
-                viz_hint = "chart"
-
-            return answer, sources, viz_hint
+            ],
+            temperature=0.3,
+            max_tokens=1500,
+        ):
+            yield delta
+
+    def _build_sources(self, context: dict) -> list:
+        sources = []
+        for f in context["facilities"][:5]:
+            evidence = []
+            if f.get("description"):
+                evidence.append({"field": "description", "text": f["description"]})
+            for cap in (f.get("capabilities") or [])[:2]:
+                evidence.append({"field": "capability", "text": cap})
+            for proc in (f.get("procedures") or [])[:2]:
+                evidence.append({"field": "procedure", "text": proc})
+            for eq in (f.get("equipment") or [])[:2]:
+                evidence.append({"field": "equipment", "text": eq})
+            for spec in (f.get("specialties") or [])[:1]:
+                evidence.append({"field": "specialty", "text": spec})
+
+            sources.append({
+                "facility_id": f["unique_id"],
+                "facility_name": f["name"],
+                "region": f.get("region", ""),
+                "relevance": f.get("score", 0),
+                "row_id": f["unique_id"],
+                "evidence": evidence,
+            })
+        return sources
 
-        except Exception as e:
-            return f"I encountered an error processing your query: {str(e)}", [], None
+    def _visualization_hint(self, classification: dict) -> Optional[str]:
+        category = classification.get("category", "basic")
+        if category == "geospatial":
+            return "map"
+        if category == "medical_desert":
+            return "heatmap"
+        if category == "comparison":
+            return "chart"
+        return None
 
 
 # Global instance
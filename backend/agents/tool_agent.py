@@ -0,0 +1,416 @@
+import asyncio
+import json
+import logging
+import time
+from typing import AsyncIterator, List, Optional
+
+import numpy as np
+
+from agents.answer_engine import answer_engine
+from config import get_settings
+from models.queries import AgentStep, ChatResponse
+from services.data_loader import data_store, CAPABILITY_CATEGORIES, REGION_POPULATIONS
+from services.geospatial import build_geospatial_response
+from services.llm import llm_gateway
+from services.region_network import region_network
+from services.vector_store import vector_store
+
+logger = logging.getLogger(__name__)
+
+
+TOOL_AGENT_PROMPT = """You are an AI healthcare intelligence agent for the Virtue Foundation.
+You help NGO planners and health workers understand healthcare facility data in Ghana's 16 regions.
+
+Use the tools to fetch exactly the data the question needs; call independent tools together in one turn.
+Answer only from tool results. Cite facilities by name, type and location, give exact numbers,
+flag data quality concerns, and say clearly when the data cannot answer the question.
+Be concise but thorough. End with 2-3 follow-up questions the user might want to ask."""
+
+# Upper bound on the facilities a tool returns, whatever limit the model asks for
+MAX_LIMIT = 25
+
+REGION_PARAM = {"type": "string", "enum": list(REGION_POPULATIONS), "description": "Ghana region"}
+CAPABILITY_PARAM = {"type": "string", "enum": CAPABILITY_CATEGORIES, "description": "Capability category"}
+FACILITY_TYPE_PARAM = {"type": "string", "enum": ["hospital", "clinic", "farmacy", "dentist", "doctor"],
+                       "description": "Facility type (pharmacies are 'farmacy')"}
+
+
+def _limit_param(default: int) -> dict:
+    return {"type": "integer", "minimum": 1, "maximum": MAX_LIMIT,
+            "description": f"Facilities to return (default {default}, at most {MAX_LIMIT})"}
+
+
+def _clamp_limit(limit) -> int:
+    return max(1, min(int(limit), MAX_LIMIT))
+
+
+def _tool(name: str, description: str, properties: dict, required: Optional[List[str]] = None) -> dict:
+    return {
+        "type": "function",
+        "function": {
+            "name": name,
+            "description": description,
+            "parameters": {"type": "object", "properties": properties, "required": required or []},
+        },
+    }
+
+
+TOOLS = [
+    _tool("search_facilities", "Facilities matching exact filters, with the total match count.", {
+        "region": REGION_PARAM,
+        "facility_type": FACILITY_TYPE_PARAM,
+        "capability": CAPABILITY_PARAM,
+        "specialty": {"type": "string", "description": "Specialty substring, e.g. 'cardiology'"},
+        "limit": _limit_param(10),
+    }),
+    _tool("semantic_search", "Facilities whose descriptions best match free text, e.g. a facility name or service.", {
+        "query": {"type": "string"},
+        "limit": _limit_param(8),
+    }, ["query"]),
+    _tool("nearest_facilities", "Facilities nearest to a place, optionally within a radius or travel time.", {
+        "place": {"type": "string", "description": "Town, city or 'lat, lng'"},
+        "radius_km": {"type": "number"},
+        "hours": {"type": "number", "description": "Travel time at 40 km/h, instead of radius_km"},
+        "facility_type": FACILITY_TYPE_PARAM,
+        "capability": CAPABILITY_PARAM,
+    }, ["place"]),
+    _tool("region_stats", "Facility counts, population, capability coverage and desert gaps for a region, "
+                          "or a summary row per region when no region is given.", {
+        "region": REGION_PARAM,
+    }),
+    _tool("desert_matrix", "Region x capability coverage entries (critical = none, underserved = 1-2). "
+                           "Without filters only critical and underserved entries are returned.", {
+        "region": REGION_PARAM,
+        "capability": CAPABILITY_PARAM,
+        "status": {"type": "string", "enum": ["critical", "underserved", "adequate"]},
+    }),
+    _tool("nearest_capable", "For a region lacking a capability, the nearest other region and facility offering it.", {
+        "region": REGION_PARAM,
+        "capability": CAPABILITY_PARAM,
+    }, ["region", "capability"]),
+    _tool("anomalies", "Facilities with data quality anomalies.", {
+        "region": REGION_PARAM,
+        "facility_type": FACILITY_TYPE_PARAM,
+        "limit": _limit_param(20),
+    }),
+]
+
+TOOL_DATA_SOURCES = {
+    "search_facilities": "facility_database",
+    "semantic_search": "vector_store",
+    "nearest_facilities": "geospatial_calc",
+    "region_stats": "region_stats",
+    "desert_matrix": "desert_matrix",
+    "nearest_capable": "region_network",
+    "anomalies": "anomaly_detection",
+}
+
+
+def _facility_summary(f, **extra) -> dict:
+    """The facility fields a tool result carries, kept short to save prompt tokens."""
+    summary = {
+        "unique_id": f.unique_id,
+        "name": f.name,
+        "type": f.facility_type,
+        "city": f.address_city,
+        "region": f.normalized_region,
+        "capabilities": f.capabilities[:5],
+        "specialties": f.specialties[:5],
+    }
+    summary.update(extra)
+    return {k: v for k, v in summary.items() if v not in (None, [], "")}
+
+
+class ToolAgent:
+    """Answers a query in one model round trip plus local tool execution.
+
+    The model sees the query and the tool schemas, and requests the data it
+    needs; independent tool calls run concurrently and each is traced. The
+    answer is then streamed from the tool results. If the model answers
+    without tools, that first response is the answer. Tool results are
+    compact summaries rather than whole matrices, so prompts stay small.
+    """
+
+    def __init__(self):
+        self._tools = {
+            "search_facilities": self._search_facilities,
+            "semantic_search": self._semantic_search,
+            "nearest_facilities": self._nearest_facilities,
+            "region_stats": self._region_stats,
+            "desert_matrix": self._desert_matrix,
+            "nearest_capable": self._nearest_capable,
+            "anomalies": self._anomalies,
+        }
+
+    async def stream(self, message: str, conversation_id: str,
+                     history: Optional[List[dict]] = None) -> AsyncIterator[dict]:
+        """Yield the same step/token/done events as ``AgentSupervisor.stream_query``.
+
+        ``history`` turns (``{"query", "answer"}``) are replayed before the message.
+        """
+        settings = get_settings()
+        agent_trace: List[AgentStep] = []
+        messages = [{"role": "system", "content": TOOL_AGENT_PROMPT}]
+        for turn in history or []:
+            messages.append({"role": "user", "content": turn["query"]})
+            messages.append({"role": "assistant", "content": turn["answer"]})
+        messages.append({"role": "user", "content": message})
+        results: List[dict] = []
+        parts: List[str] = []
+        failed = True
+
+        try:
+            for _ in range(settings.tool_max_rounds):
+                started = time.time()
+                response = await llm_gateway.chat(
+                    settings.generate_timeout_s,
+                    messages=messages,
+                    tools=TOOLS,
+                    tool_choice="auto",
+                    temperature=0.3,
+                    max_tokens=1500,
+                )
+                reply = response.choices[0].message
+                if not reply.tool_calls:
+                    parts.append(reply.content or "")
+                    yield {"type": "token", "text": parts[-1]}
+                    break
+                agent_trace.append(AgentStep(
+                    step_number=len(agent_trace) + 1,
+                    agent_name="Tool Agent",
+                    action="plan_tool_calls",
+                    input_summary=f"User query: '{message[:100]}...'",
+                    output_summary=f"Requested {len(reply.tool_calls)} tool call(s): "
+                                   f"{', '.join(call.function.name for call in reply.tool_calls)}",
+                    data_sources=["openai_gpt"],
+                    duration_ms=int((time.time() - started) * 1000),
+                ))
+                yield {"type": "step", "step": agent_trace[-1]}
+
+                messages.append({
+                    "role": "assistant",
+                    "content": reply.content,
+                    "tool_calls": [
+                        {"id": call.id, "type": "function",
+                         "function": {"name": call.function.name, "arguments": call.function.arguments}}
+                        for call in reply.tool_calls
+                    ],
+                })
+                executed = await asyncio.gather(*(self._run(call) for call in reply.tool_calls))
+                for call, result, step in executed:
+                    step.step_number = len(agent_trace) + 1
+                    agent_trace.append(step)
+                    results.append(result)
+                    # The full geospatial payload goes to the response, not the prompt
+                    content = {k: v for k, v in result.items() if k != "_geospatial"}
+                    messages.append({"role": "tool", "tool_call_id": call.id,
+                                     "content": json.dumps(content, default=str)})
+                    yield {"type": "step", "step": step}
+            else:
+                # Tool rounds used up: stream the answer from what was gathered
+                async for delta in llm_gateway.chat_stream(
+                    settings.generate_timeout_s,
+                    messages=messages,
+                    tools=TOOLS,
+                    tool_choice="none",
+                    temperature=0.3,
+                    max_tokens=1500,
+                ):
+                    parts.append(delta)
+                    yield {"type": "token", "text": delta}
+            failed = False
+        except asyncio.TimeoutError:
+            parts.append(("\n\n" if parts else "") + "The answer took too long to generate. Please try again.")
+            yield {"type": "token", "text": parts[-1]}
+        except Exception as e:
+            parts.append(f"I encountered an error processing your query: {str(e)}")
+            yield {"type": "token", "text": parts[-1]}
+
+        sources = self._build_sources(results)
+        agent_trace.append(AgentStep(
+            step_number=len(agent_trace) + 1,
+            agent_name="Response Generator",
+            action="synthesize_answer",
+            input_summary=f"{len(results)} tool result(s)",
+            output_summary=f"Generated {len(''.join(parts))} char response with {len(sources)} sources",
+            data_sources=["openai_gpt"],
+            citations=[
+                {"type": "facility", "id": s["facility_id"], "label": s["facility_name"], "region": s["region"]}
+                for s in sources[:5]
+            ],
+        ))
+        yield {"type": "step", "step": agent_trace[-1]}
+
+        geospatial = next((r["_geospatial"] for r in results if "_geospatial" in r), None)
+        yield {"type": "done", "response": ChatResponse(
+            answer="".join(parts),
+            sources=sources,
+            agent_trace=agent_trace,
+            visualization_hint=self._visualization_hint(results),
+            conversation_id=conversation_id,
+            geospatial=geospatial,
+        ), "cacheable": not failed}
+
+    async def _run(self, call):
+        """Execute one tool call, returning (call, result, trace step); errors become results.
+
+        Sync tools run in a worker thread so a round's calls overlap and never block the event loop.
+        """
+        started = time.time()
+        name = call.function.name
+        # The raw argument string stays in the trace if it is not valid JSON
+        arguments = call.function.arguments or "{}"
+        try:
+            arguments = json.loads(arguments)
+            tool = self._tools.get(name)
+            if tool is None:
+                result = {"error": f"Unknown tool '{name}'"}
+            elif asyncio.iscoroutinefunction(tool):
+                result = await tool(**arguments)
+            else:
+                result = await asyncio.to_thread(tool, **arguments)
+        except asyncio.TimeoutError:
+            result = {"error": f"{name} timed out"}
+        except Exception as e:
+            logger.warning("Tool call %s failed: %s", name, e)
+            result = {"error": f"{name} failed: {e}"}
+
+        facilities = result.get("facilities", []) if isinstance(result, dict) else []
+        step = AgentStep(
+            step_number=0,
+            agent_name="Tool Agent",
+            action=f"tool:{name}",
+            input_summary=arguments if isinstance(arguments, str) else json.dumps(arguments),
+            output_summary=result.get("error") or result.get("summary", f"{len(facilities)} facilities"),
+            data_sources=[TOOL_DATA_SOURCES.get(name, name)],
+            citations=[
+                {"type": "facility", "id": f["unique_id"], "label": f["name"], "region": f.get("region", "")}
+                for f in facilities[:5]
+            ],
+            duration_ms=int((time.time() - started) * 1000),
+        )
+        return call, result, step
+
+    def _search_facilities(self, region: Optional[str] = None, facility_type: Optional[str] = None,
+                           capability: Optional[str] = None, specialty: Optional[str] = None,
+                           limit: int = 10) -> dict:
+        positions = np.flatnonzero(answer_engine.mask(region, facility_type, capability, specialty))
+        limit = _clamp_limit(limit)
+        return {
+            "summary": f"{len(positions)} matching facilities",
+            "total": int(len(positions)),
+            "facilities": [_facility_summary(data_store.facilities[i]) for i in positions[:limit]],
+        }
+
+    async def _semantic_search(self, query: str, limit: int = 8) -> dict:
+        results = await vector_store.asearch(query, top_k=_clamp_limit(limit))
+        return {
+            "summary": f"{len(results)} facilities by similarity",
+            "facilities": [_facility_summary(f, description=(f.description or "")[:200], score=round(score, 3))
+                           for f, score in results],
+        }
+
+    def _nearest_facilities(self, place: str, radius_km: Optional[float] = None, hours: Optional[float] = None,
+                            facility_type: Optional[str] = None, capability: Optional[str] = None) -> dict:
+        geo = build_geospatial_response(
+            message=place, radius_km=radius_km, hours=hours,
+            facility_type=facility_type, capability_category=capability,
+        )
+        if not geo["location"]["coords"]:
+            return {"error": f"Could not locate '{place}'"}
+        ranked = geo["within_radius"] or geo["nearest"]
+        return {
+            "summary": f"{len(geo['within_radius'])} within radius, nearest {len(geo['nearest'])} from "
+                       f"{geo['location']['label']}",
+            "location": geo["location"],
+            "radius_km": geo["radius_km"],
+            "facilities": ranked[:10],
+            "cold_spots": geo["cold_spots"][:5],
+            "_geospatial": geo,
+        }
+
+    def _region_stats(self, region: Optional[str] = None) -> dict:
+        if region:
+            stats = data_store.region_stats.get(region)
+            if stats is None:
+                return {"error": f"Unknown region '{region}'"}
+            row = stats.model_dump(exclude={"specialties_available", "level", "parent"})
+            row["specialty_count"] = len(stats.specialties_available)
+            return {"summary": f"Stats for {region}", "region": row}
+        rows = [
+            {
+                "region": name,
+                "population": s.population,
+                "total_facilities": s.total_facilities,
+                "hospitals": s.hospitals,
+                "clinics": s.clinics,
+                "facilities_per_100k": round(s.total_facilities / max(s.population, 1) * 100_000, 2),
+                "is_medical_desert": s.is_medical_desert,
+                "desert_gaps": s.desert_gaps,
+            }
+            for name, s in data_store.region_stats.items()
+        ]
+        return {"summary": f"Summary of {len(rows)} regions", "regions": rows}
+
+    def _desert_matrix(self, region: Optional[str] = None, capability: Optional[str] = None,
+                       status: Optional[str] = None) -> dict:
+        entries = [
+            e for e in data_store.desert_matrix
+            if (region is None or e["region"] == region)
+            and (capability is None or e["capability"] == capability)
+            and (e["status"] == status if status else region or capability or e["status"] != "adequate")
+        ]
+        return {"summary": f"{len(entries)} coverage entries", "entries": entries}
+
+    def _nearest_capable(self, region: str, capability: str) -> dict:
+        entry = region_network.nearest(region, capability)
+        if entry is None:
+            return {"error": f"Unknown region or capability: {region}, {capability}"}
+        return {"summary": f"Nearest {capability} to {region}: {entry['nearest_region']}", **entry}
+
+    def _anomalies(self, region: Optional[str] = None, facility_type: Optional[str] = None, limit: int = 20) -> dict:
+        flagged = data_store.search_facilities(region=region, facility_type=facility_type, has_anomalies=True)
+        limit = _clamp_limit(limit)
+        return {
+            "summary": f"{len(flagged)} facilities with anomalies",
+            "total": len(flagged),
+            "facilities": [
+                {"unique_id": f.unique_id, "name": f.name, "type": f.facility_type,
+                 "region": f.normalized_region, "anomalies": f.anomalies}
+                for f in flagged[:limit]
+            ],
+        }
+
+    @staticmethod
+    def _build_sources(results: List[dict]) -> List[dict]:
+        sources, seen = [], set()
+        for result in results:
+            for f in result.get("facilities", []):
+                if f.get("unique_id") in seen or not f.get("unique_id"):
+                    continue
+                seen.add(f["unique_id"])
+                evidence = [{"field": "capability", "text": c} for c in f.get("capabilities", [])[:2]]
+                evidence += [{"field": "specialty", "text": s} for s in f.get("specialties", [])[:1]]
+                sources.append({
+                    "facility_id": f["unique_id"],
+                    "facility_name": f["name"],
+                    "region": f.get("region") or "",
+                    "relevance": f.get("score", 1.0),
+                    "row_id": f["unique_id"],
+                    "evidence": evidence,
+                })
+        return sources[:10]
+
+    @staticmethod
+    def _visualization_hint(results: List[dict]) -> Optional[str]:
+        if any("_geospatial" in r for r in results):
+            return "map"
+        if any("entries" in r for r in results):
+            return "heatmap"
+        if any("regions" in r for r in results):
+            return "chart"
+        return None
+
+
+# Global tool agent instance
+tool_agent = ToolAgent()
@@ -12,7 +12,29 @@ class Settings(BaseSettings):
     elevenlabs_voice_style: float = 0.6
     elevenlabs_voice_use_speaker_boost: bool = True
     embedding_model: str = "text-embedding-3-small"
+    chat_model: str = "gpt-4o-mini"
+    llm_max_concurrency: int = 32
+    llm_max_connections: int = 100
+    llm_max_retries: int = 2
+    fast_classifier_min_confidence: float = 0.6
+    deterministic_answers: bool = True
+    agent_mode: str = "pipeline"
+    tool_max_rounds: int = 1
+    classify_timeout_s: float = 10.0
+    retrieval_timeout_s: float = 10.0
+    generate_timeout_s: float = 60.0
+    context_token_budget: int = 2000
+    answer_cache_enabled: bool = True
+    answer_cache_max_entries: int = 512
+    answer_cache_ttl_s: float = 3600.0
+    answer_cache_min_similarity: float = 0.95
+    conversation_db_path: str = "data/conversations.db"
+    conversation_max_turns: int = 10
+    conversation_max_facilities: int = 50
+    conversation_cache_size: int = 1000
+    conversation_ttl_s: float = 7 * 86400.0
     csv_path: str = "data/ghana_facilities.csv"
+    collapse_duplicate_entities: bool = False
     host: str = "0.0.0.0"
     port: int = 8000
 
@@ -5,7 +5,15 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from services.data_loader import data_store
+from services.llm import llm_gateway
+from services.answer_cache import answer_cache
+from services.conversation_store import conversation_store
+from services.single_flight import single_flight
 from services.vector_store import vector_store
+from services.map_index import map_index
+from services.referral_graph import referral_graph
+from services.cube import aggregation_cube
+from services.specialty_index import specialty_index
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -27,7 +35,24 @@ async def lifespan(app: FastAPI):
     vector_store.build_index(data_store.facilities)
     logger.info(f"Vector index built with {len(data_store.facilities)} entries")
 
-    # Step 3: Log summary stats
+    # Step 3: Build map cluster index
+    map_index.build(data_store.facilities)
+    logger.info(f"Map cluster index built for zoom {map_index.min_zoom}-{map_index.max_zoom}")
+
+    # Step 4: Build referral graph (k nearest capable facilities per facility)
+    referral_graph.build(data_store.facilities, data_store.capability_matrix)
+    logger.info(f"Referral graph built: k={referral_graph.k} per capability")
+
+    # Step 5: Build aggregation cube (region x type x operator x anomaly cells)
+    aggregation_cube.build(data_store.facilities, data_store.capability_matrix)
+    logger.info(f"Aggregation cube built with {len(aggregation_cube.cell_codes)} cells")
+
+    # Step 6: Build sparse specialty index (unit counts, co-occurrence)
+    specialty_index.build(data_store.facilities)
+    logger.info(f"Specialty index built: {len(specialty_index.specialties)} specialties, "
+                f"{len(specialty_index.indices)} facility-specialty pairs")
+
+    # Step 7: Log summary stats
     if data_store.data_quality:
         dq = data_store.data_quality
         logger.info(f"Data quality: {dq.avg_completeness}% avg completeness, "
@@ -43,6 +68,8 @@ async def lifespan(app: FastAPI):
     logger.info("VF Intelligence Platform ready!")
     yield
     logger.info("Shutting down VF Intelligence Platform")
+    await llm_gateway.close()
+    conversation_store.close()
 
 
 app = FastAPI(
@@ -102,5 +129,13 @@ def root():
 
 
 @app.get("/health")
-def health():
-    return {"status": "ok", "facilities": len(data_store.facilities)}
+async def health():
+    # async so it runs on the event loop and never queues behind the threadpool
+    return {
+        "status": "ok",
+        "facilities": len(data_store.facilities),
+        "llm": llm_gateway.stats(),
+        "answer_cache": answer_cache.stats(),
+        "conversations": conversation_store.stats(),
+        "single_flight": single_flight.stats(),
+    }
@@ -27,6 +27,7 @@ class Facility(BaseModel):
     data_completeness: float = 0.0
     anomalies: List[str] = Field(default_factory=list)
     normalized_region: Optional[str] = None
+    district: Optional[str] = None
 
 
 class FacilitySummary(BaseModel):
@@ -45,6 +46,9 @@ class FacilitySummary(BaseModel):
 
 class RegionStats(BaseModel):
     region: str
+    level: str = "region"
+    parent: Optional[str] = None
+    population: int = 0
     total_facilities: int = 0
     hospitals: int = 0
     clinics: int = 0
@@ -66,3 +70,8 @@ class DataQualityStats(BaseModel):
     avg_completeness: float = 0.0
     completeness_by_region: dict = Field(default_factory=dict)
     completeness_by_field: dict = Field(default_factory=dict)
+    regions_assigned_by_boundary: int = 0
+    region_boundary_mismatches: int = 0
+    entity_clusters: int = 0
+    facilities_in_entity_clusters: int = 0
+    entities_collapsed: int = 0
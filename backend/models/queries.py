@@ -1,10 +1,12 @@
-from typing import List, Optional
+from typing import List, Literal, Optional
 from pydantic import BaseModel, Field
 
 
 class ChatRequest(BaseModel):
     message: str
     conversation_id: Optional[str] = None
+    # "pipeline" (classify, retrieve, generate) or "tools" (model-driven tool calls); defaults to settings
+    mode: Optional[Literal["pipeline", "tools"]] = None
 
 
 class AgentStep(BaseModel):
@@ -16,12 +18,17 @@ class AgentStep(BaseModel):
     data_sources: List[str] = Field(default_factory=list)
     citations: List[dict] = Field(default_factory=list)
     duration_ms: Optional[int] = None
+    # Offset from the start of the request; stages that ran concurrently overlap
+    started_ms: Optional[int] = None
+    # True when the step was replayed from the answer cache rather than run for this request
+    cached: bool = False
 
 
 class GeospatialLocation(BaseModel):
     label: Optional[str] = None
     coords: Optional[List[float]] = None
     source: Optional[str] = None
+    region: Optional[str] = None
 
 
 class GeospatialFacility(BaseModel):
@@ -56,6 +63,7 @@ class ChatResponse(BaseModel):
     visualization_hint: Optional[str] = None
     conversation_id: str = ""
     geospatial: Optional[GeospatialResponse] = None
+    cached: bool = False
 
 
 class GeospatialRequest(BaseModel):
@@ -72,6 +80,36 @@ class GeospatialRequest(BaseModel):
     limit_cold_spots: int = 10
 
 
+class SitingRequest(BaseModel):
+    capability: str
+    k: int = Field(5, ge=1, le=50)
+    radius_km: float = Field(40.0, gt=0, le=300)
+    candidates: Literal["towns", "grid"] = "towns"
+    grid_step_deg: float = Field(0.25, ge=0.05, le=1.0)
+    facility_type: Optional[str] = None
+    create_plans: bool = False
+
+
+class ScenarioFacility(BaseModel):
+    name: Optional[str] = None
+    lat: float = Field(..., ge=-90, le=90)
+    lng: float = Field(..., ge=-180, le=180)
+    region: Optional[str] = None
+    facility_type: Optional[str] = None
+    capabilities: List[str] = Field(default_factory=list)
+
+
+class ScenarioRequest(BaseModel):
+    name: Optional[str] = None
+    add: List[ScenarioFacility] = Field(default_factory=list)
+    remove: List[str] = Field(default_factory=list)
+    radius_km: float = Field(50.0, gt=0, le=300)
+
+
+class ScenarioCompareRequest(BaseModel):
+    scenarios: List[ScenarioRequest] = Field(..., min_length=1, max_length=20)
+
+
 class FacilitySearchRequest(BaseModel):
     query: str
     top_k: int = 10
@@ -1,41 +1,136 @@
-from fastapi import APIRouter
+import json
+from datetime import datetime, timezone
+from typing import Dict, List, Literal, Optional
 
-from services.data_loader import data_store, CAPABILITY_CATEGORIES, REGION_POPULATIONS
+from fastapi import APIRouter, HTTPException, Query, Request
+
+from models.queries import ScenarioCompareRequest, ScenarioRequest, SitingRequest
+from services.access import access_engine
+from services.anomaly_rules import anomaly_engine
+from services.cube import aggregation_cube, DIMENSIONS
+from services.data_loader import data_store, CAPABILITY_CATEGORIES
+from services.desert_analysis import analyze_deserts
+from services.plan_store import plan_store
+from services.profiler import data_profiler
+from services.region_network import region_network
+from services.response_cache import response_cache
+from services.scenario import scenario_engine
+from services.specialty_index import specialty_index
+from services.siting import optimize_sites
 
 router = APIRouter()
 
 
 @router.get("/medical-deserts")
-def get_medical_deserts():
-    """Get the full medical desert matrix (Region x Capability)."""
-    matrix = data_store.desert_matrix
+def get_medical_deserts(
+    request: Request,
+    mode: Literal["count", "access"] = "count",
+    catchment_km: float = Query(60.0, gt=0, le=300),
+    critical_max: int = Query(0, ge=0),
+    underserved_max: int = Query(2, ge=0),
+    desert_min_gaps: int = Query(3, ge=1),
+    facility_type: Optional[List[str]] = Query(None),
+    operator_type: Optional[List[str]] = Query(None),
+    taxonomy: Optional[str] = Query(None, description='JSON object: {"Category": ["keyword", ...]}'),
+    level: Literal["country", "region", "district"] = "region",
+):
+    """Get the full medical desert matrix (Region x Capability).
+
+    ``mode=access`` grades cells by 2SFCA population-weighted access scores
+    instead of raw facility counts. In count mode the thresholds, facility and
+    operator type filters and an optional custom keyword taxonomy are applied
+    on demand against the precomputed facility x capability incidence matrix,
+    at district, region or country ``level``.
+    """
+    if underserved_max < critical_max:
+        raise HTTPException(status_code=400, detail="underserved_max must be >= critical_max")
+    if mode == "access" and level != "region":
+        raise HTTPException(status_code=400, detail="mode=access is only available at level=region")
+    custom_taxonomy = _parse_taxonomy(taxonomy) if taxonomy else None
+    return response_cache.respond(request, lambda: _medical_deserts(
+        mode, catchment_km, critical_max, underserved_max, desert_min_gaps,
+        facility_type, operator_type, custom_taxonomy, level,
+    ))
+
+
+def _parse_taxonomy(raw: str) -> Dict[str, List[str]]:
+    try:
+        taxonomy = json.loads(raw)
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="taxonomy must be a JSON object")
+    if not isinstance(taxonomy, dict) or not taxonomy or not all(
+        isinstance(kws, list) and kws and all(isinstance(kw, str) and kw for kw in kws)
+        for kws in taxonomy.values()
+    ):
+        raise HTTPException(status_code=400, detail="taxonomy must map category names to keyword lists")
+    return taxonomy
+
+
+def _medical_deserts(
+    mode: str,
+    catchment_km: float,
+    critical_max: int = 0,
+    underserved_max: int = 2,
+    desert_min_gaps: int = 3,
+    facility_types: Optional[List[str]] = None,
+    operator_types: Optional[List[str]] = None,
+    taxonomy: Optional[Dict[str, List[str]]] = None,
+    level: str = "region",
+) -> dict:
+    analysis = analyze_deserts(
+        critical_max=critical_max,
+        underserved_max=underserved_max,
+        desert_min_gaps=desert_min_gaps,
+        facility_types=facility_types,
+        operator_types=operator_types,
+        taxonomy=taxonomy,
+        level=level,
+    )
+    matrix = access_engine.desert_matrix(catchment_km) if mode == "access" else analysis["matrix"]
     critical_regions = [
-        region for region, stats in data_store.region_stats.items()
-        if stats.is_medical_desert
+        region for region, flags in analysis["regions"].items()
+        if flags["is_medical_desert"]
     ]
     total_critical = sum(1 for e in matrix if e["status"] == "critical")
 
-    recommendations = _generate_recommendations()
+    recommendations = _generate_recommendations(analysis["regions"], level)
 
     return {
+        "mode": mode,
+        "level": level,
         "matrix": matrix,
-        "capabilities": CAPABILITY_CATEGORIES,
-        "regions": list(REGION_POPULATIONS.keys()),
+        "capabilities": CAPABILITY_CATEGORIES if mode == "access" else analysis["capabilities"],
+        "regions": list(analysis["regions"].keys()),
         "total_critical_gaps": total_critical,
         "critical_regions": critical_regions,
         "recommendations": recommendations,
+        "parameters": {
+            "critical_max": critical_max,
+            "underserved_max": underserved_max,
+            "desert_min_gaps": desert_min_gaps,
+            "facility_types": facility_types,
+            "operator_types": operator_types,
+            "custom_taxonomy": taxonomy is not None,
+        },
     }
 
 
 @router.get("/medical-deserts/{region}")
-def get_region_desert(region: str):
+def get_region_desert(request: Request, region: str):
     """Get medical desert analysis for a specific region."""
-    stats = data_store.region_stats.get(region)
+    return response_cache.respond(request, lambda: _region_desert(region))
+
+
+def _region_desert(region: str) -> dict:
+    stats = next((units[region] for units in data_store.unit_stats.values() if region in units), None)
     if not stats:
         return {"error": f"Region '{region}' not found"}
 
-    region_matrix = [e for e in data_store.desert_matrix if e["region"] == region]
-    population = REGION_POPULATIONS.get(region, 0)
+    if stats.level == "region":
+        region_matrix = [e for e in data_store.desert_matrix if e["region"] == region]
+    else:
+        region_matrix = [e for e in analyze_deserts(level=stats.level)["matrix"] if e["region"] == region]
+    population = stats.population
 
     return {
         "region": region,
@@ -47,8 +142,12 @@ def get_region_desert(region: str):
 
 
 @router.get("/anomalies")
-def get_anomalies():
+def get_anomalies(request: Request):
     """Get all detected anomalies across facilities."""
+    return response_cache.respond(request, _anomalies)
+
+
+def _anomalies() -> dict:
     anomalies = []
     for f in data_store.facilities:
         if f.anomalies:
@@ -58,6 +157,7 @@ def get_anomalies():
                 "facility_type": f.facility_type,
                 "region": f.normalized_region,
                 "anomalies": f.anomalies,
+                "details": anomaly_engine.flags.get(f.unique_id, []),
             })
 
     return {
@@ -67,60 +167,149 @@ def get_anomalies():
     }
 
 
+@router.get("/anomaly-rules")
+def list_anomaly_rules():
+    """List the active declarative rules and statistical detectors."""
+    return {"rules": anomaly_engine.rules, "statistical": anomaly_engine.detectors}
+
+
+@router.post("/anomaly-rules/reload")
+def reload_anomaly_rules():
+    """Re-read the rules file and re-evaluate all facilities."""
+    try:
+        flagged = data_store.reload_anomaly_rules()
+    except (ValueError, KeyError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid anomaly rules: {e}")
+    return {
+        "rules": len(anomaly_engine.rules),
+        "statistical": len(anomaly_engine.detectors),
+        "total_anomaly_count": flagged,
+    }
+
+
 @router.get("/data-quality")
-def get_data_quality():
+def get_data_quality(request: Request):
     """Get data quality statistics."""
+    return response_cache.respond(request, _data_quality)
+
+
+def _data_quality() -> dict:
     if data_store.data_quality:
         result = data_store.data_quality.model_dump()
-        # Add normalization log from region map
-        region_map = getattr(data_store, "_region_map", {})
-        normalization_examples = []
-        seen_afters = set()
-        for raw, normalized in region_map.items():
-            if raw.lower() != normalized.lower() and normalized not in seen_afters:
-                normalization_examples.append({
-                    "before": raw,
-                    "after": normalized,
-                    "status": "fixed",
-                })
-                seen_afters.add(normalized)
-            elif raw.lower() != normalized.lower():
-                normalization_examples.append({
-                    "before": raw,
-                    "after": normalized,
-                    "status": "fixed",
-                })
-        # Add city-inferred enrichment
-        normalization_examples.append({
-            "before": "(empty)",
-            "after": "Inferred from city",
-            "status": "enriched",
-        })
-        result["normalization_log"] = normalization_examples
+        result["normalization_log"] = data_store.normalization_log
+        result["entity_clusters"] = data_store.entity_clusters
+        result["oversized_entity_blocks"] = data_store.entity_block_stats.get("oversized_blocks", [])
         return result
     return {"error": "Data not loaded yet"}
 
 
+@router.get("/data-profile")
+def get_data_profile(request: Request):
+    """Per-field profile of the current data: fill rate, distinct count, top values, lengths."""
+    return response_cache.respond(request, _data_profile)
+
+
+def _data_profile() -> dict:
+    fields = data_profiler.history.get(data_store.version) or data_profiler.record(data_store.version)
+    return {
+        "version": data_store.version,
+        "recorded_versions": list(data_profiler.history),
+        "fields": fields,
+    }
+
+
+@router.get("/data-profile/compare")
+def compare_data_profiles(
+    request: Request,
+    base: Optional[int] = Query(None, description="Earlier data version (default: oldest recorded)"),
+    target: Optional[int] = Query(None, description="Later data version (default: current)"),
+):
+    """Per-field profile changes between two recorded data versions."""
+    versions = list(data_profiler.history)
+    base = versions[0] if base is None and versions else base
+    target = data_store.version if target is None else target
+    if base not in data_profiler.history or target not in data_profiler.history:
+        raise HTTPException(status_code=404, detail=f"Profiles are recorded for versions {versions}")
+    return response_cache.respond(request, lambda: data_profiler.compare(base, target))
+
+
 @router.get("/region-stats")
-def get_region_stats():
-    """Get per-region statistics."""
+def get_region_stats(request: Request, level: Literal["country", "region", "district"] = "region"):
+    """Get per-region statistics (or per district / country with ``level``)."""
+    return response_cache.respond(request, lambda: _region_stats(level))
+
+
+def _region_stats(level: str = "region") -> dict:
     return {
         region: {
             **stats.model_dump(),
-            "population": REGION_POPULATIONS.get(region, 0),
-            "facilities_per_100k": round(
-                stats.total_facilities / max(REGION_POPULATIONS.get(region, 1), 1) * 100000, 1
-            ),
+            "facilities_per_100k": round(stats.total_facilities / max(stats.population, 1) * 100000, 1),
         }
-        for region, stats in data_store.region_stats.items()
+        for region, stats in data_store.unit_stats[level].items()
     }
 
 
+@router.get("/aggregate")
+def get_aggregate(
+    request: Request,
+    group_by: str = Query("", description="Comma-separated dimensions, e.g. region,facility_type"),
+    filter: Optional[List[str]] = Query(None, description="Repeatable dimension:value[,value] filters"),
+):
+    """Roll up facility measures by any combination of cube dimensions.
+
+    Dimensions are region, facility_type, operator_type, has_anomalies and
+    capability; answers come from the pre-aggregated cube cells.
+    """
+    dims = [d.strip() for d in group_by.split(",") if d.strip()]
+    unknown = [d for d in dims if d not in DIMENSIONS]
+    if unknown or len(set(dims)) != len(dims):
+        raise HTTPException(status_code=400, detail=f"group_by must be distinct dimensions from {DIMENSIONS}")
+    filters: Dict[str, List[str]] = {}
+    for item in filter or []:
+        dim, sep, values = item.partition(":")
+        if not sep or dim not in DIMENSIONS or not values:
+            raise HTTPException(status_code=400, detail=f"Invalid filter '{item}', expected dimension:value[,value]")
+        filters.setdefault(dim, []).extend(v.strip() for v in values.split(","))
+    return response_cache.respond(request, lambda: {
+        "group_by": dims,
+        "filters": filters,
+        "rows": aggregation_cube.aggregate(dims, filters),
+    })
+
+
+@router.get("/access-scores")
+def get_access_scores(
+    request: Request,
+    capability: Optional[str] = None,
+    catchment_km: float = Query(60.0, gt=0, le=300),
+):
+    """Get 2SFCA population-weighted access scores per region and capability."""
+    if capability and capability not in CAPABILITY_CATEGORIES:
+        raise HTTPException(status_code=400, detail=f"Unknown capability '{capability}'")
+    return response_cache.respond(request, lambda: _access_scores(capability, catchment_km))
+
+
+def _access_scores(capability: Optional[str], catchment_km: float) -> dict:
+    scores = access_engine.compute(catchment_km)
+    if capability and "error" not in scores:
+        return {
+            **{k: v for k, v in scores.items() if k not in ("capabilities", "national", "regions")},
+            "capability": capability,
+            "national": scores["national"][capability],
+            "regions": {region: caps[capability] for region, caps in scores["regions"].items()},
+        }
+    return scores
+
+
 @router.get("/specialty-coverage")
-def get_specialty_coverage():
-    """Get specialty availability across regions."""
+def get_specialty_coverage(request: Request, level: Literal["country", "region", "district"] = "region"):
+    """Get specialty availability across regions (or districts / country with ``level``)."""
+    return response_cache.respond(request, lambda: _specialty_coverage(level))
+
+
+def _specialty_coverage(level: str = "region") -> dict:
     coverage = {}
-    for region, stats in data_store.region_stats.items():
+    for region, stats in data_store.unit_stats[level].items():
         coverage[region] = {
             "specialties": stats.specialties_available,
             "count": len(stats.specialties_available),
@@ -128,24 +317,127 @@ def get_specialty_coverage():
     return coverage
 
 
-def _generate_recommendations() -> list:
+@router.get("/regions/network")
+def get_region_network(request: Request):
+    """Region centroid distances, boundary adjacency and hop counts."""
+    return response_cache.respond(request, region_network.graph)
+
+
+@router.get("/nearest-capable")
+def get_nearest_capable(request: Request, region: Optional[str] = None, capability: Optional[str] = None):
+    """Nearest capable region and facility for each (region, capability) pair."""
+    if capability and capability not in CAPABILITY_CATEGORIES:
+        raise HTTPException(status_code=400, detail=f"Unknown capability '{capability}'")
+    return response_cache.respond(request, lambda: {"entries": region_network.table(region, capability)})
+
+
+@router.get("/specialties/matrix")
+def get_specialty_matrix(request: Request, level: Literal["country", "region", "district"] = "region"):
+    """Facility counts per specialty for every unit at ``level`` (nonzero cells only)."""
+    return response_cache.respond(request, lambda: _specialty_matrix(level))
+
+
+def _specialty_matrix(level: str) -> dict:
+    units = specialty_index.unit_matrix(level)
+    return {"level": level, "specialties": specialty_index.specialties, "units": units}
+
+
+@router.get("/specialties/cooccurrence")
+def get_specialty_cooccurrence(
+    request: Request,
+    specialty: Optional[str] = None,
+    top: int = Query(20, ge=1, le=200),
+):
+    """Specialty pairs most often offered by the same facility, with Jaccard and lift."""
+    if specialty and not specialty_index.has_specialty(specialty):
+        raise HTTPException(status_code=400, detail=f"Unknown specialty '{specialty}'")
+    return response_cache.respond(request, lambda: {
+        "specialty": specialty,
+        "pairs": specialty_index.cooccurring(specialty or None, top),
+    })
+
+
+@router.get("/specialties/gaps/{region}")
+def get_specialty_gaps(request: Request, region: str):
+    """Specialties missing in a region but available in its neighbouring regions."""
+    return response_cache.respond(request, lambda: _specialty_gaps(region))
+
+
+def _specialty_gaps(region: str) -> dict:
+    gaps = specialty_index.neighbour_gaps(region)
+    if gaps is None:
+        return {"error": f"Region '{region}' not found"}
+    return gaps
+
+
+@router.post("/siting")
+def optimize_siting(request: SitingRequest):
+    """Pick new sites that maximize newly covered population for a capability."""
+    if request.capability not in CAPABILITY_CATEGORIES:
+        raise HTTPException(status_code=400, detail=f"Unknown capability '{request.capability}'")
+
+    result = optimize_sites(
+        capability=request.capability,
+        k=request.k,
+        radius_km=request.radius_km,
+        candidates=request.candidates,
+        grid_step_deg=request.grid_step_deg,
+        facility_type=request.facility_type,
+    )
+
+    if request.create_plans and "error" not in result:
+        created_at = datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+        result["plans"] = [
+            plan_store.create({**draft, "created_at": created_at})
+            for draft in result["plan_drafts"]
+        ]
+    return result
+
+
+@router.post("/scenario")
+def evaluate_scenario(request: ScenarioRequest):
+    """Simulate adding/removing facilities and return desert matrix, flag and cold-spot deltas."""
+    return _evaluate_scenario(request)
+
+
+@router.post("/scenarios/compare")
+def compare_scenarios(request: ScenarioCompareRequest):
+    """Evaluate several scenarios against the same baseline, side by side."""
+    return {"scenarios": [_evaluate_scenario(scenario) for scenario in request.scenarios]}
+
+
+def _evaluate_scenario(scenario: ScenarioRequest) -> dict:
+    for item in scenario.add:
+        unknown = [cap for cap in item.capabilities if cap not in CAPABILITY_CATEGORIES]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown capability '{unknown[0]}'")
+        if item.region and item.region not in data_store.region_stats:
+            raise HTTPException(status_code=400, detail=f"Unknown region '{item.region}'")
+    result = scenario_engine.evaluate(
+        add=[item.model_dump() for item in scenario.add],
+        remove=scenario.remove,
+        radius_km=scenario.radius_km,
+    )
+    return {"name": scenario.name, **result}
+
+
+def _generate_recommendations(region_flags: Dict[str, dict], level: str = "region") -> list:
     """Generate AI-style recommendations based on desert analysis."""
     recommendations = []
     priority_order = 0
 
-    for region, stats in data_store.region_stats.items():
-        if not stats.desert_gaps:
+    for region, flags in region_flags.items():
+        if not flags["desert_gaps"]:
             continue
 
-        population = REGION_POPULATIONS.get(region, 0)
+        population = flags["population"]
 
-        for gap in stats.desert_gaps:
+        for gap in flags["desert_gaps"]:
             priority_order += 1
-            # Find nearest region with the capability
-            nearest = _find_nearest_region_with_capability(region, gap)
+            nearest, nearest_facility = _nearest_with_capability(region, flags, gap, level)
 
-            severity = "CRITICAL" if stats.total_facilities < 20 else "HIGH"
-            if population > 1_000_000 and stats.total_facilities == 0:
+            severity = "CRITICAL" if flags["total_facilities"] < 20 else "HIGH"
+            if population > 1_000_000 and flags["total_facilities"] == 0:
                 severity = "CRITICAL"
 
             recommendations.append({
@@ -154,12 +446,15 @@ def _generate_recommendations() -> list:
                 "gap": gap,
                 "severity": severity,
                 "population_affected": population,
-                "total_facilities_in_region": stats.total_facilities,
+                "total_facilities_in_region": flags["total_facilities"],
                 "nearest_region_with_capability": nearest,
+                "nearest_capable_facility": nearest_facility,
                 "recommendation": f"Deploy {gap.lower()} services to {region}. "
-                                  f"Currently 0 facilities offer this in a region with "
+                                  f"Currently {flags['gap_counts'][gap]} facilities offer this in a {level} with "
                                   f"an estimated population of {population:,}. "
-                                  f"Nearest {gap.lower()} is in {nearest}.",
+                                  f"Nearest {gap.lower()} is in {nearest}"
+                                  + (f" ({nearest_facility['name']}, {nearest_facility['distance_km']} km)."
+                                     if nearest_facility else "."),
             })
 
     # Sort by severity then population
@@ -169,11 +464,16 @@ def _generate_recommendations() -> list:
     return recommendations
 
 
-def _find_nearest_region_with_capability(region: str, capability: str) -> str:
-    """Find the nearest region that has a given capability."""
-    for r, stats in data_store.region_stats.items():
-        if r == region:
-            continue
-        if stats.capabilities_coverage.get(capability, 0) > 0:
-            return r
-    return "Unknown"
+def _nearest_with_capability(unit: str, flags: dict, capability: str, level: str):
+    """Nearest region offering a capability (and its closest facility) for a desert unit.
+
+    Districts use their region's entry; if the region itself offers the
+    capability, the answer is elsewhere in that region.
+    """
+    region = unit if level == "region" else flags.get("parent")
+    entry = region_network.nearest(region, capability) if region else None
+    if entry is None:
+        return "Unknown", None
+    if level != "region" and entry["facilities_in_region"] > 0:
+        return region, entry["nearest_facility"]
+    return entry["nearest_region"] or "Unknown", entry["nearest_facility"]
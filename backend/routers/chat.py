@@ -1,4 +1,9 @@
+from typing import Literal
+
+import orjson
 from fastapi import APIRouter
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 
 from agents.supervisor import agent_supervisor
 from models.queries import ChatRequest
@@ -7,15 +12,52 @@ router = APIRouter()
 
 
 @router.post("/query")
-def chat_query(request: ChatRequest):
+async def chat_query(request: ChatRequest):
     """Process a natural language query through the agent pipeline."""
-    result = agent_supervisor.handle_query(
+    result = await agent_supervisor.handle_query(
         message=request.message,
         conversation_id=request.conversation_id,
+        mode=request.mode,
     )
     return result.model_dump()
 
 
+@router.post("/stream")
+async def chat_stream(request: ChatRequest, format: Literal["sse", "ndjson"] = "sse"):
+    """Stream the agent pipeline: each trace step as it completes, then answer tokens.
+
+    Events are ``step`` (an AgentStep), ``token`` (``{"text": ...}``) and a final
+    ``done`` carrying the full response (answer, sources, geospatial payload).
+    ``format=sse`` emits Server-Sent Events; ``format=ndjson`` one JSON object
+    per line with a ``type`` field.
+    """
+    async def events():
+        async for event in agent_supervisor.stream_query(
+            message=request.message,
+            conversation_id=request.conversation_id,
+            mode=request.mode,
+        ):
+            kind = event["type"]
+            if kind == "step":
+                payload = event["step"].model_dump()
+            elif kind == "token":
+                payload = {"text": event["text"]}
+            else:
+                payload = event["response"].model_dump()
+            payload = jsonable_encoder(payload)
+            if format == "ndjson":
+                yield orjson.dumps({"type": kind, "data": payload}) + b"\n"
+            else:
+                yield b"event: " + kind.encode() + b"\ndata: " + orjson.dumps(payload) + b"\n\n"
+
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/event-stream"
+    return StreamingResponse(
+        events(),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/suggested-queries")
 def get_suggested_queries():
     """Return a set of example queries for the UI."""
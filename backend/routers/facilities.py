@@ -1,8 +1,13 @@
 from typing import Optional, List
-from fastapi import APIRouter, Query, HTTPException
+from fastapi import APIRouter, Query, HTTPException, Request
 
-from services.data_loader import data_store
+from services.cube import aggregation_cube
+from services.data_loader import data_store, CAPABILITY_CATEGORIES
 from services.vector_store import vector_store
+from services.map_index import map_index
+from services.referral_graph import referral_graph
+from services.response_cache import response_cache
+from services.single_flight import single_flight
 from models.facility import Facility, FacilitySummary
 
 router = APIRouter()
@@ -55,51 +60,62 @@ def list_facilities(
 
 
 @router.get("/all-map-data")
-def get_all_map_data():
+def get_all_map_data(request: Request):
     """Get minimal facility data for map rendering (all facilities)."""
-    return [
-        {
-            "unique_id": f.unique_id,
-            "name": f.name,
-            "facility_type": f.facility_type,
-            "lat": f.lat,
-            "lng": f.lng,
-            "region": f.normalized_region,
-            "specialties_count": len(f.specialties),
-            "capabilities_count": len(f.capabilities),
-            "has_anomalies": len(f.anomalies) > 0,
-        }
-        for f in data_store.facilities
-        if f.lat is not None and f.lng is not None
-    ]
+    return response_cache.respond(request, lambda: map_index.points)
+
+
+@router.get("/map")
+def get_map_viewport(
+    request: Request,
+    bbox: str = Query(..., description="west,south,east,north in degrees"),
+    zoom: int = Query(..., ge=0, le=22),
+):
+    """Get zoom-aware marker clusters and single points inside the viewport."""
+    try:
+        west, south, east, north = (float(v) for v in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox must be 'west,south,east,north'")
+    if west > east or south > north:
+        raise HTTPException(status_code=400, detail="bbox must be 'west,south,east,north'")
+
+    return response_cache.respond(
+        request,
+        lambda: {"bbox": [west, south, east, north], **map_index.query((west, south, east, north), zoom)},
+    )
 
 
 @router.get("/stats")
-def get_stats():
+def get_stats(request: Request):
     """Get aggregate facility statistics."""
-    facilities = data_store.facilities
-    types = {}
-    regions = {}
-    for f in facilities:
-        t = f.facility_type or "unknown"
-        types[t] = types.get(t, 0) + 1
-        r = f.normalized_region or "Unknown"
-        regions[r] = regions.get(r, 0) + 1
+    return response_cache.respond(request, _stats)
 
+
+def _stats() -> dict:
+    by_type = aggregation_cube.aggregate(["facility_type"])
+    by_region = aggregation_cube.aggregate(["region"])
+    by_anomaly = {row["has_anomalies"]: row["facilities"] for row in aggregation_cube.aggregate(["has_anomalies"])}
+    total = aggregation_cube.aggregate([])
     return {
-        "total": len(facilities),
-        "by_type": types,
-        "by_region": dict(sorted(regions.items(), key=lambda x: x[1], reverse=True)),
-        "with_anomalies": sum(1 for f in facilities if f.anomalies),
-        "avg_completeness": round(
-            sum(f.data_completeness for f in facilities) / max(len(facilities), 1) * 100, 1
-        ),
+        "total": total[0]["facilities"] if total else 0,
+        "by_type": {row["facility_type"]: row["facilities"] for row in by_type},
+        "by_region": {row["region"]: row["facilities"] for row in by_region},
+        "with_anomalies": by_anomaly.get("yes", 0),
+        "avg_completeness": total[0]["avg_completeness"] if total else 0.0,
     }
 
 
 @router.get("/search")
 def search_facilities(q: str = Query(..., min_length=1), top_k: int = Query(10, ge=1, le=50)):
-    """Semantic search across facilities."""
+    """Semantic search across facilities.
+
+    Identical concurrent searches share one embedding call and search.
+    """
+    return single_flight.run("facility_search", (" ".join(q.lower().split()), top_k),
+                             lambda: _search(q, top_k))
+
+
+def _search(q: str, top_k: int) -> dict:
     results = vector_store.search(q, top_k=top_k)
     return {
         "query": q,
@@ -115,8 +131,12 @@ def search_facilities(q: str = Query(..., min_length=1), top_k: int = Query(10,
 
 
 @router.get("/regions")
-def list_regions():
+def list_regions(request: Request):
     """Get all regions with facility counts."""
+    return response_cache.respond(request, _regions)
+
+
+def _regions() -> dict:
     return {
         region: {
             "total_facilities": stats.total_facilities,
@@ -129,6 +149,26 @@ def list_regions():
     }
 
 
+@router.get("/{unique_id}/referrals")
+def get_facility_referrals(
+    unique_id: str,
+    capability: Optional[str] = None,
+    limit: int = Query(5, ge=1, le=20),
+):
+    """Get the nearest facilities offering each capability (precomputed referral graph)."""
+    facility = data_store.get_facility(unique_id)
+    if not facility:
+        raise HTTPException(status_code=404, detail="Facility not found")
+    if capability and capability not in CAPABILITY_CATEGORIES:
+        raise HTTPException(status_code=400, detail=f"Unknown capability '{capability}'")
+
+    return {
+        "facility_id": facility.unique_id,
+        "facility_name": facility.name,
+        "referrals": referral_graph.referrals(unique_id, capability, limit) or {},
+    }
+
+
 @router.get("/{unique_id}")
 def get_facility(unique_id: str):
     """Get a single facility by ID."""
@@ -2,6 +2,7 @@ from fastapi import APIRouter, HTTPException
 
 from services.data_loader import data_store
 from services.idp_engine import idp_engine
+from services.single_flight import single_flight
 from models.queries import IDPExtractRequest
 
 router = APIRouter()
@@ -9,12 +10,15 @@ router = APIRouter()
 
 @router.post("/extract")
 def extract_facility(request: IDPExtractRequest):
-    """Run IDP extraction on a single facility."""
+    """Run IDP extraction on a single facility.
+
+    Concurrent requests for the same facility share one extraction.
+    """
     facility = data_store.get_facility(request.facility_id)
     if not facility:
         raise HTTPException(status_code=404, detail=f"Facility '{request.facility_id}' not found")
 
-    result = idp_engine.extract(facility)
+    result = single_flight.run("idp_extract", facility.unique_id, lambda: idp_engine.extract(facility))
     return result.model_dump()
 
 
@@ -0,0 +1,145 @@
+import math
+from typing import Dict, Tuple
+
+import numpy as np
+
+from services.data_loader import data_store, CAPABILITY_CATEGORIES, REGION_POPULATIONS
+from services.geospatial import haversine_matrix
+from services.population import population_grid
+
+
+def gaussian_decay(d: np.ndarray, catchment_km: float) -> np.ndarray:
+    """Gaussian distance decay normalized to 1 at d=0 and 0 at the catchment edge."""
+    edge = math.exp(-0.5)
+    return (np.exp(-0.5 * (d / catchment_km) ** 2) - edge) / (1 - edge)
+
+
+class AccessEngine:
+    """Two-step floating catchment area (2SFCA) access scores per capability.
+
+    Demand is the population grid, supply is every geocoded facility offering a
+    capability. Cell-to-facility weights within the catchment are held as a
+    sparse coordinate list, so both 2SFCA steps reduce to ``np.bincount``
+    passes. Results are cached per data version and catchment size.
+    """
+
+    def __init__(self, chunk_rows: int = 4096):
+        self.chunk_rows = chunk_rows
+        self._cache: Dict[Tuple[int, float], dict] = {}
+
+    def compute(self, catchment_km: float = 60.0) -> dict:
+        key = (data_store.version, float(catchment_km))
+        if key in self._cache:
+            return self._cache[key]
+
+        grid = population_grid()
+        if grid is None:
+            return {"error": "Data not loaded yet"}
+
+        located = np.array(
+            [f.lat is not None and f.lng is not None for f in data_store.facilities], dtype=bool
+        )
+        f_lat = np.array([f.lat for f, ok in zip(data_store.facilities, located) if ok], dtype=np.float64)
+        f_lng = np.array([f.lng for f, ok in zip(data_store.facilities, located) if ok], dtype=np.float64)
+        supply = data_store.capability_matrix[located].astype(np.float64)
+        pop = grid["population"]
+        n_cells, n_fac = len(pop), len(f_lat)
+
+        # Sparse cell x facility decay weights inside the catchment
+        rows, cols, weights = [], [], []
+        for start in range(0, n_cells, self.chunk_rows):
+            d = haversine_matrix(
+                grid["lat"][start:start + self.chunk_rows], grid["lng"][start:start + self.chunk_rows],
+                f_lat, f_lng,
+            )
+            r, c = np.nonzero(d <= catchment_km)
+            rows.append(r + start)
+            cols.append(c)
+            weights.append(gaussian_decay(d[r, c].astype(np.float64), catchment_km))
+        rows = np.concatenate(rows) if rows else np.array([], dtype=np.int64)
+        cols = np.concatenate(cols) if cols else np.array([], dtype=np.int64)
+        weights = np.concatenate(weights) if weights else np.array([], dtype=np.float64)
+
+        # Step 1: supply-to-demand ratio at each facility
+        demand = np.bincount(cols, weights=pop[rows] * weights, minlength=n_fac)
+        ratio = np.divide(supply, demand[:, None], out=np.zeros_like(supply), where=demand[:, None] > 0)
+
+        # Step 2: sum the reachable ratios at each population cell
+        access = np.column_stack([
+            np.bincount(rows, weights=weights * ratio[cols, c], minlength=n_cells)
+            for c in range(len(CAPABILITY_CATEGORIES))
+        ]) if n_fac else np.zeros((n_cells, len(CAPABILITY_CATEGORIES)))
+
+        # Population-weighted regional and national averages, per 100k people
+        regions = list(REGION_POPULATIONS.keys())
+        codes = np.array([regions.index(r) if r in REGION_POPULATIONS else -1 for r in grid["region"]])
+        inside = codes >= 0
+        weighted = access[inside] * pop[inside, None]
+        region_pop = np.bincount(codes[inside], weights=pop[inside], minlength=len(regions))
+        region_access = np.column_stack([
+            np.bincount(codes[inside], weights=weighted[:, c], minlength=len(regions))
+            for c in range(len(CAPABILITY_CATEGORIES))
+        ]) / np.maximum(region_pop, 1)[:, None] * 100_000
+        national = weighted.sum(axis=0) / max(pop[inside].sum(), 1) * 100_000
+        unserved = np.column_stack([
+            np.bincount(codes[inside], weights=pop[inside] * (access[inside, c] == 0), minlength=len(regions))
+            for c in range(len(CAPABILITY_CATEGORIES))
+        ])
+
+        result = {
+            "version": data_store.version,
+            "catchment_km": float(catchment_km),
+            "units": "capable facilities per 100k population (2SFCA, gaussian decay)",
+            "capabilities": CAPABILITY_CATEGORIES,
+            "national": {
+                cap: round(float(national[c]), 3) for c, cap in enumerate(CAPABILITY_CATEGORIES)
+            },
+            "regions": {
+                region: {
+                    cap: {
+                        "access_score": round(float(region_access[r, c]), 3),
+                        "population_without_access": int(round(unserved[r, c])),
+                    }
+                    for c, cap in enumerate(CAPABILITY_CATEGORIES)
+                }
+                for r, region in enumerate(regions)
+            },
+        }
+        self._cache = {k: v for k, v in self._cache.items() if k[0] == data_store.version}
+        self._cache[key] = result
+        return result
+
+    def desert_matrix(self, catchment_km: float = 60.0, underserved_ratio: float = 0.5) -> list:
+        """Region x capability matrix graded by access score instead of raw counts.
+
+        A cell is critical when its population-weighted access is zero,
+        underserved when below ``underserved_ratio`` of the national score.
+        """
+        scores = self.compute(catchment_km)
+        if "error" in scores:
+            return []
+        matrix = []
+        for region, caps in scores["regions"].items():
+            for cap in CAPABILITY_CATEGORIES:
+                score = caps[cap]["access_score"]
+                national = scores["national"][cap]
+                if score == 0:
+                    status = "critical"
+                elif score < national * underserved_ratio:
+                    status = "underserved"
+                else:
+                    status = "adequate"
+                stats = data_store.region_stats.get(region)
+                matrix.append({
+                    "region": region,
+                    "capability": cap,
+                    "facility_count": stats.capabilities_coverage.get(cap, 0) if stats else 0,
+                    "access_score": score,
+                    "population_without_access": caps[cap]["population_without_access"],
+                    "status": status,
+                })
+        return matrix
+
+
+# Global access engine instance
+access_engine = AccessEngine()
@@ -0,0 +1,115 @@
+import json
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+DATA_DIR = Path(__file__).parent.parent / "data"
+DISTRICTS_FILE = DATA_DIR / "ghana_districts.json"
+
+LEVELS = ["country", "region", "district"]
+
+
+class AdminHierarchy:
+    """Country -> region -> district tree with populations per node.
+
+    Nodes are stored in breadth-first order as parallel lists, so any measure
+    computed per district (leaf) is rolled up to every ancestor by one pass in
+    reverse order, each node adding its value into its parent. Every region has
+    a ``Rest of <Region>`` leaf holding the population and facilities not
+    matched to a listed district, so leaves always sum to their region.
+    """
+
+    def __init__(self, country: str = "Ghana"):
+        self.country = country
+        self.names: List[str] = []
+        self.levels: List[str] = []
+        self.parent = np.zeros(0, dtype=np.int64)
+        self.population = np.zeros(0, dtype=np.float64)
+        self.children: List[List[int]] = []
+        self.leaves = np.zeros(0, dtype=np.int64)
+        self._index: Dict[str, int] = {}
+        self._locality: Dict[tuple, int] = {}
+        self._rest: Dict[str, int] = {}
+
+    def load(self, region_populations: Dict[str, int], path: Path = DISTRICTS_FILE):
+        """Build the tree from reference districts nested under the given regions."""
+        with open(path) as f:
+            districts = json.load(f).get("regions", {})
+
+        names, levels, parents, population = [self.country], ["country"], [-1], [float(sum(region_populations.values()))]
+        region_nodes = {}
+        for region, total in region_populations.items():
+            region_nodes[region] = len(names)
+            names.append(region)
+            levels.append("region")
+            parents.append(0)
+            population.append(float(total))
+
+        self._locality, self._rest = {}, {}
+        for region, total in region_populations.items():
+            listed = districts.get(region, [])
+            for district in listed:
+                node = len(names)
+                names.append(district["name"])
+                levels.append("district")
+                parents.append(region_nodes[region])
+                population.append(float(district.get("population", 0)))
+                for locality in district.get("localities", []):
+                    self._locality[(region, locality.lower())] = node
+            self._rest[region] = len(names)
+            names.append(f"Rest of {region}")
+            levels.append("district")
+            parents.append(region_nodes[region])
+            population.append(max(float(total) - sum(d.get("population", 0) for d in listed), 0.0))
+
+        self.names, self.levels = names, levels
+        self.parent = np.array(parents, dtype=np.int64)
+        self.population = np.array(population, dtype=np.float64)
+        self.children = [[] for _ in names]
+        for node, p in enumerate(parents):
+            if p >= 0:
+                self.children[p].append(node)
+        self.leaves = np.array([i for i, level in enumerate(levels) if level == "district"], dtype=np.int64)
+        self._index = {name: i for i, name in enumerate(names)}
+        return self
+
+    def district_for(self, region: Optional[str], city: Optional[str]) -> Optional[str]:
+        """District of a facility from its region and locality, or None outside known regions."""
+        if region not in self._rest:
+            return None
+        node = self._locality.get((region, (city or "").strip().lower()), self._rest[region])
+        return self.names[node]
+
+    def node(self, name: str) -> Optional[int]:
+        return self._index.get(name)
+
+    def nodes_at(self, level: str) -> List[int]:
+        return [i for i, lv in enumerate(self.levels) if lv == level]
+
+    def parent_name(self, node: int) -> Optional[str]:
+        p = self.parent[node]
+        return self.names[p] if p >= 0 else None
+
+    def rollup(self, leaf_values: np.ndarray) -> np.ndarray:
+        """Sum per-leaf rows (aligned with ``self.leaves``) up to every node of the tree."""
+        leaf_values = np.asarray(leaf_values, dtype=np.float64)
+        totals = np.zeros((len(self.names),) + leaf_values.shape[1:], dtype=np.float64)
+        totals[self.leaves] = leaf_values
+        for node in range(len(self.names) - 1, 0, -1):
+            totals[self.parent[node]] += totals[node]
+        return totals
+
+    def rollup_sets(self, leaf_sets: List[set]) -> List[set]:
+        """Union per-leaf sets up the tree (same ordering as :meth:`rollup`)."""
+        sets = [set() for _ in self.names]
+        for leaf, values in zip(self.leaves.tolist(), leaf_sets):
+            sets[leaf] = set(values)
+        for node in range(len(self.names) - 1, 0, -1):
+            sets[self.parent[node]] |= sets[node]
+        return sets
+
+
+# Global administrative hierarchy instance
+admin_hierarchy = AdminHierarchy()
@@ -0,0 +1,224 @@
+import json
+import re
+import string
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from models.facility import Facility
+
+
+DATA_DIR = Path(__file__).parent.parent / "data"
+RULES_FILE = DATA_DIR / "anomaly_rules.json"
+
+# Scale factors that make MAD / mean absolute deviation consistent with a normal sigma
+MAD_SCALE = 0.6745
+MEANAD_SCALE = 1.253314
+
+
+def facility_columns(facilities: List[Facility]) -> Dict[str, np.ndarray]:
+    """Columnar view of the fields rules and detectors can reference."""
+    def number(values):
+        return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+    return {
+        "unique_id": np.array([f.unique_id for f in facilities], dtype=object),
+        "facility_type": np.array([f.facility_type or "" for f in facilities], dtype=object),
+        "operator_type": np.array([f.operator_type or "" for f in facilities], dtype=object),
+        "region": np.array([f.normalized_region or "" for f in facilities], dtype=object),
+        "capability_text": np.array([" ".join(f.capabilities).lower() for f in facilities], dtype=object),
+        "procedure_text": np.array([" ".join(f.procedures).lower() for f in facilities], dtype=object),
+        "equipment_text": np.array([" ".join(f.equipment).lower() for f in facilities], dtype=object),
+        "specialty_count": np.array([len(f.specialties) for f in facilities], dtype=np.int64),
+        "capability_count": np.array([len(f.capabilities) for f in facilities], dtype=np.int64),
+        "procedure_count": np.array([len(f.procedures) for f in facilities], dtype=np.int64),
+        "equipment_count": np.array([len(f.equipment) for f in facilities], dtype=np.int64),
+        "capacity": number(f.capacity for f in facilities),
+        "number_doctors": number(f.number_doctors for f in facilities),
+        "year_established": number(f.year_established for f in facilities),
+        "data_completeness": number(f.data_completeness for f in facilities),
+    }
+
+
+def _cost(spec: dict) -> int:
+    """Rough evaluation cost, so cheap numeric checks narrow rows before text scans."""
+    return 1 if "contains_any" in json.dumps(spec) else 0
+
+
+def evaluate_predicate(spec: dict, columns: Dict[str, np.ndarray], rows: Optional[np.ndarray] = None) -> np.ndarray:
+    """Boolean mask for a declarative predicate over whole columns.
+
+    ``all``/``any`` short-circuit: each sub-predicate only sees the rows whose
+    outcome is still undecided. ``rows`` restricts evaluation to a subset.
+    """
+    if rows is None:
+        rows = np.arange(len(columns["unique_id"]))
+    if "all" in spec or "any" in spec:
+        conjunction = "all" in spec
+        mask = np.full(len(rows), conjunction, dtype=bool)
+        for sub in sorted(spec["all" if conjunction else "any"], key=_cost):
+            pending = mask if conjunction else ~mask
+            if not pending.any():
+                break
+            hits = evaluate_predicate(sub, columns, rows[pending])
+            mask[pending] = hits
+        return mask
+    if "not" in spec:
+        return ~evaluate_predicate(spec["not"], columns, rows)
+
+    col = columns[spec["field"]][rows]
+    if "eq" in spec:
+        return col == spec["eq"]
+    if "ne" in spec:
+        return col != spec["ne"]
+    if "in" in spec:
+        return np.isin(col, spec["in"])
+    if "gt" in spec:
+        return col > spec["gt"]
+    if "gte" in spec:
+        return col >= spec["gte"]
+    if "lt" in spec:
+        return col < spec["lt"]
+    if "lte" in spec:
+        return col <= spec["lte"]
+    if "contains_any" in spec:
+        pattern = "|".join(re.escape(kw.lower()) for kw in spec["contains_any"])
+        return pd.Series(col, dtype=object).str.contains(pattern, regex=True).to_numpy(dtype=bool)
+    if "is_null" in spec:
+        return np.isnan(col) == bool(spec["is_null"])
+    raise ValueError(f"Unsupported predicate: {spec}")
+
+
+def robust_z(values: np.ndarray, groups: np.ndarray, min_group_size: int) -> np.ndarray:
+    """Per-group robust z-scores (median/MAD, falling back to mean absolute deviation).
+
+    NaN where the value is missing, the group is too small or has no spread.
+    """
+    s = pd.Series(values)
+    g = pd.Series(groups)
+    median = s.groupby(g).transform("median")
+    deviation = (s - median).abs()
+    mad = deviation.groupby(g).transform("median")
+    mean_ad = deviation.groupby(g).transform("mean")
+    size = s.groupby(g).transform("count")
+    scale = np.where(mad > 0, mad / MAD_SCALE, mean_ad * MEANAD_SCALE)
+    z = np.divide((s - median).to_numpy(), scale, out=np.full(len(s), np.nan), where=scale > 0)
+    z[(size < min_group_size).to_numpy()] = np.nan
+    return z
+
+
+class AnomalyRuleEngine:
+    """Declarative anomaly rules plus statistical outlier detectors.
+
+    Rules (``data/anomaly_rules.json``) are column predicates evaluated in bulk
+    over a columnar view of the facilities. Detectors flag numeric fields whose
+    robust z-score within their group exceeds a threshold. The rules file is
+    re-read when it changes on disk (checked on every evaluation, upsert and
+    removal; a changed file re-evaluates every facility). Otherwise on upserts
+    only the changed row is re-checked against the rules, and detectors
+    rescore just the affected group.
+    """
+
+    def __init__(self, path: Path = RULES_FILE):
+        self.path = path
+        self.rules: List[dict] = []
+        self.detectors: List[dict] = []
+        self.flags: Dict[str, List[dict]] = {}
+        self._mtime: Optional[float] = None
+
+    def load(self):
+        with open(self.path, encoding="utf-8") as f:
+            config = json.load(f)
+        self.rules = config.get("rules", [])
+        self.detectors = config.get("statistical", [])
+        self._mtime = self.path.stat().st_mtime
+        return self
+
+    def reload_if_changed(self) -> bool:
+        """Reload the rules file if it was modified since the last load."""
+        if self._mtime is not None and self.path.stat().st_mtime == self._mtime:
+            return False
+        self.load()
+        return True
+
+    def evaluate(self, facilities: List[Facility]) -> Dict[str, List[dict]]:
+        """Run every rule and detector over all facilities, replacing current flags."""
+        self.reload_if_changed()
+        columns = facility_columns(facilities)
+        self.flags = {uid: [] for uid in columns["unique_id"]}
+        for uid, flag in self._rule_flags(columns):
+            self.flags[uid].append(flag)
+        for detector in self.detectors:
+            for uid, flag in self._detector_flags(detector, columns):
+                self.flags[uid].append(flag)
+        return self.flags
+
+    def update(self, facilities: List[Facility], facility: Facility, previous: Optional[Facility] = None):
+        """Re-check one upserted facility and rescore the groups it left or joined."""
+        if self.reload_if_changed():
+            self.evaluate(facilities)
+            return
+        kept = [f for f in self.flags.get(facility.unique_id, []) if f["kind"] == "statistical"]
+        self.flags[facility.unique_id] = [flag for _, flag in self._rule_flags(facility_columns([facility]))] + kept
+        self._rescore_groups(facilities, [facility] + ([previous] if previous else []))
+
+    def remove(self, facilities: List[Facility], facility: Facility):
+        """Drop a removed facility's flags and rescore its groups."""
+        if self.reload_if_changed():
+            self.evaluate(facilities)
+            return
+        self.flags.pop(facility.unique_id, None)
+        self._rescore_groups(facilities, [facility])
+
+    def messages(self, unique_id: str) -> List[str]:
+        return [flag["message"] for flag in self.flags.get(unique_id, [])]
+
+    def _rescore_groups(self, facilities: List[Facility], changed: List[Facility]):
+        if not self.detectors:
+            return
+        members = facility_columns(facilities)
+        changed_columns = facility_columns(changed)
+        for detector in self.detectors:
+            key = detector["group_by"]
+            touched = set(changed_columns[key].tolist())
+            in_group = np.isin(members[key], list(touched))
+            columns = {name: col[in_group] for name, col in members.items()}
+            for uid in columns["unique_id"]:
+                if uid in self.flags:
+                    self.flags[uid] = [f for f in self.flags[uid] if f["rule_id"] != detector["id"]]
+            for uid, flag in self._detector_flags(detector, columns):
+                self.flags.setdefault(uid, []).append(flag)
+
+    def _rule_flags(self, columns: Dict[str, np.ndarray]):
+        for rule in self.rules:
+            hits = np.flatnonzero(evaluate_predicate(rule["when"], columns))
+            fields = [name for _, name, _, _ in string.Formatter().parse(rule["message"]) if name]
+            for i in hits:
+                yield columns["unique_id"][i], {
+                    "rule_id": rule["id"],
+                    "kind": "rule",
+                    "severity": rule.get("severity", "medium"),
+                    "message": rule["message"].format(**{name: columns[name][i] for name in fields}),
+                }
+
+    def _detector_flags(self, detector: dict, columns: Dict[str, np.ndarray]):
+        values = columns[detector["field"]]
+        groups = columns[detector["group_by"]]
+        z = robust_z(values, groups, detector.get("min_group_size", 8))
+        hits = np.flatnonzero(np.abs(np.nan_to_num(z)) > detector.get("threshold", 3.5))
+        for i in hits:
+            group = groups[i] or "facility of unknown type"
+            yield columns["unique_id"][i], {
+                "rule_id": detector["id"],
+                "kind": "statistical",
+                "severity": detector.get("severity", "medium"),
+                "message": detector["message"].format(value=values[i], group=group, z=z[i]),
+                "value": float(values[i]),
+                "z_score": round(float(z[i]), 2),
+            }
+
+
+# Global anomaly rule engine instance
+anomaly_engine = AnomalyRuleEngine()
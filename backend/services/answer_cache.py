@@ -0,0 +1,155 @@
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from config import get_settings
+from models.facility import Facility
+from models.queries import ChatResponse
+from services.data_loader import data_store
+from services.llm import llm_gateway
+from services.vector_store import vector_store
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(message: str) -> str:
+    """Lowercase, punctuation-free, single-spaced query text for exact matching."""
+    return " ".join(re.sub(r"[^\w\s]", " ", message.lower()).split())
+
+
+class AnswerCache:
+    """Chat answers keyed by normalized query text, with a semantic fallback.
+
+    Entries are scoped to the DataStore version (and cleared on any change)
+    and to the agent mode, expire after ``answer_cache_ttl_s`` and are
+    evicted least-recently-used beyond ``answer_cache_max_entries``. A query
+    that is not an exact repeat matches the closest cached query embedding
+    if the cosine similarity reaches ``answer_cache_min_similarity`` and both
+    share the same ``scope`` (the entities the query names), so "gaps in
+    Volta" never answers "gaps in Oti". The query embedding is returned on a
+    miss so retrieval can reuse it.
+    """
+
+    def __init__(self):
+        self._entries: "OrderedDict[Tuple, dict]" = OrderedDict()
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_keys: List[Tuple] = []
+        self.exact_hits = 0
+        self.exact_misses = 0
+        self.semantic_hits = 0
+        self.semantic_misses = 0
+        self.evictions = 0
+        data_store.on_change(self._on_change)
+
+    def _key(self, message: str, mode: str) -> Tuple:
+        return data_store.version, mode, normalize_query(message)
+
+    def _live(self, key: Tuple) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry["created"] > get_settings().answer_cache_ttl_s:
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _drop(self, key: Tuple):
+        entry = self._entries.pop(key, None)
+        if entry is not None and entry["embedding"] is not None:
+            self._matrix = None
+
+    def lookup(self, message: str, mode: str) -> Optional[dict]:
+        """Exact (normalized text) hit as ``{"response", "match", "similarity", "query"}``, else None."""
+        entry = self._live(self._key(message, mode))
+        if entry is None:
+            self.exact_misses += 1
+            return None
+        self.exact_hits += 1
+        return {"response": entry["response"], "match": "exact", "similarity": 1.0, "query": entry["query"]}
+
+    async def semantic_lookup(self, message: str, mode: str,
+                              scope: Tuple = ()) -> Tuple[Optional[dict], Optional[np.ndarray]]:
+        """Nearest cached query by embedding; returns ``(hit or None, query embedding or None)``."""
+        settings = get_settings()
+        try:
+            embedding = (await llm_gateway.embed([message], vector_store.model_name, settings.retrieval_timeout_s))[0]
+        except Exception as e:
+            # Without an embedding the cache is exact-only for this query
+            logger.debug(f"Answer cache embedding failed: {e}")
+            self.semantic_misses += 1
+            return None, None
+
+        matrix, keys = self._embeddings(mode, scope)
+        if len(keys):
+            similarities = matrix @ embedding
+            best = int(np.argmax(similarities))
+            if similarities[best] >= settings.answer_cache_min_similarity:
+                entry = self._live(keys[best])
+                if entry is not None:
+                    self.semantic_hits += 1
+                    return {"response": entry["response"], "match": "semantic",
+                            "similarity": round(float(similarities[best]), 4), "query": entry["query"]}, embedding
+        self.semantic_misses += 1
+        return None, embedding
+
+    def _embeddings(self, mode: str, scope: Tuple) -> Tuple[np.ndarray, List[Tuple]]:
+        if self._matrix is None:
+            keys = [k for k, e in self._entries.items() if e["embedding"] is not None]
+            self._matrix_keys = keys
+            self._matrix = (np.vstack([self._entries[k]["embedding"] for k in keys]) if keys
+                            else np.zeros((0, 0), dtype=np.float32))
+        rows = [
+            i for i, k in enumerate(self._matrix_keys)
+            if k[0] == data_store.version and k[1] == mode and self._entries[k]["scope"] == scope
+        ]
+        return self._matrix[rows], [self._matrix_keys[i] for i in rows]
+
+    def put(self, message: str, mode: str, response: ChatResponse, embedding: Optional[np.ndarray] = None,
+            scope: Tuple = ()):
+        settings = get_settings()
+        key = self._key(message, mode)
+        self._drop(key)
+        self._entries[key] = {
+            "query": message,
+            "response": response,
+            "embedding": embedding,
+            "scope": scope,
+            "created": time.monotonic(),
+        }
+        if embedding is not None:
+            self._matrix = None
+        while len(self._entries) > settings.answer_cache_max_entries:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        """Counts and hit rates; every cached query starts with an exact lookup, so that is the overall base."""
+        exact_lookups = self.exact_hits + self.exact_misses
+        semantic_lookups = self.semantic_hits + self.semantic_misses
+        return {
+            "entries": len(self._entries),
+            "exact_hits": self.exact_hits,
+            "exact_misses": self.exact_misses,
+            "semantic_hits": self.semantic_hits,
+            "semantic_misses": self.semantic_misses,
+            "evictions": self.evictions,
+            "exact_hit_rate": round(self.exact_hits / exact_lookups, 3) if exact_lookups else 0.0,
+            "semantic_hit_rate": round(self.semantic_hits / semantic_lookups, 3) if semantic_lookups else 0.0,
+            "hit_rate": round((self.exact_hits + self.semantic_hits) / exact_lookups, 3) if exact_lookups else 0.0,
+        }
+
+    def clear(self):
+        self._entries.clear()
+        self._matrix = None
+
+    def _on_change(self, event: str, facility: Optional[Facility]):
+        self.clear()
+
+
+# Global answer cache instance
+answer_cache = AnswerCache()
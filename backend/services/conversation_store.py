@@ -0,0 +1,160 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional
+
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = Path(__file__).parent.parent
+# Stored answers are only prompt history, so they are kept short
+ANSWER_CHARS = 1500
+# Write-throughs between purges of expired rows
+PURGE_EVERY = 200
+
+
+class ConversationStore:
+    """Bounded conversation memory, persisted to a local SQLite file.
+
+    A conversation is a dict of recent turns (query, answer, category,
+    filters), the last resolved classification and the facility ids
+    retrieved for it, so a follow-up can refine that set instead of
+    searching again. Each conversation keeps at most
+    ``conversation_max_turns`` turns and ``conversation_max_facilities``
+    ids. Only ``conversation_cache_size`` conversations stay in memory
+    (least recently used are dropped and reloaded from disk on demand), and
+    conversations idle longer than ``conversation_ttl_s`` expire both in
+    memory and on disk. Every change is written through, so conversations
+    survive restarts.
+    """
+
+    def __init__(self):
+        self._hot: "OrderedDict[str, dict]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.loads = 0
+        self.evictions = 0
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            path = Path(get_settings().conversation_db_path)
+            path = path if path.is_absolute() else BACKEND_DIR / path
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS conversations "
+                "(id TEXT PRIMARY KEY, updated REAL NOT NULL, state TEXT NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS conversations_updated ON conversations (updated)")
+        return self._db
+
+    def get(self, conversation_id: Optional[str]) -> Optional[dict]:
+        """The conversation, from memory or disk; None if unknown or expired."""
+        if not conversation_id:
+            return None
+        ttl = get_settings().conversation_ttl_s
+        with self._lock:
+            conversation = self._hot.get(conversation_id)
+            if conversation is None:
+                row = self.db.execute(
+                    "SELECT state FROM conversations WHERE id = ? AND updated >= ?",
+                    (conversation_id, time.time() - ttl),
+                ).fetchone()
+                if row is None:
+                    return None
+                conversation = json.loads(row[0])
+                self.loads += 1
+                self._remember(conversation)
+            elif time.time() - conversation["updated"] > ttl:
+                del self._hot[conversation_id]
+                return None
+            self._hot.move_to_end(conversation_id)
+            return conversation
+
+    def record_turn(self, conversation_id: str, query: str, answer: str, classification: dict,
+                    facility_ids: Optional[List[str]] = None, context: Optional[str] = None) -> dict:
+        """Append a turn and replace the conversation's retrieved facility set (if given).
+
+        ``context`` is the standalone question the turn resolves to (the
+        query itself unless it is a follow-up), so a chain of follow-ups
+        keeps the intent of the question it started from.
+        """
+        settings = get_settings()
+        conversation = self.get(conversation_id) or {"id": conversation_id, "turns": [], "facility_ids": []}
+        with self._lock:
+            conversation["turns"].append({
+                "query": query,
+                "context": context or query,
+                "answer": answer[:ANSWER_CHARS],
+                "category": classification.get("category"),
+                "filters": classification.get("filters", {}),
+            })
+            del conversation["turns"][:-settings.conversation_max_turns]
+            conversation["classification"] = {
+                "category": classification.get("category"),
+                "filters": classification.get("filters", {}),
+            }
+            if facility_ids is not None:
+                conversation["facility_ids"] = list(dict.fromkeys(facility_ids))[:settings.conversation_max_facilities]
+            conversation["updated"] = time.time()
+            self._remember(conversation)
+            self._write(conversation)
+            self._writes += 1
+            if self._writes % PURGE_EVERY == 0:
+                self.db.execute("DELETE FROM conversations WHERE updated < ?",
+                                (time.time() - settings.conversation_ttl_s,))
+        return conversation
+
+    def fork(self, source_id: str, conversation_id: str) -> Optional[dict]:
+        """Copy a conversation under a new id (for a request that shared another's answer)."""
+        source = self.get(source_id)
+        if source is None:
+            return None
+        conversation = {**json.loads(json.dumps(source, default=str)), "id": conversation_id}
+        with self._lock:
+            self._remember(conversation)
+            self._write(conversation)
+        return conversation
+
+    def _write(self, conversation: dict):
+        self.db.execute(
+            "INSERT OR REPLACE INTO conversations (id, updated, state) VALUES (?, ?, ?)",
+            (conversation["id"], conversation["updated"], json.dumps(conversation, default=str)),
+        )
+
+    def _remember(self, conversation: dict):
+        self._hot[conversation["id"]] = conversation
+        self._hot.move_to_end(conversation["id"])
+        while len(self._hot) > get_settings().conversation_cache_size:
+            self._hot.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, conversation_id: str):
+        with self._lock:
+            self._hot.pop(conversation_id, None)
+            self.db.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,))
+
+    def stats(self) -> dict:
+        return {
+            "in_memory": len(self._hot),
+            "max_in_memory": get_settings().conversation_cache_size,
+            "loads_from_disk": self.loads,
+            "evictions": self.evictions,
+        }
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+# Global conversation store instance
+conversation_store = ConversationStore()
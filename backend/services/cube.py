@@ -0,0 +1,165 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from models.facility import Facility
+from services.data_loader import data_store, CAPABILITY_CATEGORIES
+
+
+DIMENSIONS = ["region", "facility_type", "operator_type", "has_anomalies", "capability"]
+MEASURES = [
+    "facilities", "completeness_sum", "total_doctors", "doctors_reported",
+    "total_capacity", "capacity_reported", "anomaly_count",
+]
+
+
+def _dimension_values(f: Facility) -> List[str]:
+    return [
+        f.normalized_region or "Unknown",
+        f.facility_type or "unknown",
+        f.operator_type or "unknown",
+        "yes" if f.anomalies else "no",
+    ]
+
+
+class AggregationCube:
+    """Pre-aggregated facility measures over region x type x operator x anomaly cells.
+
+    Every distinct combination of the categorical dimensions is one cell, with
+    the measures summed over its facilities. The capability dimension is held
+    as a second ``(cells, capabilities, measures)`` tensor of the same sums
+    restricted to capable facilities. Any roll-up, slice or dice is then a
+    grouped sum over cells, independent of the number of facilities. The cube
+    is rebuilt on first use after the data version changes.
+    """
+
+    def __init__(self):
+        self.values: Dict[str, List[str]] = {d: [] for d in DIMENSIONS[:-1]}
+        self.cell_codes = np.zeros((0, len(DIMENSIONS) - 1), dtype=np.int64)
+        self.measures = np.zeros((0, len(MEASURES)))
+        self.capability_measures = np.zeros((0, len(CAPABILITY_CATEGORIES), len(MEASURES)))
+        self.version = -1
+
+    def build(self, facilities: List[Facility], capability_matrix: np.ndarray):
+        """Collapse the facility list into cells."""
+        n = len(facilities)
+        rows = [_dimension_values(f) for f in facilities]
+        codes = np.zeros((n, len(DIMENSIONS) - 1), dtype=np.int64)
+        for d, dim in enumerate(DIMENSIONS[:-1]):
+            column = [row[d] for row in rows]
+            self.values[dim] = sorted(set(column))
+            lookup = {v: i for i, v in enumerate(self.values[dim])}
+            codes[:, d] = [lookup[v] for v in column]
+
+        per_facility = np.array([
+            [
+                1.0,
+                f.data_completeness,
+                f.number_doctors or 0,
+                f.number_doctors is not None,
+                f.capacity or 0,
+                f.capacity is not None,
+                len(f.anomalies),
+            ]
+            for f in facilities
+        ], dtype=np.float64).reshape(n, len(MEASURES))
+
+        if n:
+            self.cell_codes, cell_of = np.unique(codes, axis=0, return_inverse=True)
+            cell_of = cell_of.ravel()
+        else:
+            self.cell_codes, cell_of = codes, np.zeros(0, dtype=np.int64)
+        n_cells = len(self.cell_codes)
+        capable = np.asarray(capability_matrix, dtype=np.float64).reshape(n, -1)
+
+        self.measures = np.column_stack([
+            np.bincount(cell_of, weights=per_facility[:, m], minlength=n_cells)
+            for m in range(len(MEASURES))
+        ]).reshape(n_cells, len(MEASURES))
+        self.capability_measures = np.stack([
+            np.column_stack([
+                np.bincount(cell_of, weights=per_facility[:, m] * capable[:, c], minlength=n_cells)
+                for m in range(len(MEASURES))
+            ]).reshape(n_cells, len(MEASURES))
+            for c in range(len(CAPABILITY_CATEGORIES))
+        ], axis=1)
+        self.version = data_store.version
+        return self
+
+    def aggregate(self, group_by: List[str], filters: Optional[Dict[str, List[str]]] = None) -> List[dict]:
+        """Grouped measures for ``group_by`` dimensions over the cells matching ``filters``.
+
+        Filters map a dimension to the accepted values. Grouping or filtering by
+        ``capability`` counts each facility once per matching capability.
+        """
+        if self.version != data_store.version:
+            self.build(data_store.facilities, data_store.capability_matrix)
+        filters = filters or {}
+        keep = np.ones(len(self.cell_codes), dtype=bool)
+        for d, dim in enumerate(DIMENSIONS[:-1]):
+            if dim in filters:
+                wanted = [self.values[dim].index(v) for v in filters[dim] if v in self.values[dim]]
+                keep &= np.isin(self.cell_codes[:, d], wanted)
+
+        use_capability = "capability" in group_by or "capability" in filters
+        if use_capability:
+            caps = [
+                c for c, cap in enumerate(CAPABILITY_CATEGORIES)
+                if "capability" not in filters or cap in filters["capability"]
+            ]
+            # Unpivot to (cell, capability) rows so capability behaves like any other dimension
+            codes = np.repeat(self.cell_codes[keep], len(caps), axis=0)
+            codes = np.column_stack([codes, np.tile(caps, int(keep.sum()))]).astype(np.int64)
+            measures = self.capability_measures[keep][:, caps].reshape(-1, len(MEASURES))
+            coverage = None
+        else:
+            codes = self.cell_codes[keep]
+            measures = self.measures[keep]
+            coverage = self.capability_measures[keep][:, :, 0]
+
+        axes = [DIMENSIONS.index(dim) for dim in group_by]
+        if len(codes) == 0:
+            return []
+        if axes:
+            groups, group_of = np.unique(codes[:, axes], axis=0, return_inverse=True)
+            group_of = group_of.ravel()
+        else:
+            groups, group_of = np.zeros((1, 0), dtype=np.int64), np.zeros(len(codes), dtype=np.int64)
+        sums = np.column_stack([
+            np.bincount(group_of, weights=measures[:, m], minlength=len(groups))
+            for m in range(len(MEASURES))
+        ])
+        cap_sums = np.column_stack([
+            np.bincount(group_of, weights=coverage[:, c], minlength=len(groups))
+            for c in range(len(CAPABILITY_CATEGORIES))
+        ]) if coverage is not None else None
+
+        result = []
+        for g, key in enumerate(groups):
+            count = sums[g, 0]
+            if count == 0:
+                continue
+            row = {
+                dim: CAPABILITY_CATEGORIES[key[i]] if dim == "capability" else self.values[dim][key[i]]
+                for i, dim in enumerate(group_by)
+            }
+            row.update({
+                "facilities": int(count),
+                "avg_completeness": round(float(sums[g, 1] / count) * 100, 1),
+                "total_doctors": int(sums[g, 2]),
+                "doctors_reported": int(sums[g, 3]),
+                "total_capacity": int(sums[g, 4]),
+                "capacity_reported": int(sums[g, 5]),
+                "anomaly_count": int(sums[g, 6]),
+            })
+            if cap_sums is not None:
+                row["capabilities_coverage"] = {
+                    cap: int(cap_sums[g, c]) for c, cap in enumerate(CAPABILITY_CATEGORIES)
+                }
+            result.append(row)
+        result.sort(key=lambda r: r["facilities"], reverse=True)
+        return result
+
+
+# Global aggregation cube instance
+aggregation_cube = AggregationCube()
@@ -4,9 +4,15 @@ import random
 import pandas as pd
 import numpy as np
 from pathlib import Path
-from typing import List, Dict, Optional, Tuple
+from typing import Callable, List, Dict, Optional, Tuple
 
+from config import get_settings
 from models.facility import Facility, RegionStats, DataQualityStats
+from services.admin_hierarchy import admin_hierarchy, LEVELS
+from services.anomaly_rules import anomaly_engine
+from services.entity_resolution import resolve_entities
+from services.profiler import data_profiler, source_parse_failures
+from services.region_index import region_index
 
 
 DATA_DIR = Path(__file__).parent.parent / "data"
@@ -43,6 +49,27 @@ CAPABILITY_KEYWORDS = {
                    "microbiology", "hematology", "biochemistry"],
 }
 
+# Source CSV columns feeding profiled facility fields (completeness_by_field keys)
+SOURCE_FIELDS = {
+    "name": "name",
+    "address_city": "address_city",
+    "address_stateOrRegion": "address_region",
+    "facilityTypeId": "facility_type",
+    "specialties": "specialties",
+    "capability": "capabilities",
+    "procedure": "procedures",
+    "equipment": "equipment",
+    "description": "description",
+    "phone_numbers": "phone_numbers",
+    "email": "email",
+    "websites": "websites",
+}
+NUMBER_SOURCE_FIELDS = {
+    "yearEstablished": "year_established",
+    "numberDoctors": "number_doctors",
+    "capacity": "capacity",
+}
+
 # Ghana estimated regional populations (2024 projections)
 REGION_POPULATIONS = {
     "Greater Accra": 5_450_000,
@@ -71,18 +98,32 @@ class DataStore:
         self.facilities: List[Facility] = []
         self.facilities_df: Optional[pd.DataFrame] = None
         self.region_stats: Dict[str, RegionStats] = {}
+        self.unit_stats: Dict[str, Dict[str, RegionStats]] = {level: {} for level in LEVELS}
         self.data_quality: Optional[DataQualityStats] = None
         self.desert_matrix: List[dict] = []
         self.anomalies: List[dict] = []
+        self.entity_clusters: List[dict] = []
+        self.entity_block_stats: dict = {}
+        self.normalization_log: List[dict] = []
+        self.capability_matrix: np.ndarray = np.zeros((0, len(CAPABILITY_CATEGORIES)), dtype=bool)
+        self.version: int = 0
+        self._facility_index: Dict[str, int] = {}
+        self._listeners: List[Callable[[str, Optional[Facility]], None]] = []
         self._region_map: dict = {}
         self._city_coords: dict = {}
         self._city_to_region: dict = {}
         self._region_centroids: dict = {}
 
-    def load(self, csv_path: str = None):
-        """Load and process all data."""
+    def load(self, csv_path: str = None, collapse_entities: Optional[bool] = None):
+        """Load and process all data.
+
+        ``collapse_entities`` merges entity-resolution clusters whose members
+        share a name (defaults to the ``collapse_duplicate_entities`` setting).
+        """
         if csv_path is None:
             csv_path = str(DATA_DIR / "ghana_facilities.csv")
+        if collapse_entities is None:
+            collapse_entities = get_settings().collapse_duplicate_entities
 
         # Load reference data
         self._load_reference_data()
@@ -94,6 +135,11 @@ class DataStore:
         # Parse JSON array fields
         json_fields = ["specialties", "phone_numbers", "websites", "procedure",
                        "equipment", "capability", "affiliationTypeIds", "countries"]
+        parse_failures = source_parse_failures(
+            df,
+            {col: SOURCE_FIELDS[col] for col in json_fields if col in SOURCE_FIELDS},
+            NUMBER_SOURCE_FIELDS,
+        )
         for field in json_fields:
             if field in df.columns:
                 df[field] = df[field].apply(self._parse_json_array)
@@ -110,6 +156,11 @@ class DataStore:
         else:
             df_deduped = df
 
+        # Link records sharing a phone, email or website domain
+        entities_collapsed = self._resolve_entities(df_deduped)
+        if collapse_entities and entities_collapsed:
+            df_deduped = self._collapse_entities(df_deduped)
+
         unique_count = len(df_deduped)
 
         # Add geocoding
@@ -117,17 +168,33 @@ class DataStore:
         df_deduped["lng"] = None
         df_deduped = df_deduped.apply(self._geocode_row, axis=1)
 
+        # Verify/correct regions against boundaries for city-geocoded rows
+        boundary_fixes, boundary_mismatches = self._verify_regions(df_deduped)
+
+        # Assign districts from region + locality
+        df_deduped["district"] = [
+            admin_hierarchy.district_for(
+                region if pd.notna(region) else None,
+                city if isinstance(city, str) else None,
+            )
+            for region, city in zip(df_deduped["normalized_region"], df_deduped.get("address_city", [None] * len(df_deduped)))
+        ]
+
         # Calculate data completeness per row
         df_deduped["data_completeness"] = df_deduped.apply(self._calc_completeness, axis=1)
 
-        # Detect anomalies
-        df_deduped["anomalies"] = df_deduped.apply(self._detect_row_anomalies, axis=1)
-
         # Convert to Facility objects
         self.facilities = [self._row_to_facility(row) for _, row in df_deduped.iterrows()]
         self.facilities_df = df_deduped
+        self._reindex()
+
+        # Profile every field in chunks (fill rates, sketches, parse failures)
+        data_profiler.build(self.facilities, parse_failures)
 
-        # Compute region stats and desert matrix
+        # Detect anomalies with the rule registry and statistical detectors
+        self._detect_anomalies()
+
+        # Compute district -> region -> country stats and desert matrix
         self._compute_region_stats()
         self._compute_desert_matrix()
 
@@ -141,19 +208,100 @@ class DataStore:
             region_variants_fixed=abs(region_fixes) if region_fixes < 0 else region_fixes,
             avg_completeness=round(df_deduped["data_completeness"].mean() * 100, 1),
             completeness_by_region=self._completeness_by_region(df_deduped),
-            completeness_by_field=self._completeness_by_field(df_deduped),
+            completeness_by_field=self._completeness_by_field(),
+            regions_assigned_by_boundary=boundary_fixes,
+            region_boundary_mismatches=boundary_mismatches,
+            entity_clusters=len(self.entity_clusters),
+            facilities_in_entity_clusters=sum(c["size"] for c in self.entity_clusters),
+            entities_collapsed=entities_collapsed if collapse_entities else 0,
         )
 
+        self.version += 1
+        data_profiler.record(self.version)
         return self
 
+    def on_change(self, callback: Callable[[str, Optional[Facility]], None]):
+        """Register a callback fired as ``callback(event, facility)`` after upserts/removals."""
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+
+    def upsert_facility(self, facility: Facility) -> Facility:
+        """Insert or replace a facility and refresh derived analytics."""
+        if facility.district is None:
+            facility.district = admin_hierarchy.district_for(facility.normalized_region, facility.address_city)
+        pos = self._facility_index.get(facility.unique_id)
+        previous = None
+        if pos is None:
+            self.facilities.append(facility)
+            self._facility_index[facility.unique_id] = len(self.facilities) - 1
+            self.capability_matrix = np.vstack([self.capability_matrix, self._capability_row(facility)])
+        else:
+            previous = self.facilities[pos]
+            self.facilities[pos] = facility
+            self.capability_matrix[pos] = self._capability_row(facility)
+        anomaly_engine.update(self.facilities, facility, previous)
+        data_profiler.update(facility, previous)
+        self._sync_anomalies(self.facilities)
+        self._refresh_analytics()
+        self._notify("upsert", facility)
+        return facility
+
+    def remove_facility(self, unique_id: str) -> Optional[Facility]:
+        """Remove a facility by ID and refresh derived analytics."""
+        pos = self._facility_index.get(unique_id)
+        if pos is None:
+            return None
+        facility = self.facilities.pop(pos)
+        self.capability_matrix = np.delete(self.capability_matrix, pos, axis=0)
+        self._reindex(rebuild_matrix=False)
+        anomaly_engine.remove(self.facilities, facility)
+        data_profiler.remove(facility)
+        self._sync_anomalies(self.facilities)
+        self._refresh_analytics()
+        self._notify("remove", facility)
+        return facility
+
+    def _reindex(self, rebuild_matrix: bool = True):
+        self._facility_index = {f.unique_id: i for i, f in enumerate(self.facilities)}
+        if rebuild_matrix:
+            self.capability_matrix = np.array(
+                [self._capability_row(f) for f in self.facilities], dtype=bool
+            ).reshape(len(self.facilities), len(CAPABILITY_CATEGORIES))
+
+    def _capability_row(self, f: Facility) -> np.ndarray:
+        text = " ".join(f.capabilities + f.procedures + f.equipment).lower()
+        return np.array(
+            [any(kw in text for kw in CAPABILITY_KEYWORDS[cat]) for cat in CAPABILITY_CATEGORIES],
+            dtype=bool,
+        )
+
+    def _refresh_analytics(self):
+        self._compute_region_stats()
+        self._compute_desert_matrix()
+        self.version += 1
+        data_profiler.record(self.version)
+
+    def _notify(self, event: str, facility: Optional[Facility]):
+        for callback in self._listeners:
+            callback(event, facility)
+
     def _load_reference_data(self):
         with open(DATA_DIR / "ghana_regions.json") as f:
             self._region_map = json.load(f)
+        self.normalization_log = [
+            {"before": raw, "after": normalized, "status": "fixed"}
+            for raw, normalized in self._region_map.items()
+            if raw.lower() != normalized.lower()
+        ]
+        # Rows with no region get one inferred from their city
+        self.normalization_log.append({"before": "(empty)", "after": "Inferred from city", "status": "enriched"})
         with open(DATA_DIR / "city_coords.json") as f:
             coords_data = json.load(f)
             self._city_coords = coords_data["cities"]
             self._region_centroids = coords_data["region_centroids"]
             self._city_to_region = coords_data["city_to_region"]
+        region_index.load()
+        admin_hierarchy.load(REGION_POPULATIONS)
 
     def _parse_json_array(self, val) -> list:
         if pd.isna(val) or val == "" or val == "[]":
@@ -220,6 +368,33 @@ class DataStore:
 
         return pd.DataFrame(merged_rows).reset_index(drop=True)
 
+    def _resolve_entities(self, df: pd.DataFrame) -> int:
+        """Cluster rows by shared contact keys; returns how many rows a collapse would remove."""
+        def column(name):
+            return df[name].tolist() if name in df.columns else [None] * len(df)
+
+        self.entity_clusters, self.entity_block_stats = resolve_entities(
+            ids=[str(v) for v in column("pk_unique_id")],
+            names=[v if isinstance(v, str) else None for v in column("name")],
+            phones=[v if isinstance(v, list) else [] for v in column("phone_numbers")],
+            emails=[v if isinstance(v, str) else None for v in column("email")],
+            websites=[v if isinstance(v, list) else [] for v in column("websites")],
+        )
+        return sum(len(group) - 1 for c in self.entity_clusters for group in c["duplicate_groups"])
+
+    def _collapse_entities(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Merge same-name records within each cluster using the dedup merge rules."""
+        canonical = {
+            fid: group[0]
+            for cluster in self.entity_clusters
+            for group in cluster["duplicate_groups"]
+            for fid in group
+        }
+        df = df.copy()
+        df["pk_unique_id"] = [canonical.get(str(v), v) for v in df["pk_unique_id"]]
+        df["pk_unique_id"] = df["pk_unique_id"].astype(str)
+        return self._deduplicate(df)
+
     def _geocode_row(self, row):
         city = row.get("address_city")
         region = row.get("normalized_region")
@@ -230,19 +405,43 @@ class DataStore:
                 coords = self._city_coords[city_key]
                 row["lat"] = coords[0] + random.uniform(-0.01, 0.01)
                 row["lng"] = coords[1] + random.uniform(-0.01, 0.01)
+                row["geo_source"] = "city"
                 return row
 
         if pd.notna(region) and str(region) in self._region_centroids:
             coords = self._region_centroids[str(region)]
             row["lat"] = coords[0] + random.uniform(-0.05, 0.05)
             row["lng"] = coords[1] + random.uniform(-0.05, 0.05)
+            row["geo_source"] = "region"
             return row
 
         # Default: Ghana center with jitter
         row["lat"] = 7.9465 + random.uniform(-0.1, 0.1)
         row["lng"] = -1.0232 + random.uniform(-0.1, 0.1)
+        row["geo_source"] = "default"
         return row
 
+    def _verify_regions(self, df: pd.DataFrame) -> Tuple[int, int]:
+        """Check normalized_region against region boundaries for city-geocoded rows.
+
+        Missing or non-canonical regions are replaced by the containing region;
+        canonical regions that disagree with the boundary are only counted.
+        """
+        city_rows = df.index[df["geo_source"] == "city"]
+        if len(city_rows) == 0:
+            return 0, 0
+        by_boundary = pd.Series(
+            region_index.assign(df.loc[city_rows, "lat"].astype(float), df.loc[city_rows, "lng"].astype(float)),
+            index=city_rows,
+        )
+        current = df.loc[city_rows, "normalized_region"]
+        canonical = current.isin(list(REGION_POPULATIONS))
+        located = by_boundary.notna()
+        fix = located & ~canonical
+        df.loc[fix[fix].index, "normalized_region"] = by_boundary[fix]
+        mismatches = located & canonical & (by_boundary != current)
+        return int(fix.sum()), int(mismatches.sum())
+
     def _calc_completeness(self, row) -> float:
         key_fields = ["name", "address_city", "address_stateOrRegion", "facilityTypeId",
                       "specialties", "capability", "procedure", "equipment", "description",
@@ -264,37 +463,27 @@ class DataStore:
                     filled += 1
         return round(filled / len(key_fields), 2)
 
-    def _detect_row_anomalies(self, row) -> list:
-        anomalies = []
-        specialties = row.get("specialties", [])
-        capabilities = row.get("capability", [])
-        procedures = row.get("procedure", [])
-        equipment = row.get("equipment", [])
-        facility_type = row.get("facilityTypeId", "")
-        cap_text = " ".join(capabilities).lower() if capabilities else ""
-        proc_text = " ".join(procedures).lower() if procedures else ""
-        equip_text = " ".join(equipment).lower() if equipment else ""
-
-        # Clinic claiming surgical capabilities
-        if facility_type == "clinic" and ("surgery" in cap_text or "surgical" in proc_text):
-            anomalies.append("Clinic claims surgical capabilities — verify")
-
-        # Claims MRI/CT but no imaging equipment listed
-        if ("mri" in cap_text or "ct scan" in cap_text) and not any(
-            k in equip_text for k in ["mri", "ct ", "scanner"]
-        ):
-            if equip_text:
-                anomalies.append("Claims imaging capability but no imaging equipment listed")
-
-        # Large specialty count for facility type
-        if isinstance(specialties, list) and len(specialties) > 8 and facility_type in ["clinic", "dentist"]:
-            anomalies.append(f"Unusually high specialty count ({len(specialties)}) for {facility_type}")
-
-        # Many procedures but no equipment
-        if isinstance(procedures, list) and len(procedures) > 5 and (not equipment or len(equipment) == 0):
-            anomalies.append("Multiple procedures listed but no equipment data")
-
-        return anomalies
+    def _detect_anomalies(self):
+        """Evaluate all anomaly rules in bulk and attach their messages to facilities."""
+        anomaly_engine.evaluate(self.facilities)
+        self._sync_anomalies(self.facilities)
+
+    def _sync_anomalies(self, facilities: List[Facility]):
+        for f in facilities:
+            f.anomalies = anomaly_engine.messages(f.unique_id)
+        self.anomalies = [
+            {"facility_id": uid, **flag}
+            for uid, flags in anomaly_engine.flags.items()
+            for flag in flags
+        ]
+
+    def reload_anomaly_rules(self) -> int:
+        """Re-read the rules file and re-evaluate every facility; returns the flag count."""
+        anomaly_engine.load()
+        self._detect_anomalies()
+        self._refresh_analytics()
+        self._notify("anomalies", None)
+        return len(self.anomalies)
 
     def _row_to_facility(self, row) -> Facility:
         def safe_list(val):
@@ -348,47 +537,62 @@ class DataStore:
             data_completeness=float(row.get("data_completeness", 0)),
             anomalies=safe_list(row.get("anomalies")),
             normalized_region=safe_str(row.get("normalized_region")),
+            district=safe_str(row.get("district")),
         )
 
     def _compute_region_stats(self):
-        for region in REGION_POPULATIONS:
-            region_facilities = [f for f in self.facilities if f.normalized_region == region]
-            hospitals = [f for f in region_facilities if f.facility_type == "hospital"]
-            clinics = [f for f in region_facilities if f.facility_type == "clinic"]
-
-            # Gather all specialties in the region
-            all_specialties = set()
-            for f in region_facilities:
-                all_specialties.update(f.specialties)
-
-            # Compute capability coverage
-            coverage = {}
-            for cat, keywords in CAPABILITY_KEYWORDS.items():
-                count = 0
-                for f in region_facilities:
-                    text = " ".join(f.capabilities + f.procedures + f.equipment).lower()
-                    if any(kw in text for kw in keywords):
-                        count += 1
-                coverage[cat] = count
+        """Aggregate facilities per district, then roll up to regions and the country."""
+        leaf_of = {admin_hierarchy.names[leaf]: i for i, leaf in enumerate(admin_hierarchy.leaves.tolist())}
+        leaf = np.array([leaf_of.get(f.district, -1) for f in self.facilities], dtype=np.int64)
+        keep = leaf >= 0
+        n_leaves = len(admin_hierarchy.leaves)
+
+        # Per-leaf measures: totals, hospitals, clinics, completeness, anomalies, then capability counts
+        measures = np.column_stack([
+            np.ones(len(self.facilities)),
+            [f.facility_type == "hospital" for f in self.facilities],
+            [f.facility_type == "clinic" for f in self.facilities],
+            [f.data_completeness for f in self.facilities],
+            [len(f.anomalies) for f in self.facilities],
+            self.capability_matrix,
+        ]).reshape(len(self.facilities), 5 + len(CAPABILITY_CATEGORIES))
+        leaf_values = np.column_stack([
+            np.bincount(leaf[keep], weights=measures[keep, m], minlength=n_leaves)
+            for m in range(measures.shape[1])
+        ])
+        leaf_specialties = [set() for _ in range(n_leaves)]
+        for f, i in zip(self.facilities, leaf):
+            if i >= 0:
+                leaf_specialties[i].update(f.specialties)
+
+        totals = admin_hierarchy.rollup(leaf_values)
+        specialties = admin_hierarchy.rollup_sets(leaf_specialties)
+
+        self.unit_stats = {level: {} for level in LEVELS}
+        for node, name in enumerate(admin_hierarchy.names):
+            row = totals[node]
+            coverage = {cat: int(row[5 + i]) for i, cat in enumerate(CAPABILITY_CATEGORIES)}
 
             # Determine desert gaps
             gaps = [cat for cat, count in coverage.items() if count == 0]
-            anomaly_count = sum(len(f.anomalies) for f in region_facilities)
-
-            self.region_stats[region] = RegionStats(
-                region=region,
-                total_facilities=len(region_facilities),
-                hospitals=len(hospitals),
-                clinics=len(clinics),
-                specialties_available=sorted(all_specialties),
+
+            level = admin_hierarchy.levels[node]
+            self.unit_stats[level][name] = RegionStats(
+                region=name,
+                level=level,
+                parent=admin_hierarchy.parent_name(node),
+                population=int(admin_hierarchy.population[node]),
+                total_facilities=int(row[0]),
+                hospitals=int(row[1]),
+                clinics=int(row[2]),
+                specialties_available=sorted(specialties[node]),
                 capabilities_coverage=coverage,
-                avg_data_completeness=round(
-                    sum(f.data_completeness for f in region_facilities) / max(len(region_facilities), 1) * 100, 1
-                ),
-                anomaly_count=anomaly_count,
+                avg_data_completeness=round(float(row[3]) / max(row[0], 1) * 100, 1),
+                anomaly_count=int(row[4]),
                 is_medical_desert=len(gaps) >= 3,
                 desert_gaps=gaps,
             )
+        self.region_stats = self.unit_stats["region"]
 
     def _compute_desert_matrix(self):
         self.desert_matrix = []
@@ -421,27 +625,16 @@ class DataStore:
                 result[region] = 0.0
         return result
 
-    def _completeness_by_field(self, df) -> dict:
-        fields = ["name", "address_city", "address_stateOrRegion", "facilityTypeId",
-                  "specialties", "capability", "procedure", "equipment", "description",
-                  "phone_numbers", "email", "websites"]
-        result = {}
-        for f in fields:
-            if f not in df.columns:
-                result[f] = 0.0
-                continue
-            col = df[f]
-            non_empty = col.apply(
-                lambda v: bool(v) if isinstance(v, list) else (pd.notna(v) and str(v).strip() != "")
-            ).sum()
-            result[f] = round(non_empty / len(df) * 100, 1)
-        return result
+    def _completeness_by_field(self) -> dict:
+        profiles = data_profiler.columns
+        return {
+            column: profiles[field].fill_rate() if field in profiles else 0.0
+            for column, field in SOURCE_FIELDS.items()
+        }
 
     def get_facility(self, unique_id: str) -> Optional[Facility]:
-        for f in self.facilities:
-            if f.unique_id == unique_id:
-                return f
-        return None
+        pos = self._facility_index.get(unique_id)
+        return self.facilities[pos] if pos is not None else None
 
     def search_facilities(self, region: str = None, facility_type: str = None,
                           specialty: str = None, has_anomalies: bool = None) -> List[Facility]:
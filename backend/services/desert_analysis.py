@@ -0,0 +1,126 @@
+import json
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from services.admin_hierarchy import admin_hierarchy
+from services.data_loader import data_store, CAPABILITY_CATEGORIES
+
+_columns_cache: Dict[int, dict] = {}
+_taxonomy_cache: "OrderedDict[Tuple[int, str], np.ndarray]" = OrderedDict()
+_TAXONOMY_CACHE_SIZE = 32
+
+
+def facility_columns() -> dict:
+    """Columnar view of the facility list used by grouped reductions, per data version."""
+    version = data_store.version
+    if version in _columns_cache:
+        return _columns_cache[version]
+    facilities = data_store.facilities
+    leaf_of = {admin_hierarchy.names[leaf]: i for i, leaf in enumerate(admin_hierarchy.leaves.tolist())}
+    columns = {
+        "leaf": np.array([leaf_of.get(f.district, -1) for f in facilities], dtype=np.int64),
+        "facility_type": np.array([(f.facility_type or "unknown").lower() for f in facilities], dtype=object),
+        "operator_type": np.array([(f.operator_type or "unknown").lower() for f in facilities], dtype=object),
+        "text": [" ".join(f.capabilities + f.procedures + f.equipment).lower() for f in facilities],
+    }
+    _columns_cache.clear()
+    _columns_cache[version] = columns
+    return columns
+
+
+def taxonomy_incidence(taxonomy: Dict[str, List[str]]) -> np.ndarray:
+    """Facility x category incidence for a custom keyword taxonomy (scanned once, then cached)."""
+    key = (data_store.version, json.dumps(taxonomy, sort_keys=True))
+    if key in _taxonomy_cache:
+        _taxonomy_cache.move_to_end(key)
+        return _taxonomy_cache[key]
+    texts = facility_columns()["text"]
+    keyword_lists = [[kw.lower() for kw in kws] for kws in taxonomy.values()]
+    incidence = np.array(
+        [[any(kw in text for kw in kws) for kws in keyword_lists] for text in texts], dtype=bool
+    ).reshape(len(texts), len(keyword_lists))
+    _taxonomy_cache[key] = incidence
+    if len(_taxonomy_cache) > _TAXONOMY_CACHE_SIZE:
+        _taxonomy_cache.popitem(last=False)
+    return incidence
+
+
+def unit_capability_counts(incidence: np.ndarray, mask: Optional[np.ndarray] = None,
+                           level: str = "region") -> Tuple[List[int], np.ndarray, np.ndarray]:
+    """Grouped reduction of an incidence matrix into unit x category facility counts.
+
+    Counts are reduced per district leaf and rolled up the admin hierarchy,
+    returning the ``level`` node ids with their category counts and totals.
+    """
+    leaf = facility_columns()["leaf"]
+    keep = leaf >= 0 if mask is None else (leaf >= 0) & mask
+    leaf, rows = leaf[keep], incidence[keep]
+    n_leaves = len(admin_hierarchy.leaves)
+    leaf_values = np.column_stack(
+        [np.bincount(leaf, minlength=n_leaves)]
+        + [np.bincount(leaf, weights=rows[:, c], minlength=n_leaves) for c in range(rows.shape[1])]
+    )
+    nodes = admin_hierarchy.nodes_at(level)
+    rolled = admin_hierarchy.rollup(leaf_values)[nodes].astype(np.int64)
+    return nodes, rolled[:, 1:], rolled[:, 0]
+
+
+def analyze_deserts(
+    critical_max: int = 0,
+    underserved_max: int = 2,
+    desert_min_gaps: int = 3,
+    facility_types: Optional[List[str]] = None,
+    operator_types: Optional[List[str]] = None,
+    taxonomy: Optional[Dict[str, List[str]]] = None,
+    level: str = "region",
+) -> dict:
+    """Desert matrix and unit flags for arbitrary thresholds, filters and taxonomy.
+
+    A cell is critical at ``<= critical_max`` capable facilities and
+    underserved at ``<= underserved_max``; a unit (district, region or
+    country, per ``level``) is a medical desert when it has at least
+    ``desert_min_gaps`` critical categories.
+    """
+    columns = facility_columns()
+    n = len(columns["leaf"])
+    mask = np.ones(n, dtype=bool)
+    if facility_types:
+        mask &= np.isin(columns["facility_type"], [t.lower() for t in facility_types])
+    if operator_types:
+        mask &= np.isin(columns["operator_type"], [t.lower() for t in operator_types])
+
+    if taxonomy:
+        categories = list(taxonomy.keys())
+        incidence = taxonomy_incidence(taxonomy)
+    else:
+        categories = CAPABILITY_CATEGORIES
+        incidence = data_store.capability_matrix
+    nodes, counts, totals = unit_capability_counts(incidence, mask, level)
+    names = [admin_hierarchy.names[node] for node in nodes]
+
+    status = np.where(counts <= critical_max, "critical",
+                      np.where(counts <= underserved_max, "underserved", "adequate"))
+    matrix = [
+        {
+            "region": region,
+            "capability": cap,
+            "facility_count": int(counts[r, c]),
+            "status": str(status[r, c]),
+        }
+        for r, region in enumerate(names)
+        for c, cap in enumerate(categories)
+    ]
+    regions = {}
+    for r, (node, region) in enumerate(zip(nodes, names)):
+        gaps = [cap for c, cap in enumerate(categories) if status[r, c] == "critical"]
+        regions[region] = {
+            "parent": admin_hierarchy.parent_name(node),
+            "population": int(admin_hierarchy.population[node]),
+            "total_facilities": int(totals[r]),
+            "desert_gaps": gaps,
+            "gap_counts": {cap: int(counts[r, categories.index(cap)]) for cap in gaps},
+            "is_medical_desert": len(gaps) >= desert_min_gaps,
+        }
+    return {"level": level, "capabilities": categories, "matrix": matrix, "regions": regions}
@@ -0,0 +1,167 @@
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+
+DEFAULT_COUNTRY_CODE = "233"
+
+# Second-level suffixes under which the registered domain has three labels
+MULTI_PART_SUFFIXES = {
+    "com.gh", "org.gh", "gov.gh", "edu.gh", "net.gh", "mil.gh",
+    "co.uk", "org.uk", "ac.uk", "co.za", "org.za", "com.ng", "org.ng", "co.ke", "or.ke",
+}
+
+# Shared hosting / social domains that do not identify a single organization
+SHARED_DOMAINS = {
+    "facebook.com", "instagram.com", "twitter.com", "x.com", "linkedin.com", "youtube.com",
+    "google.com", "goo.gl", "wa.me", "whatsapp.com", "linktr.ee", "wixsite.com",
+    "blogspot.com", "wordpress.com", "business.site", "tiktok.com",
+}
+
+
+def normalize_phone(raw: str, default_country_code: str = DEFAULT_COUNTRY_CODE) -> Optional[str]:
+    """E.164 form of a phone number, assuming the default country for local numbers."""
+    if not raw:
+        return None
+    raw = raw.strip()
+    digits = re.sub(r"\D", "", raw)
+    if raw.startswith("+"):
+        pass
+    elif digits.startswith("00"):
+        digits = digits[2:]
+    elif digits.startswith("0"):
+        digits = default_country_code + digits[1:]
+    elif not digits.startswith(default_country_code):
+        digits = default_country_code + digits
+    if digits.startswith(default_country_code) and len(digits) != len(default_country_code) + 9:
+        return None
+    if not 8 <= len(digits) <= 15:
+        return None
+    return "+" + digits
+
+
+def normalize_email(raw: str) -> Optional[str]:
+    if not raw:
+        return None
+    email = raw.strip().lower().removeprefix("mailto:")
+    local, sep, domain = email.partition("@")
+    if not sep or not local or "." not in domain:
+        return None
+    return email
+
+
+def registered_domain(raw: str) -> Optional[str]:
+    """Registered domain of a URL (``https://www.foo.com.gh/x`` -> ``foo.com.gh``)."""
+    if not raw:
+        return None
+    url = raw.strip().lower()
+    host = urlsplit(url if "//" in url else "//" + url).hostname or ""
+    labels = [label for label in host.removeprefix("www.").split(".") if label]
+    if len(labels) < 2:
+        return None
+    keep = 3 if ".".join(labels[-2:]) in MULTI_PART_SUFFIXES and len(labels) >= 3 else 2
+    domain = ".".join(labels[-keep:])
+    return None if domain in SHARED_DOMAINS else domain
+
+
+class UnionFind:
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+        self.rank = [0] * n
+
+    def find(self, x: int) -> int:
+        root = x
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[x] != root:
+            self.parent[x], x = root, self.parent[x]
+        return root
+
+    def union(self, a: int, b: int):
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return
+        if self.rank[ra] < self.rank[rb]:
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        if self.rank[ra] == self.rank[rb]:
+            self.rank[ra] += 1
+
+
+def _name_key(name: Optional[str]) -> str:
+    return re.sub(r"[^a-z0-9]", "", (name or "").lower())
+
+
+def resolve_entities(
+    ids: List[str],
+    names: List[Optional[str]],
+    phones: List[Iterable[str]],
+    emails: List[Optional[str]],
+    websites: List[Iterable[str]],
+    max_block_size: int = 25,
+) -> Tuple[List[dict], dict]:
+    """Link records that share a normalized phone, email or website domain.
+
+    Each normalized key gets a posting list of record positions (a hash-join
+    block); every block is unioned into its first member, so clustering is
+    linear in the total posting length. Blocks larger than ``max_block_size``
+    (switchboards, umbrella-organization domains) are skipped as
+    non-identifying. Within a cluster, records with the same normalized name
+    form duplicate groups; the rest are treated as branches sharing contacts.
+    Returns the multi-record clusters and block statistics.
+    """
+    postings: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+    for i in range(len(ids)):
+        keys = set()
+        keys.update(("phone", p) for p in map(normalize_phone, phones[i] or []) if p)
+        email = normalize_email(emails[i]) if emails[i] else None
+        if email:
+            keys.add(("email", email))
+        keys.update(("domain", d) for d in map(registered_domain, websites[i] or []) if d)
+        for key in keys:
+            postings[key].append(i)
+
+    uf = UnionFind(len(ids))
+    oversized = []
+    for key, members in postings.items():
+        if len(members) < 2:
+            continue
+        if len(members) > max_block_size:
+            oversized.append({"type": key[0], "value": key[1], "size": len(members)})
+            continue
+        for j in members[1:]:
+            uf.union(members[0], j)
+
+    components: Dict[int, List[int]] = defaultdict(list)
+    for i in range(len(ids)):
+        components[uf.find(i)].append(i)
+
+    shared: Dict[int, List[dict]] = defaultdict(list)
+    for key, members in postings.items():
+        if 2 <= len(members) <= max_block_size:
+            shared[uf.find(members[0])].append({"type": key[0], "value": key[1], "size": len(members)})
+
+    clusters = []
+    for root, members in components.items():
+        if len(members) < 2:
+            continue
+        by_name: Dict[str, List[str]] = defaultdict(list)
+        for i in members:
+            by_name[_name_key(names[i])].append(ids[i])
+        duplicate_groups = [group for group in by_name.values() if len(group) > 1]
+        clusters.append({
+            "cluster_id": ids[members[0]],
+            "size": len(members),
+            "kind": "duplicate" if len(by_name) == 1 else "shared_contact",
+            "facility_ids": [ids[i] for i in members],
+            "duplicate_groups": duplicate_groups,
+            "names": [names[i] for i in members],
+            "shared_keys": sorted(shared[root], key=lambda k: (-k["size"], k["type"], k["value"])),
+        })
+    clusters.sort(key=lambda c: (-c["size"], c["cluster_id"]))
+    stats = {
+        "blocks": sum(1 for members in postings.values() if len(members) >= 2),
+        "oversized_blocks": sorted(oversized, key=lambda b: -b["size"]),
+    }
+    return clusters, stats
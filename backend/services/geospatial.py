@@ -2,7 +2,10 @@ import math
 import re
 from typing import Dict, List, Optional, Tuple
 
+import numpy as np
+
 from services.data_loader import data_store, CAPABILITY_KEYWORDS
+from services.region_index import region_index
 
 
 def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
@@ -16,11 +19,22 @@ def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     return r * c
 
 
+def haversine_matrix(lats1, lngs1, lats2, lngs2) -> np.ndarray:
+    """Pairwise great-circle distances in km, shape (len(lats1), len(lats2))."""
+    phi1 = np.radians(np.asarray(lats1, dtype=np.float64))[:, None]
+    phi2 = np.radians(np.asarray(lats2, dtype=np.float64))[None, :]
+    dphi = phi2 - phi1
+    dlambda = np.radians(np.asarray(lngs2, dtype=np.float64))[None, :] - \
+        np.radians(np.asarray(lngs1, dtype=np.float64))[:, None]
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    return (2 * 6371.0 * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))).astype(np.float32)
+
+
 def extract_distance_km(message: str) -> Tuple[Optional[float], Optional[float]]:
     text = message.lower()
-    km_match = re.search(r"(\\d+(?:\\.\\d+)?)\\s*(km|kilometers|kilometres)", text)
-    mi_match = re.search(r"(\\d+(?:\\.\\d+)?)\\s*(mi|miles)", text)
-    hr_match = re.search(r"(\\d+(?:\\.\\d+)?)\\s*(hours|hrs|hr)", text)
+    km_match = re.search(r"(\d+(?:\.\d+)?)\s*(km|kilometers|kilometres)", text)
+    mi_match = re.search(r"(\d+(?:\.\d+)?)\s*(mi|miles)", text)
+    hr_match = re.search(r"(\d+(?:\.\d+)?)\s*(hours|hrs|hr)", text)
     if km_match:
         return float(km_match.group(1)), None
     if mi_match:
@@ -33,14 +47,14 @@ def extract_distance_km(message: str) -> Tuple[Optional[float], Optional[float]]
 def extract_coords(message: str) -> Optional[Tuple[float, float]]:
     text = message.lower()
     # Patterns: "lat, lng" or "lat lng"
-    match = re.search(r"(-?\\d+(?:\\.\\d+)?)\\s*,\\s*(-?\\d+(?:\\.\\d+)?)", text)
+    match = re.search(r"(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)", text)
     if match:
         lat = float(match.group(1))
         lng = float(match.group(2))
         if -90 <= lat <= 90 and -180 <= lng <= 180:
             return (lat, lng)
     match = re.search(
-        r"lat\\s*[:=]\\s*(-?\\d+(?:\\.\\d+)?)\\s*[ ,;/]+\\s*(lon|lng|long)\\w*\\s*[:=]\\s*(-?\\d+(?:\\.\\d+)?)",
+        r"lat\s*[:=]\s*(-?\d+(?:\.\d+)?)\s*[ ,;/]+\s*(lon|lng|long)\w*\s*[:=]\s*(-?\d+(?:\.\d+)?)",
         text,
     )
     if match:
@@ -128,6 +142,7 @@ def build_geospatial_response(
             "label": label,
             "coords": coords,
             "source": location_source,
+            "region": region_index.region_at(coords[0], coords[1]) if coords else None,
         },
         "radius_km": radius_km,
         "time_hours": hours,
@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional
+
+import httpx
+import numpy as np
+from openai import AsyncOpenAI
+
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+class LLMGateway:
+    """Shared async OpenAI client with bounded in-flight calls.
+
+    One ``AsyncOpenAI`` client (and its pooled HTTP connections) serves the
+    whole process. A semaphore caps concurrent LLM and embedding calls so a
+    burst of chats queues on the event loop instead of opening unbounded
+    connections, and every call runs under a per-stage timeout that covers
+    both the queueing and the request itself.
+    """
+
+    def __init__(self):
+        self._client: Optional[AsyncOpenAI] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.in_flight = 0
+        self.waiting = 0
+        self.timeouts = 0
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        if self._client is None:
+            settings = get_settings()
+            limits = httpx.Limits(
+                max_connections=settings.llm_max_connections,
+                max_keepalive_connections=settings.llm_max_connections,
+            )
+            self._client = AsyncOpenAI(
+                api_key=settings.openai_api_key,
+                max_retries=settings.llm_max_retries,
+                http_client=httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(settings.generate_timeout_s)),
+            )
+        return self._client
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(get_settings().llm_max_concurrency)
+        return self._semaphore
+
+    @asynccontextmanager
+    async def _slot(self, timeout: float):
+        """Hold one of the bounded call slots, waiting at most ``timeout`` seconds for it."""
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self.semaphore.release()
+
+    async def _bounded(self, call, timeout: float):
+        deadline = time.monotonic() + timeout
+        async with self._slot(timeout):
+            try:
+                return await asyncio.wait_for(call(), deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise
+
+    async def chat(self, timeout: float, **kwargs):
+        """``chat.completions.create`` under the concurrency bound and ``timeout`` seconds."""
+        kwargs.setdefault("model", get_settings().chat_model)
+        return await self._bounded(lambda: self.client.chat.completions.create(**kwargs), timeout)
+
+    async def chat_stream(self, timeout: float, **kwargs) -> AsyncIterator[str]:
+        """Streamed chat completion, yielding content deltas.
+
+        The slot is held until the stream ends (or the consumer stops early);
+        ``timeout`` bounds the whole stream, not each chunk.
+        """
+        kwargs.setdefault("model", get_settings().chat_model)
+        deadline = time.monotonic() + timeout
+        async with self._slot(timeout):
+            stream = None
+            try:
+                stream = await asyncio.wait_for(
+                    self.client.chat.completions.create(stream=True, **kwargs), deadline - time.monotonic()
+                )
+                chunks = stream.__aiter__()
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), deadline - time.monotonic())
+                    except StopAsyncIteration:
+                        break
+                    for choice in chunk.choices:
+                        if choice.delta and choice.delta.content:
+                            yield choice.delta.content
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise
+            finally:
+                if stream is not None:
+                    await stream.close()
+
+    async def embed(self, texts: List[str], model: str, timeout: float) -> np.ndarray:
+        """L2-normalized embeddings for ``texts``."""
+        response = await self._bounded(lambda: self.client.embeddings.create(model=model, input=texts), timeout)
+        arr = np.array([item.embedding for item in sorted(response.data, key=lambda d: d.index)], dtype=np.float32)
+        norms = np.linalg.norm(arr, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return arr / norms
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": get_settings().llm_max_concurrency,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "timeouts": self.timeouts,
+        }
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+# Global LLM gateway instance
+llm_gateway = LLMGateway()
@@ -0,0 +1,217 @@
+import math
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from models.facility import Facility
+from services.data_loader import data_store
+
+
+def _project(lat: float, lng: float) -> Tuple[float, float]:
+    """Web-mercator projection onto the unit square."""
+    x = lng / 360.0 + 0.5
+    s = math.sin(math.radians(lat))
+    y = 0.5 - 0.25 * math.log((1 + s) / (1 - s)) / math.pi
+    return x, min(max(y, 0.0), 1.0)
+
+
+def _unproject(x: float, y: float) -> Tuple[float, float]:
+    lng = (x - 0.5) * 360.0
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y))))
+    return lat, lng
+
+
+def map_point(f: Facility) -> dict:
+    """Minimal facility payload used for map markers."""
+    return {
+        "unique_id": f.unique_id,
+        "name": f.name,
+        "facility_type": f.facility_type,
+        "lat": f.lat,
+        "lng": f.lng,
+        "region": f.normalized_region,
+        "specialties_count": len(f.specialties),
+        "capabilities_count": len(f.capabilities),
+        "has_anomalies": len(f.anomalies) > 0,
+    }
+
+
+class _Level:
+    """Items (points or clusters) at one zoom level, bucketed by map tile."""
+
+    def __init__(self, zoom: int, x: np.ndarray, y: np.ndarray, point_idx: np.ndarray,
+                 type_counts: np.ndarray, anomalies: np.ndarray, expansion: np.ndarray):
+        self.zoom = zoom
+        self.x = x
+        self.y = y
+        self.point_idx = point_idx  # facility index for single points, -1 for clusters
+        self.type_counts = type_counts
+        self.anomalies = anomalies
+        self.expansion = expansion
+        tiles = 1 << zoom
+        tx = np.minimum((x * tiles).astype(np.int64), tiles - 1)
+        ty = np.minimum((y * tiles).astype(np.int64), tiles - 1)
+        keys = tx * tiles + ty
+        order = np.argsort(keys, kind="stable")
+        uniq, starts = np.unique(keys[order], return_index=True)
+        bounds = np.append(starts, len(order))
+        self.tiles: Dict[int, np.ndarray] = {
+            int(k): order[bounds[i]:bounds[i + 1]] for i, k in enumerate(uniq)
+        }
+
+    def in_bbox(self, x0: float, y0: float, x1: float, y1: float) -> np.ndarray:
+        tiles = 1 << self.zoom
+        tx0, tx1 = int(max(x0 * tiles, 0)), int(min(x1 * tiles, tiles - 1))
+        ty0, ty1 = int(max(y0 * tiles, 0)), int(min(y1 * tiles, tiles - 1))
+        if (tx1 - tx0 + 1) * (ty1 - ty0 + 1) > len(self.tiles):
+            # Viewport spans more tiles than are occupied: a flat scan is cheaper.
+            keep = (self.x >= x0) & (self.x <= x1) & (self.y >= y0) & (self.y <= y1)
+            return np.flatnonzero(keep)
+        hits = [
+            self.tiles[k]
+            for tx in range(tx0, tx1 + 1)
+            for k in range(tx * tiles + ty0, tx * tiles + ty1 + 1)
+            if k in self.tiles
+        ]
+        if not hits:
+            return np.array([], dtype=np.int64)
+        idx = np.concatenate(hits)
+        keep = (self.x[idx] >= x0) & (self.x[idx] <= x1) & (self.y[idx] >= y0) & (self.y[idx] <= y1)
+        return idx[keep]
+
+
+class MapIndex:
+    """Supercluster-style hierarchical marker clusters, precomputed per zoom.
+
+    Each zoom level greedily merges the previous (finer) level's items that fall
+    within ``radius_px`` screen pixels, and buckets the result by map tile so a
+    viewport query touches only the handful of tiles on screen. Cluster
+    summaries (counts by type, anomaly totals, expansion zoom) are rolled up at
+    build time, so a query does no per-member work.
+    """
+
+    def __init__(self, radius_px: float = 60.0, extent: int = 256,
+                 min_zoom: int = 0, max_zoom: int = 16):
+        self.radius_px = radius_px
+        self.extent = extent
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.levels: Dict[int, _Level] = {}
+        self.points: List[dict] = []
+        self.type_names: List[str] = []
+        data_store.on_change(self._on_change)
+
+    def build(self, facilities: List[Facility]):
+        """Cluster all geocoded facilities for every zoom level."""
+        located = [f for f in facilities if f.lat is not None and f.lng is not None]
+        self.points = [map_point(f) for f in located]
+        self.levels = {}
+        if not located:
+            return self
+
+        types = [f.facility_type or "unknown" for f in located]
+        self.type_names = sorted(set(types))
+        type_codes = np.array([self.type_names.index(t) for t in types], dtype=np.int64)
+
+        n = len(located)
+        xy = np.array([_project(f.lat, f.lng) for f in located], dtype=np.float64)
+        type_counts = np.zeros((n, len(self.type_names)), dtype=np.int32)
+        type_counts[np.arange(n), type_codes] = 1
+        level = _Level(
+            self.max_zoom + 1, xy[:, 0], xy[:, 1],
+            point_idx=np.arange(n),
+            type_counts=type_counts,
+            anomalies=np.array([len(f.anomalies) > 0 for f in located], dtype=np.int32),
+            expansion=np.full(n, self.max_zoom + 1, dtype=np.int32),
+        )
+        self.levels[level.zoom] = level
+
+        for zoom in range(self.max_zoom, self.min_zoom - 1, -1):
+            level = self._cluster(level, zoom)
+            self.levels[zoom] = level
+        return self
+
+    def _cluster(self, finer: _Level, zoom: int) -> _Level:
+        x, y = finer.x, finer.y
+        counts = finer.type_counts.sum(axis=1).astype(np.float64)
+        r = self.radius_px / (self.extent * (1 << zoom))
+        r2 = r * r
+        cx = (x / r).astype(np.int64)
+        cy = (y / r).astype(np.int64)
+        cells: Dict[Tuple[int, int], List[int]] = {}
+        for i, key in enumerate(zip(cx.tolist(), cy.tolist())):
+            cells.setdefault(key, []).append(i)
+
+        parent = np.full(len(x), -1, dtype=np.int64)
+        out_x, out_y, out_point, out_expansion = [], [], [], []
+        for i in range(len(x)):
+            if parent[i] >= 0:
+                continue
+            new_id = len(out_x)
+            parent[i] = new_id
+            group = [i]
+            for gx in (cx[i] - 1, cx[i], cx[i] + 1):
+                for gy in (cy[i] - 1, cy[i], cy[i] + 1):
+                    for j in cells.get((gx, gy), ()):
+                        if parent[j] < 0 and (x[j] - x[i]) ** 2 + (y[j] - y[i]) ** 2 <= r2:
+                            parent[j] = new_id
+                            group.append(j)
+            w = counts[group]
+            out_x.append(float(np.dot(x[group], w) / w.sum()))
+            out_y.append(float(np.dot(y[group], w) / w.sum()))
+            if len(group) == 1:
+                # Item passes through unchanged: keep its identity and expansion zoom.
+                out_point.append(int(finer.point_idx[i]))
+                out_expansion.append(int(finer.expansion[i]))
+            else:
+                out_point.append(-1)
+                out_expansion.append(zoom + 1)
+
+        m = len(out_x)
+        type_counts = np.zeros((m, finer.type_counts.shape[1]), dtype=np.int32)
+        np.add.at(type_counts, parent, finer.type_counts)
+        anomalies = np.bincount(parent, weights=finer.anomalies, minlength=m).astype(np.int32)
+        return _Level(
+            zoom, np.array(out_x), np.array(out_y),
+            point_idx=np.array(out_point, dtype=np.int64),
+            type_counts=type_counts,
+            anomalies=anomalies,
+            expansion=np.array(out_expansion, dtype=np.int32),
+        )
+
+    def _on_change(self, event: str, facility: Optional[Facility]):
+        self.build(data_store.facilities)
+
+    def query(self, bbox: Tuple[float, float, float, float], zoom: int) -> dict:
+        """Clusters and single points inside ``(west, south, east, north)`` at ``zoom``."""
+        zoom = int(min(max(zoom, self.min_zoom), self.max_zoom + 1))
+        level = self.levels.get(zoom)
+        if level is None:
+            return {"zoom": zoom, "clusters": [], "points": []}
+
+        west, south, east, north = bbox
+        x0, y1 = _project(max(south, -85.0), west)
+        x1, y0 = _project(min(north, 85.0), east)
+
+        clusters, points = [], []
+        for i in level.in_bbox(x0, y0, x1, y1).tolist():
+            if level.point_idx[i] >= 0:
+                points.append(self.points[int(level.point_idx[i])])
+                continue
+            lat, lng = _unproject(float(level.x[i]), float(level.y[i]))
+            row = level.type_counts[i]
+            clusters.append({
+                "id": f"{zoom}:{i}",
+                "lat": round(lat, 6),
+                "lng": round(lng, 6),
+                "count": int(row.sum()),
+                "expansion_zoom": int(level.expansion[i]),
+                "by_type": {self.type_names[t]: int(c) for t, c in enumerate(row) if c},
+                "with_anomalies": int(level.anomalies[i]),
+            })
+
+        return {"zoom": zoom, "clusters": clusters, "points": points}
+
+
+# Global map index instance
+map_index = MapIndex()
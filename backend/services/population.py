@@ -0,0 +1,66 @@
+from typing import Dict, Optional
+
+import numpy as np
+
+from services.data_loader import data_store, REGION_POPULATIONS
+from services.geospatial import haversine_matrix
+from services.region_index import region_index
+
+
+# Bounding box of Ghana: (west, south, east, north)
+GHANA_BBOX = (-3.3, 4.7, 1.2, 11.2)
+
+_grid_cache: Dict[float, dict] = {}
+
+
+def assign_regions(lats, lngs) -> np.ndarray:
+    """Assign each point to its region by boundary, else the nearest centroid."""
+    regions = region_index.assign(lats, lngs)
+    missing = np.flatnonzero(np.equal(regions, None))
+    centroids = data_store._region_centroids or {}
+    if len(missing) and centroids:
+        names = np.array(list(centroids.keys()), dtype=object)
+        coords = np.array(list(centroids.values()), dtype=np.float64)
+        dist = haversine_matrix(np.asarray(lats)[missing], np.asarray(lngs)[missing], coords[:, 0], coords[:, 1])
+        regions[missing] = names[np.argmin(dist, axis=1)]
+    return regions
+
+
+def population_grid(step_deg: float = 0.1) -> Optional[dict]:
+    """Demand surface: region populations spread evenly over in-country grid cells.
+
+    Returns a dict of parallel arrays (``lat``, ``lng``, ``region``,
+    ``population``), or None before reference data has been loaded.
+    """
+    if step_deg in _grid_cache:
+        return _grid_cache[step_deg]
+
+    centroids = data_store._region_centroids or {}
+    if not centroids:
+        return None
+
+    west, south, east, north = GHANA_BBOX
+    lat_axis = np.arange(south + step_deg / 2, north, step_deg)
+    lng_axis = np.arange(west + step_deg / 2, east, step_deg)
+    lats, lngs = (a.ravel() for a in np.meshgrid(lat_axis, lng_axis, indexing="ij"))
+
+    regions = region_index.assign(lats, lngs)
+    inside = np.not_equal(regions, None)
+    lats, lngs, regions = lats[inside], lngs[inside], regions[inside]
+
+    population = np.zeros(len(lats), dtype=np.float64)
+    for region, total in REGION_POPULATIONS.items():
+        mask = regions == region
+        cells = int(mask.sum())
+        if cells:
+            population[mask] = total / cells
+
+    grid = {
+        "lat": lats,
+        "lng": lngs,
+        "region": regions,
+        "population": population,
+        "step_deg": step_deg,
+    }
+    _grid_cache[step_deg] = grid
+    return grid
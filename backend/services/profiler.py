@@ -0,0 +1,334 @@
+import json
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from models.facility import Facility
+
+
+# Facility fields that are profiled, with how their values are read
+PROFILE_FIELDS = {
+    "name": "text",
+    "facility_type": "text",
+    "operator_type": "text",
+    "description": "text",
+    "specialties": "list",
+    "capabilities": "list",
+    "procedures": "list",
+    "equipment": "list",
+    "address_city": "text",
+    "address_region": "text",
+    "normalized_region": "text",
+    "district": "text",
+    "phone_numbers": "list",
+    "email": "text",
+    "websites": "list",
+    "year_established": "number",
+    "number_doctors": "number",
+    "capacity": "number",
+    "lat": "number",
+    "lng": "number",
+}
+
+# Length histogram bins: 0, 1, 2-3, 4-7, ... , >= 2**(LENGTH_BINS - 2)
+LENGTH_BINS = 12
+
+
+def hash64(values: List[str]) -> np.ndarray:
+    """Stable 64-bit hashes of string values."""
+    if not values:
+        return np.zeros(0, dtype=np.uint64)
+    return pd.util.hash_array(np.array(values, dtype=object), categorize=False)
+
+
+def length_bins(lengths: np.ndarray) -> np.ndarray:
+    bins = np.zeros(len(lengths), dtype=np.int64)
+    positive = lengths > 0
+    bins[positive] = np.minimum(np.floor(np.log2(lengths[positive])).astype(np.int64) + 1, LENGTH_BINS - 1)
+    return bins
+
+
+class HyperLogLog:
+    """HyperLogLog distinct-count sketch; merging takes the register maxima."""
+
+    def __init__(self, p: int = 12):
+        self.p = p
+        self.registers = np.zeros(1 << p, dtype=np.uint8)
+
+    def add(self, hashes: np.ndarray):
+        if len(hashes) == 0:
+            return
+        tail_bits = 64 - self.p
+        index = (hashes >> np.uint64(tail_bits)).astype(np.int64)
+        tail = hashes & np.uint64((1 << tail_bits) - 1)
+        # rank = position of the leftmost 1-bit in the tail (tail_bits + 1 when the tail is 0);
+        # tail_bits <= 52 so the float exponent is exact
+        _, bit_length = np.frexp(tail.astype(np.float64))
+        rank = (tail_bits - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: "HyperLogLog"):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.exp2(-self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            return int(round(m * np.log(m / zeros)))
+        return int(round(raw))
+
+
+class CountMinSketch:
+    """Count-min frequency sketch; counts may be decremented (turnstile) and merged by addition."""
+
+    def __init__(self, width: int = 2048, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.int64)
+
+    def _columns(self, hashes: np.ndarray) -> np.ndarray:
+        # Double hashing: row i uses h1 + i * h2
+        h1 = (hashes & np.uint64(0xFFFFFFFF)).astype(np.int64)
+        h2 = (hashes >> np.uint64(32)).astype(np.int64) | 1
+        rows = np.arange(self.depth, dtype=np.int64)[:, None]
+        return (h1[None, :] + rows * h2[None, :]) % self.width
+
+    def add(self, hashes: np.ndarray, counts: np.ndarray):
+        if len(hashes) == 0:
+            return
+        columns = self._columns(hashes)
+        for row in range(self.depth):
+            self.table[row] += np.bincount(columns[row], weights=counts, minlength=self.width).astype(np.int64)
+
+    def merge(self, other: "CountMinSketch"):
+        self.table += other.table
+
+    def estimate(self, hashes: np.ndarray) -> np.ndarray:
+        if len(hashes) == 0:
+            return np.zeros(0, dtype=np.int64)
+        columns = self._columns(hashes)
+        return self.table[np.arange(self.depth)[:, None], columns].min(axis=0)
+
+
+class ColumnProfile:
+    """Mergeable statistics for one field: fill rate, distinct count, top values, lengths.
+
+    Distinct values go into a HyperLogLog and frequencies into a count-min
+    sketch; top values are tracked as a bounded candidate set ranked by their
+    sketch estimates. Everything but the distinct count and the numeric
+    min/max supports removals.
+    """
+
+    def __init__(self, kind: str, top_k: int = 10):
+        self.kind = kind
+        self.top_k = top_k
+        self.rows = 0
+        self.filled = 0
+        self.parse_failures = 0
+        self.hll = HyperLogLog()
+        self.cms = CountMinSketch()
+        self.candidates: Dict[str, np.uint64] = {}
+        self.lengths = np.zeros(LENGTH_BINS, dtype=np.int64)
+        self.total = 0.0
+        self.minimum = np.inf
+        self.maximum = -np.inf
+
+    def observe(self, values: list, sign: int = 1):
+        """Add (or with ``sign=-1`` remove) one chunk of raw field values."""
+        if self.kind == "list":
+            lengths = np.array([len(v or []) for v in values], dtype=np.int64)
+            items = [item for v in values for item in (v or [])]
+        elif self.kind == "number":
+            lengths = np.array([0 if v is None else 1 for v in values], dtype=np.int64)
+            items = [v for v in values if v is not None]
+        else:
+            lengths = np.array([len(v) if v else 0 for v in values], dtype=np.int64)
+            items = [v for v in values if v]
+
+        self.rows += sign * len(values)
+        self.filled += sign * int(np.count_nonzero(lengths))
+        if self.kind == "number":
+            numbers = np.array(items, dtype=np.float64)
+            self.total += sign * float(numbers.sum())
+            if sign > 0 and len(numbers):
+                self.minimum = min(self.minimum, float(numbers.min()))
+                self.maximum = max(self.maximum, float(numbers.max()))
+        else:
+            self.lengths += sign * np.bincount(length_bins(lengths), minlength=LENGTH_BINS)
+
+        # Sketch each distinct value once, weighted by its count in the chunk
+        counts = pd.Series(items, dtype=object).value_counts(sort=sign > 0)
+        values = [str(v) for v in counts.index]
+        hashes = hash64(values)
+        if sign > 0:
+            self.hll.add(hashes)
+        self.cms.add(hashes, sign * counts.to_numpy(dtype=np.float64))
+        if sign > 0 and values:
+            for i in range(min(len(values), self.top_k * 4)):
+                self.candidates.setdefault(values[i], hashes[i])
+            self._prune()
+
+    def merge(self, other: "ColumnProfile"):
+        self.rows += other.rows
+        self.filled += other.filled
+        self.parse_failures += other.parse_failures
+        self.hll.merge(other.hll)
+        self.cms.merge(other.cms)
+        self.lengths += other.lengths
+        self.total += other.total
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        self.candidates.update(other.candidates)
+        self._prune()
+
+    def _prune(self):
+        """Keep the strongest candidates, with headroom so late risers are not lost."""
+        limit = self.top_k * 4
+        if len(self.candidates) <= limit:
+            return
+        values = list(self.candidates)
+        counts = self.cms.estimate(np.array([self.candidates[v] for v in values], dtype=np.uint64))
+        keep = np.argsort(-counts, kind="stable")[:limit]
+        self.candidates = {values[i]: self.candidates[values[i]] for i in keep}
+
+    def top_values(self) -> List[dict]:
+        values = list(self.candidates)
+        counts = self.cms.estimate(np.array([self.candidates[v] for v in values], dtype=np.uint64))
+        order = np.argsort(-counts, kind="stable")
+        return [{"value": values[i], "count": int(counts[i])} for i in order[:self.top_k] if counts[i] > 0]
+
+    def fill_rate(self) -> float:
+        return round(self.filled / self.rows * 100, 1) if self.rows else 0.0
+
+    def summary(self) -> dict:
+        result = {
+            "kind": self.kind,
+            "rows": self.rows,
+            "filled": self.filled,
+            "fill_rate": self.fill_rate(),
+            "distinct_estimate": self.hll.estimate(),
+            "top_values": self.top_values(),
+            "parse_failures": self.parse_failures,
+        }
+        if self.kind == "number":
+            result["min"] = None if np.isinf(self.minimum) else self.minimum
+            result["max"] = None if np.isinf(self.maximum) else self.maximum
+            result["mean"] = round(self.total / self.filled, 2) if self.filled else None
+        else:
+            labels = ["0", "1"] + [f"{2 ** (b - 1)}-{2 ** b - 1}" for b in range(2, LENGTH_BINS - 1)]
+            labels.append(f"{2 ** (LENGTH_BINS - 2)}+")
+            result["length_histogram"] = dict(zip(labels, self.lengths.tolist()))
+        return result
+
+
+def source_parse_failures(df: pd.DataFrame, json_fields: Dict[str, str], number_fields: Dict[str, str]) -> Dict[str, int]:
+    """Raw values that fail to parse, keyed by the facility field they feed.
+
+    ``json_fields``/``number_fields`` map source CSV columns to facility fields.
+    """
+    failures = {}
+    for column, field in json_fields.items():
+        if column not in df.columns:
+            continue
+        raw = df[column][df[column].map(lambda v: isinstance(v, str) and v.strip() not in ("", "[]"))]
+        failures[field] = int(sum(not _is_json_array(v) for v in raw))
+    for column, field in number_fields.items():
+        if column not in df.columns:
+            continue
+        present = df[column].notna() & df[column].astype(str).str.strip().ne("")
+        failures[field] = int((present & pd.to_numeric(df[column], errors="coerce").isna()).sum())
+    return failures
+
+
+def _is_json_array(value: str) -> bool:
+    try:
+        return isinstance(json.loads(value), list)
+    except (json.JSONDecodeError, TypeError):
+        return False
+
+
+class DataProfiler:
+    """Per-field profiles of the facility records, kept current incrementally.
+
+    A full load profiles fixed-size chunks and merges them; upserts add the
+    new record and subtract the one it replaces. A summary is recorded for
+    each data version (bounded history) so versions can be compared. Distinct
+    counts only grow between full loads, since HyperLogLog cannot delete.
+    """
+
+    def __init__(self, chunk_size: int = 50_000, history: int = 20):
+        self.chunk_size = chunk_size
+        self.history_size = history
+        self.columns: Dict[str, ColumnProfile] = {}
+        self.history: "OrderedDict[int, dict]" = OrderedDict()
+
+    @staticmethod
+    def profile_chunk(facilities: List[Facility]) -> Dict[str, ColumnProfile]:
+        profiles = {}
+        for field, kind in PROFILE_FIELDS.items():
+            profile = ColumnProfile(kind)
+            profile.observe([getattr(f, field) for f in facilities])
+            profiles[field] = profile
+        return profiles
+
+    def build(self, facilities: List[Facility], parse_failures: Optional[Dict[str, int]] = None):
+        """Profile all facilities chunk by chunk, replacing the current profile."""
+        self.columns = {field: ColumnProfile(kind) for field, kind in PROFILE_FIELDS.items()}
+        for start in range(0, len(facilities), self.chunk_size):
+            for field, profile in self.profile_chunk(facilities[start:start + self.chunk_size]).items():
+                self.columns[field].merge(profile)
+        for field, count in (parse_failures or {}).items():
+            if field in self.columns:
+                self.columns[field].parse_failures = count
+        return self
+
+    def update(self, facility: Facility, previous: Optional[Facility] = None):
+        for field, profile in self.columns.items():
+            if previous is not None:
+                profile.observe([getattr(previous, field)], sign=-1)
+            profile.observe([getattr(facility, field)])
+
+    def remove(self, facility: Facility):
+        for field, profile in self.columns.items():
+            profile.observe([getattr(facility, field)], sign=-1)
+
+    def summary(self) -> Dict[str, dict]:
+        return {field: profile.summary() for field, profile in self.columns.items()}
+
+    def record(self, version: int) -> dict:
+        """Store (and return) the summary for a data version."""
+        snapshot = self.summary()
+        self.history[version] = snapshot
+        while len(self.history) > self.history_size:
+            self.history.popitem(last=False)
+        return snapshot
+
+    def compare(self, base: int, target: int) -> Optional[dict]:
+        """Per-field changes between two recorded versions, or None if either is gone."""
+        if base not in self.history or target not in self.history:
+            return None
+        before, after = self.history[base], self.history[target]
+        changes = {}
+        for field in after:
+            b, a = before.get(field), after[field]
+            if b is None:
+                continue
+            top_before = {t["value"] for t in b["top_values"]}
+            delta = {
+                "fill_rate": round(a["fill_rate"] - b["fill_rate"], 1),
+                "distinct_estimate": a["distinct_estimate"] - b["distinct_estimate"],
+                "parse_failures": a["parse_failures"] - b["parse_failures"],
+                "new_top_values": [t["value"] for t in a["top_values"] if t["value"] not in top_before],
+            }
+            if any(delta[k] for k in delta):
+                changes[field] = delta
+        rows = next(iter(after.values()), {}).get("rows", 0) - next(iter(before.values()), {}).get("rows", 0)
+        return {"base_version": base, "target_version": target, "row_change": rows, "changed_fields": changes}
+
+
+# Global data profiler instance
+data_profiler = DataProfiler()
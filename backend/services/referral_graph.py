@@ -0,0 +1,145 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from models.facility import Facility
+from services.data_loader import data_store, CAPABILITY_CATEGORIES
+from services.geospatial import haversine_matrix
+
+
+class ReferralGraph:
+    """Precomputed k nearest capable facilities for every (facility, capability).
+
+    Neighbours are stored as compact ``(n, capabilities, k)`` index and distance
+    arrays, so a referral lookup is a single array read. Facility changes are
+    applied incrementally: only rows whose neighbour lists can be affected are
+    recomputed. Removed facilities are tombstoned in place to keep positions
+    stable.
+    """
+
+    def __init__(self, k: int = 5, chunk_rows: int = 2048):
+        self.k = k
+        self.chunk_rows = chunk_rows
+        self.facilities: List[Optional[Facility]] = []
+        self._pos: Dict[str, int] = {}
+        self.lat = np.zeros(0, dtype=np.float64)
+        self.lng = np.zeros(0, dtype=np.float64)
+        self.capable = np.zeros((0, len(CAPABILITY_CATEGORIES)), dtype=bool)
+        self.neighbors = np.full((0, len(CAPABILITY_CATEGORIES), k), -1, dtype=np.int32)
+        self.distances = np.full((0, len(CAPABILITY_CATEGORIES), k), np.inf, dtype=np.float32)
+        data_store.on_change(self._on_change)
+
+    def build(self, facilities: List[Facility], capability_matrix: np.ndarray):
+        """Compute neighbour lists for all facilities and capability categories."""
+        n = len(facilities)
+        self.facilities = list(facilities)
+        self._pos = {f.unique_id: i for i, f in enumerate(facilities)}
+        self.lat = np.array([f.lat if f.lat is not None else np.nan for f in facilities], dtype=np.float64)
+        self.lng = np.array([f.lng if f.lng is not None else np.nan for f in facilities], dtype=np.float64)
+        located = ~np.isnan(self.lat)
+        self.capable = np.asarray(capability_matrix, dtype=bool).reshape(n, -1) & located[:, None]
+        self.neighbors = np.full((n, len(CAPABILITY_CATEGORIES), self.k), -1, dtype=np.int32)
+        self.distances = np.full((n, len(CAPABILITY_CATEGORIES), self.k), np.inf, dtype=np.float32)
+
+        rows = np.flatnonzero(located)
+        for c in range(len(CAPABILITY_CATEGORIES)):
+            self._recompute_rows(rows, c)
+        return self
+
+    def referrals(self, unique_id: str, capability: Optional[str] = None,
+                  limit: Optional[int] = None) -> Optional[Dict[str, List[dict]]]:
+        """Nearest capable facilities for one facility, per capability category."""
+        pos = self._pos.get(unique_id)
+        if pos is None:
+            return None
+        caps = [capability] if capability else CAPABILITY_CATEGORIES
+        limit = min(limit or self.k, self.k)
+        result = {}
+        for cap in caps:
+            c = CAPABILITY_CATEGORIES.index(cap)
+            result[cap] = [
+                {
+                    "unique_id": self.facilities[j].unique_id,
+                    "name": self.facilities[j].name,
+                    "type": self.facilities[j].facility_type,
+                    "region": self.facilities[j].normalized_region,
+                    "distance_km": round(float(d), 2),
+                }
+                for j, d in zip(self.neighbors[pos, c, :limit].tolist(), self.distances[pos, c, :limit])
+                if j >= 0
+            ]
+        return result
+
+    def _recompute_rows(self, rows: np.ndarray, c: int):
+        """Exact k-nearest capable neighbours (excluding self) for the given rows."""
+        targets = np.flatnonzero(self.capable[:, c])
+        self.neighbors[rows, c] = -1
+        self.distances[rows, c] = np.inf
+        if len(rows) == 0 or len(targets) == 0:
+            return
+        k = min(self.k, len(targets))
+        for start in range(0, len(rows), self.chunk_rows):
+            chunk = rows[start:start + self.chunk_rows]
+            d = haversine_matrix(self.lat[chunk], self.lng[chunk], self.lat[targets], self.lng[targets])
+            d[chunk[:, None] == targets[None, :]] = np.inf
+            if k < len(targets):
+                part = np.argpartition(d, k - 1, axis=1)[:, :k]
+            else:
+                part = np.broadcast_to(np.arange(len(targets)), (len(chunk), len(targets)))
+            part_d = np.take_along_axis(d, part, axis=1)
+            order = np.argsort(part_d, axis=1)
+            best = np.take_along_axis(part, order, axis=1)
+            best_d = np.take_along_axis(part_d, order, axis=1)
+            self.neighbors[chunk, c, :k] = np.where(np.isinf(best_d), -1, targets[best])
+            self.distances[chunk, c, :k] = best_d
+
+    def _on_change(self, event: str, facility: Optional[Facility]):
+        if facility is None:
+            return
+        if event == "remove":
+            pos = self._pos.pop(facility.unique_id, None)
+            if pos is None:
+                return
+            self.facilities[pos] = None
+            self.lat[pos] = self.lng[pos] = np.nan
+            self.capable[pos] = False
+            self.neighbors[pos] = -1
+            self.distances[pos] = np.inf
+            self._repair(pos)
+            return
+
+        pos = self._pos.get(facility.unique_id)
+        if pos is None:
+            pos = len(self.facilities)
+            self._pos[facility.unique_id] = pos
+            self.facilities.append(facility)
+            self.lat = np.append(self.lat, np.nan)
+            self.lng = np.append(self.lng, np.nan)
+            self.capable = np.vstack([self.capable, np.zeros((1, self.capable.shape[1]), dtype=bool)])
+            self.neighbors = np.concatenate([self.neighbors, np.full((1,) + self.neighbors.shape[1:], -1, np.int32)])
+            self.distances = np.concatenate([self.distances, np.full((1,) + self.distances.shape[1:], np.inf, np.float32)])
+        else:
+            self.facilities[pos] = facility
+
+        located = facility.lat is not None and facility.lng is not None
+        self.lat[pos] = facility.lat if located else np.nan
+        self.lng[pos] = facility.lng if located else np.nan
+        store_pos = data_store._facility_index.get(facility.unique_id)
+        self.capable[pos] = data_store.capability_matrix[store_pos] & located if store_pos is not None else False
+        self._repair(pos)
+
+    def _repair(self, pos: int):
+        """Recompute the changed facility's own lists and every list it can enter or leave."""
+        live = np.flatnonzero(~np.isnan(self.lat))
+        for c in range(len(CAPABILITY_CATEGORIES)):
+            affected = np.flatnonzero((self.neighbors[:, c] == pos).any(axis=1))
+            if self.capable[pos, c] and len(live):
+                d = haversine_matrix(self.lat[live], self.lng[live], [self.lat[pos]], [self.lng[pos]])[:, 0]
+                affected = np.union1d(affected, live[d < self.distances[live, c, -1]])
+            if not np.isnan(self.lat[pos]):
+                affected = np.union1d(affected, [pos])
+            self._recompute_rows(affected.astype(np.int64), c)
+
+
+# Global referral graph instance
+referral_graph = ReferralGraph()
@@ -0,0 +1,149 @@
+import json
+import math
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+DATA_DIR = Path(__file__).parent.parent / "data"
+BOUNDARIES_FILE = DATA_DIR / "ghana_region_boundaries.geojson"
+
+
+def _points_in_rings(lats: np.ndarray, lngs: np.ndarray, rings: List[np.ndarray]) -> np.ndarray:
+    """Even-odd ray casting against all rings of a polygon (outer ring plus holes)."""
+    inside = np.zeros(lats.shape, dtype=bool)
+    for ring in rings:
+        ax, ay = ring[:-1, 0], ring[:-1, 1]
+        bx, by = ring[1:, 0], ring[1:, 1]
+        for x1, y1, x2, y2 in zip(ax, ay, bx, by):
+            crosses = (y1 > lats) != (y2 > lats)
+            if not crosses.any():
+                continue
+            x_at = x1 + (lats - y1) * (x2 - x1) / ((y2 - y1) or 1e-12)
+            inside ^= crosses & (lngs < x_at)
+    return inside
+
+
+class _Node:
+    __slots__ = ("bbox", "children", "part")
+
+    def __init__(self, bbox: np.ndarray, children: List["_Node"] = None, part: int = -1):
+        self.bbox = bbox  # (min_lng, min_lat, max_lng, max_lat)
+        self.children = children or []
+        self.part = part  # polygon part index for leaves
+
+
+class RegionIndex:
+    """Region boundaries with an STR-packed R-tree over polygon bounding boxes.
+
+    Bulk lookups descend the tree with whole point arrays: each node keeps the
+    points inside its box and only leaf polygons run exact point-in-polygon
+    tests, so assignment stays vectorized for millions of points.
+    """
+
+    def __init__(self, node_capacity: int = 4):
+        self.node_capacity = node_capacity
+        self.regions: List[str] = []
+        self._part_region: List[int] = []
+        self._part_rings: List[List[np.ndarray]] = []
+        self._root: Optional[_Node] = None
+        self._adjacency: Optional[Dict[str, List[str]]] = None
+
+    def load(self, path: Path = BOUNDARIES_FILE):
+        """Load Polygon/MultiPolygon features keyed by their ``region`` property."""
+        with open(path) as f:
+            collection = json.load(f)
+
+        self.regions, self._part_region, self._part_rings = [], [], []
+        for feature in collection.get("features", []):
+            name = feature["properties"]["region"]
+            geometry = feature["geometry"]
+            polygons = geometry["coordinates"] if geometry["type"] == "MultiPolygon" else [geometry["coordinates"]]
+            if name not in self.regions:
+                self.regions.append(name)
+            for polygon in polygons:
+                self._part_region.append(self.regions.index(name))
+                self._part_rings.append([np.asarray(ring, dtype=np.float64) for ring in polygon])
+
+        leaves = []
+        for i, rings in enumerate(self._part_rings):
+            outer = rings[0]
+            bbox = np.array([outer[:, 0].min(), outer[:, 1].min(), outer[:, 0].max(), outer[:, 1].max()])
+            leaves.append(_Node(bbox, part=i))
+        self._root = self._pack(leaves) if leaves else None
+        self._adjacency = None
+        return self
+
+    def _pack(self, nodes: List[_Node]) -> _Node:
+        """Sort-Tile-Recursive bulk loading, one level at a time up to the root."""
+        while len(nodes) > 1:
+            cap = self.node_capacity
+            n_parents = math.ceil(len(nodes) / cap)
+            n_slices = math.ceil(math.sqrt(n_parents))
+            by_x = sorted(nodes, key=lambda n: n.bbox[0] + n.bbox[2])
+            slice_size = n_slices * cap
+            parents = []
+            for s in range(0, len(by_x), slice_size):
+                vertical = sorted(by_x[s:s + slice_size], key=lambda n: n.bbox[1] + n.bbox[3])
+                for g in range(0, len(vertical), cap):
+                    group = vertical[g:g + cap]
+                    boxes = np.array([n.bbox for n in group])
+                    bbox = np.array([boxes[:, 0].min(), boxes[:, 1].min(), boxes[:, 2].max(), boxes[:, 3].max()])
+                    parents.append(_Node(bbox, children=group))
+            nodes = parents
+        return nodes[0]
+
+    def assign(self, lats, lngs) -> np.ndarray:
+        """Region name for every point (None outside all regions)."""
+        if self._root is None:
+            self.load()
+        lats = np.asarray(lats, dtype=np.float64).ravel()
+        lngs = np.asarray(lngs, dtype=np.float64).ravel()
+        codes = np.full(len(lats), -1, dtype=np.int64)
+        valid = np.flatnonzero(~(np.isnan(lats) | np.isnan(lngs)))
+        if self._root is not None and len(valid):
+            self._descend(self._root, valid, lats, lngs, codes)
+        names = np.array(self.regions + [None], dtype=object)
+        return names[codes]
+
+    def region_at(self, lat: float, lng: float) -> Optional[str]:
+        return self.assign([lat], [lng])[0]
+
+    def adjacency(self, decimals: int = 5) -> Dict[str, List[str]]:
+        """Regions sharing at least one boundary vertex with each region."""
+        if self._root is None:
+            self.load()
+        if self._adjacency is None:
+            owners = defaultdict(set)
+            for part, rings in enumerate(self._part_rings):
+                for ring in rings:
+                    for vertex in map(tuple, np.round(ring, decimals)):
+                        owners[vertex].add(self._part_region[part])
+            neighbours = defaultdict(set)
+            for shared in owners.values():
+                for a in shared:
+                    neighbours[a].update(shared - {a})
+            self._adjacency = {
+                name: sorted(self.regions[j] for j in neighbours[i]) for i, name in enumerate(self.regions)
+            }
+        return self._adjacency
+
+    def _descend(self, node: _Node, idx: np.ndarray, lats: np.ndarray, lngs: np.ndarray, codes: np.ndarray):
+        x0, y0, x1, y1 = node.bbox
+        sub_lat, sub_lng = lats[idx], lngs[idx]
+        idx = idx[(sub_lng >= x0) & (sub_lng <= x1) & (sub_lat >= y0) & (sub_lat <= y1)]
+        if len(idx) == 0:
+            return
+        if node.part >= 0:
+            pending = idx[codes[idx] < 0]
+            hit = _points_in_rings(lats[pending], lngs[pending], self._part_rings[node.part])
+            codes[pending[hit]] = self._part_region[node.part]
+            return
+        for child in node.children:
+            self._descend(child, idx, lats, lngs, codes)
+
+
+# Global region index instance
+region_index = RegionIndex()
@@ -0,0 +1,123 @@
+from collections import deque
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from services.data_loader import data_store, CAPABILITY_CATEGORIES
+from services.geospatial import haversine_matrix
+from services.region_index import region_index
+from services.scenario import scenario_engine, REGIONS
+
+
+class RegionNetwork:
+    """Region distances, adjacency and a nearest-capable lookup table.
+
+    Region-to-region distances are between centroids; adjacency (and hop
+    counts) come from shared boundary vertices. For every (region,
+    capability) the table holds the nearest other region offering it and the
+    nearest capable facility to the region centroid. Facility distances and
+    region x capability counts are shared with the scenario baseline, and the
+    table is rebuilt once per data version.
+    """
+
+    def __init__(self):
+        self.version = -1
+        self.distances = np.zeros((0, 0), dtype=np.float32)
+        self.hops = np.zeros((0, 0), dtype=np.int64)
+        self.adjacency: Dict[str, List[str]] = {}
+        self._table: Dict[tuple, dict] = {}
+
+    def build(self):
+        base = scenario_engine.baseline()
+        lat, lng = base["centroid_lat"], base["centroid_lng"]
+        self.distances = haversine_matrix(lat, lng, lat, lng)
+        self.distances[np.isnan(self.distances)] = np.inf
+        self.adjacency = {r: [n for n in region_index.adjacency().get(r, []) if n in REGIONS] for r in REGIONS}
+        self.hops = self._hop_counts()
+
+        # Nearest other capable region: mask regions lacking the capability (and the region itself)
+        counts = base["counts"]
+        other = self.distances.copy()
+        np.fill_diagonal(other, np.inf)
+        region_dist = np.where(counts.T[:, None, :] > 0, other[None, :, :], np.inf)  # (C, R, R)
+        nearest_region = region_dist.argmin(axis=2)
+        nearest_region_km = region_dist.min(axis=2)
+
+        # Nearest capable facility to each region centroid
+        dist, capable = base["dist"], data_store.capability_matrix
+        table = {}
+        for c, capability in enumerate(CAPABILITY_CATEGORIES):
+            masked = np.where(capable[:, c][None, :], dist, np.inf) if dist.shape[1] else dist
+            nearest_facility = masked.argmin(axis=1) if dist.shape[1] else np.full(len(REGIONS), -1)
+            for r, region in enumerate(REGIONS):
+                region_km = nearest_region_km[c, r]
+                other_region = REGIONS[nearest_region[c, r]] if np.isfinite(region_km) else None
+                facility = None
+                pos = nearest_facility[r]
+                if pos >= 0 and np.isfinite(masked[r, pos]):
+                    f = data_store.facilities[pos]
+                    facility = {
+                        "unique_id": f.unique_id,
+                        "name": f.name,
+                        "region": f.normalized_region,
+                        "distance_km": round(float(masked[r, pos]), 1),
+                    }
+                table[(region, capability)] = {
+                    "region": region,
+                    "capability": capability,
+                    "facilities_in_region": int(counts[r, c]),
+                    "nearest_region": other_region,
+                    "nearest_region_distance_km": round(float(region_km), 1) if other_region else None,
+                    "nearest_region_is_adjacent": other_region in self.adjacency.get(region, []),
+                    "nearest_region_hops": int(self.hops[r, REGIONS.index(other_region)]) if other_region else None,
+                    "nearest_facility": facility,
+                }
+        self._table = table
+        self.version = data_store.version
+        return self
+
+    def _hop_counts(self) -> np.ndarray:
+        """Breadth-first hop counts over the adjacency graph (-1 where unreachable)."""
+        index = {r: i for i, r in enumerate(REGIONS)}
+        hops = np.full((len(REGIONS), len(REGIONS)), -1, dtype=np.int64)
+        for start, region in enumerate(REGIONS):
+            hops[start, start] = 0
+            queue = deque([region])
+            while queue:
+                current = queue.popleft()
+                for neighbour in self.adjacency.get(current, []):
+                    if hops[start, index[neighbour]] < 0:
+                        hops[start, index[neighbour]] = hops[start, index[current]] + 1
+                        queue.append(neighbour)
+        return hops
+
+    def _current(self) -> "RegionNetwork":
+        if self.version != data_store.version:
+            self.build()
+        return self
+
+    def nearest(self, region: str, capability: str) -> Optional[dict]:
+        """Nearest capable region and facility for a region, or None for unknown keys."""
+        return self._current()._table.get((region, capability))
+
+    def table(self, region: Optional[str] = None, capability: Optional[str] = None) -> List[dict]:
+        self._current()
+        return [
+            entry for (r, c), entry in self._table.items()
+            if (region is None or r == region) and (capability is None or c == capability)
+        ]
+
+    def graph(self) -> dict:
+        self._current()
+        # float64 before rounding, so float32 distances serialise as 194.7 rather than 194.6999969482422
+        distances = np.where(np.isinf(self.distances), -1, self.distances).astype(np.float64)
+        return {
+            "regions": REGIONS,
+            "distance_km": np.round(distances, 1).tolist(),
+            "adjacency": self.adjacency,
+            "hops": self.hops.tolist(),
+        }
+
+
+# Global region network instance
+region_network = RegionNetwork()
@@ -0,0 +1,71 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+import orjson
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from models.facility import Facility
+from services.data_loader import data_store
+
+
+class ResponseCache:
+    """Pre-serialized JSON responses for endpoints that are pure functions of the data.
+
+    Entries are keyed by path, query string and data version and hold the
+    encoded body plus a strong ETag, so a repeat request is one dict lookup.
+    ``If-None-Match`` revalidation returns 304 without a body. The cache is
+    cleared whenever the DataStore changes. Routes run on the threadpool, so
+    the entries are only touched under a lock; bodies are built outside it.
+    """
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, tuple[bytes, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        data_store.on_change(self._on_change)
+
+    def respond(self, request: Request, build: Callable[[], Any]) -> Response:
+        key = (request.url.path, tuple(sorted(request.query_params.multi_items())), data_store.version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                self._entries.move_to_end(key)
+        if entry is None:
+            body = orjson.dumps(jsonable_encoder(build()), option=orjson.OPT_SERIALIZE_NUMPY)
+            etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+            entry = (body, etag)
+            with self._lock:
+                self.misses += 1
+                self._entries[key] = entry
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+        body, etag = entry
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if self._matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    @staticmethod
+    def _matches(if_none_match: Optional[str], etag: str) -> bool:
+        if not if_none_match:
+            return False
+        tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _on_change(self, event: str, facility: Optional[Facility]):
+        self.clear()
+
+
+# Global response cache instance
+response_cache = ResponseCache()
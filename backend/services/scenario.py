@@ -0,0 +1,206 @@
+import time
+from typing import List, Optional
+
+import numpy as np
+
+from services.data_loader import data_store, CAPABILITY_CATEGORIES, REGION_POPULATIONS
+from services.geospatial import haversine_matrix
+from services.population import assign_regions
+
+
+REGIONS = list(REGION_POPULATIONS.keys())
+
+# Same grading as DataStore._compute_desert_matrix
+CRITICAL_MAX = 0
+UNDERSERVED_MAX = 2
+DESERT_MIN_GAPS = 3
+
+
+def _status(counts: np.ndarray) -> np.ndarray:
+    return np.where(counts <= CRITICAL_MAX, "critical",
+                    np.where(counts <= UNDERSERVED_MAX, "underserved", "adequate"))
+
+
+class ScenarioEngine:
+    """What-if evaluation of hypothetical facility additions and removals.
+
+    The baseline (region x capability counts and a region-centroid x facility
+    distance matrix) is cached per data version. A scenario only adjusts the
+    counts for the touched facilities and takes column minima over the
+    baseline distances plus the few added sites, so it never reloads data.
+    """
+
+    def __init__(self):
+        self._baseline: Optional[dict] = None
+
+    def baseline(self) -> dict:
+        if self._baseline is not None and self._baseline["version"] == data_store.version:
+            return self._baseline
+
+        facilities = data_store.facilities
+        codes = np.array(
+            [REGIONS.index(f.normalized_region) if f.normalized_region in REGION_POPULATIONS else -1
+             for f in facilities],
+            dtype=np.int64,
+        )
+        capable = data_store.capability_matrix
+        keep = codes >= 0
+        counts = np.column_stack([
+            np.bincount(codes[keep], weights=capable[keep, c], minlength=len(REGIONS))
+            for c in range(len(CAPABILITY_CATEGORIES))
+        ]).astype(np.int64).reshape(len(REGIONS), len(CAPABILITY_CATEGORIES))
+
+        centroids = data_store._region_centroids or {}
+        c_lat = np.array([centroids.get(r, [np.nan, np.nan])[0] for r in REGIONS], dtype=np.float64)
+        c_lng = np.array([centroids.get(r, [np.nan, np.nan])[1] for r in REGIONS], dtype=np.float64)
+        f_lat = np.array([f.lat if f.lat is not None else np.nan for f in facilities], dtype=np.float64)
+        f_lng = np.array([f.lng if f.lng is not None else np.nan for f in facilities], dtype=np.float64)
+        dist = haversine_matrix(c_lat, c_lng, f_lat, f_lng)
+        dist[np.isnan(dist)] = np.inf
+
+        self._baseline = {
+            "version": data_store.version,
+            "codes": codes,
+            "counts": counts,
+            "centroid_lat": c_lat,
+            "centroid_lng": c_lng,
+            "dist": dist,
+            "nearest": self._nearest(dist, capable),
+        }
+        return self._baseline
+
+    @staticmethod
+    def _nearest(dist: np.ndarray, capable: np.ndarray) -> np.ndarray:
+        """Region x capability distance to the closest capable facility (inf if none)."""
+        if dist.shape[1] == 0:
+            return np.full((dist.shape[0], capable.shape[1]), np.inf, dtype=np.float32)
+        return np.stack([
+            np.where(capable[:, c][None, :], dist, np.inf).min(axis=1)
+            for c in range(capable.shape[1])
+        ], axis=1)
+
+    def evaluate(self, add: List[dict], remove: List[str], radius_km: float = 50.0) -> dict:
+        """Deltas of the desert matrix, region flags and cold spots for one scenario.
+
+        ``add`` items carry ``lat``, ``lng``, ``capabilities`` (category names)
+        and an optional ``region``; ``remove`` lists existing facility IDs.
+        """
+        started = time.perf_counter()
+        base = self.baseline()
+        counts = base["counts"].copy()
+
+        # Removals: drop their rows from the counts and their columns from the distances
+        positions, not_found = [], []
+        for unique_id in dict.fromkeys(remove):
+            pos = data_store._facility_index.get(unique_id)
+            if pos is None:
+                not_found.append(unique_id)
+            else:
+                positions.append(pos)
+        positions = np.array(positions, dtype=np.int64)
+        touched = np.zeros(len(CAPABILITY_CATEGORIES), dtype=bool)
+        if len(positions):
+            rows = data_store.capability_matrix[positions]
+            touched |= rows.any(axis=0)
+            region_rows = base["codes"][positions]
+            valid = region_rows >= 0
+            np.subtract.at(counts, region_rows[valid], rows[valid].astype(np.int64))
+
+        # Additions: region by boundary (or explicit), capability rows from category names
+        add_rows = np.array(
+            [[cap in item.get("capabilities", []) for cap in CAPABILITY_CATEGORIES] for item in add],
+            dtype=bool,
+        ).reshape(len(add), len(CAPABILITY_CATEGORIES))
+        a_lat = np.array([item["lat"] for item in add], dtype=np.float64)
+        a_lng = np.array([item["lng"] for item in add], dtype=np.float64)
+        a_regions = assign_regions(a_lat, a_lng) if len(add) else np.array([], dtype=object)
+        for i, item in enumerate(add):
+            region = item.get("region") or a_regions[i]
+            if region in REGION_POPULATIONS:
+                counts[REGIONS.index(region)] += add_rows[i]
+        touched |= add_rows.any(axis=0)
+
+        # Cold-spot distances: baseline unless a removed facility was the nearest
+        nearest = base["nearest"].copy()
+        if len(positions):
+            dist = base["dist"].copy()
+            dist[:, positions] = np.inf
+            affected = np.flatnonzero(touched)
+            capable = data_store.capability_matrix[:, affected]
+            nearest[:, affected] = self._nearest(dist, capable)
+        if len(add):
+            add_dist = haversine_matrix(base["centroid_lat"], base["centroid_lng"], a_lat, a_lng)
+            nearest = np.minimum(nearest, self._nearest(add_dist, add_rows))
+
+        return {
+            **self._deltas(base["counts"], counts, base["nearest"], nearest, radius_km),
+            "added": len(add),
+            "removed": len(positions),
+            "not_found": not_found,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+
+    @staticmethod
+    def _deltas(counts_before: np.ndarray, counts_after: np.ndarray, nearest_before: np.ndarray,
+                nearest_after: np.ndarray, radius_km: float) -> dict:
+        status_before, status_after = _status(counts_before), _status(counts_after)
+
+        matrix_changes = [
+            {
+                "region": REGIONS[r],
+                "capability": CAPABILITY_CATEGORIES[c],
+                "facility_count_before": int(counts_before[r, c]),
+                "facility_count_after": int(counts_after[r, c]),
+                "status_before": str(status_before[r, c]),
+                "status_after": str(status_after[r, c]),
+            }
+            for r, c in zip(*np.nonzero(counts_before != counts_after))
+        ]
+
+        gaps_before = (status_before == "critical").sum(axis=1)
+        gaps_after = (status_after == "critical").sum(axis=1)
+        region_changes = []
+        for r, region in enumerate(REGIONS):
+            before = [cap for c, cap in enumerate(CAPABILITY_CATEGORIES) if status_before[r, c] == "critical"]
+            after = [cap for c, cap in enumerate(CAPABILITY_CATEGORIES) if status_after[r, c] == "critical"]
+            if before != after:
+                region_changes.append({
+                    "region": region,
+                    "desert_gaps_before": before,
+                    "desert_gaps_after": after,
+                    "is_medical_desert_before": len(before) >= DESERT_MIN_GAPS,
+                    "is_medical_desert_after": len(after) >= DESERT_MIN_GAPS,
+                })
+
+        def km(d) -> Optional[float]:
+            return None if np.isinf(d) else round(float(d), 2)
+
+        cold_spot_changes = [
+            {
+                "region": REGIONS[r],
+                "capability": CAPABILITY_CATEGORIES[c],
+                "distance_km_before": km(nearest_before[r, c]),
+                "distance_km_after": km(nearest_after[r, c]),
+                "cold_spot_before": bool(nearest_before[r, c] > radius_km),
+                "cold_spot_after": bool(nearest_after[r, c] > radius_km),
+            }
+            for r, c in zip(*np.nonzero(nearest_before != nearest_after))
+        ]
+
+        return {
+            "summary": {
+                "critical_gaps_before": int((status_before == "critical").sum()),
+                "critical_gaps_after": int((status_after == "critical").sum()),
+                "desert_regions_before": int((gaps_before >= DESERT_MIN_GAPS).sum()),
+                "desert_regions_after": int((gaps_after >= DESERT_MIN_GAPS).sum()),
+                "cold_spots_before": int((nearest_before > radius_km).sum()),
+                "cold_spots_after": int((nearest_after > radius_km).sum()),
+            },
+            "matrix_changes": matrix_changes,
+            "region_changes": region_changes,
+            "cold_spot_changes": cold_spot_changes,
+        }
+
+
+# Global scenario engine instance
+scenario_engine = ScenarioEngine()
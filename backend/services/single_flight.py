@@ -0,0 +1,89 @@
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from services.data_loader import data_store
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Coalesces identical in-flight calls so concurrent duplicates share one computation.
+
+    Calls are keyed by a namespace, the DataStore version and a caller
+    supplied key (the normalized request). While a call is running, an
+    identical call waits for its result (or exception) instead of starting
+    its own; once it finishes the key is released, so later calls run again
+    (or hit whatever cache the computation fills). ``run`` serves sync code
+    on the threadpool, ``run_async`` coroutines on the event loop; a caller
+    that is cancelled does not cancel the shared computation.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Tuple, Future] = {}
+        self._tasks: Dict[Tuple, asyncio.Task] = {}
+        self._counts: Dict[str, Dict[str, int]] = defaultdict(lambda: {"executed": 0, "coalesced": 0})
+
+    @staticmethod
+    def _key(namespace: str, key: Hashable) -> Tuple:
+        return namespace, data_store.version, key
+
+    def run(self, namespace: str, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Call ``fn()`` unless an identical call is in flight, then wait for its result."""
+        flight_key = self._key(namespace, key)
+        with self._lock:
+            future = self._calls.get(flight_key)
+            leader = future is None
+            if leader:
+                future = self._calls[flight_key] = Future()
+            self._counts[namespace]["executed" if leader else "coalesced"] += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(flight_key, None)
+
+    async def run_async(self, namespace: str, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Await ``fn()`` unless an identical call is in flight, then await its result."""
+        flight_key = self._key(namespace, key)
+        task = self._tasks.get(flight_key)
+        if task is None:
+            self._counts[namespace]["executed"] += 1
+            task = self._tasks[flight_key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda t: self._release(flight_key, t))
+        else:
+            self._counts[namespace]["coalesced"] += 1
+        return await asyncio.shield(task)
+
+    def _release(self, flight_key: Tuple, task: asyncio.Task):
+        if self._tasks.get(flight_key) is task:
+            del self._tasks[flight_key]
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"Single-flight call {flight_key[0]} failed: {task.exception()}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            in_flight = defaultdict(int)
+            for namespace, *_ in list(self._calls) + list(self._tasks):
+                in_flight[namespace] += 1
+            return {
+                namespace: {**counts, "in_flight": in_flight[namespace]}
+                for namespace, counts in self._counts.items()
+            }
+
+
+# Global single-flight instance
+single_flight = SingleFlight()
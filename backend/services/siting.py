@@ -0,0 +1,147 @@
+import heapq
+from typing import List, Optional
+
+import numpy as np
+
+from services.data_loader import data_store
+from services.geospatial import haversine_matrix, facility_matches
+from services.population import population_grid, assign_regions
+
+
+def candidate_sites(candidates: str = "towns", grid_step_deg: float = 0.25) -> dict:
+    """Candidate locations for new sites: known towns or a regular grid."""
+    if candidates == "grid":
+        grid = population_grid(grid_step_deg)
+        if grid is None:
+            return {"name": np.array([], dtype=object), "lat": np.array([]), "lng": np.array([])}
+        lats, lngs = grid["lat"], grid["lng"]
+        names = np.array([f"Grid {lat:.2f}, {lng:.2f}" for lat, lng in zip(lats, lngs)], dtype=object)
+        return {"name": names, "lat": lats, "lng": lngs}
+
+    seen = set()
+    names, lats, lngs = [], [], []
+    for city, coords in (data_store._city_coords or {}).items():
+        key = (round(coords[0], 3), round(coords[1], 3))
+        if key in seen:
+            continue
+        seen.add(key)
+        names.append(city.title())
+        lats.append(coords[0])
+        lngs.append(coords[1])
+    return {
+        "name": np.array(names, dtype=object),
+        "lat": np.array(lats, dtype=np.float64),
+        "lng": np.array(lngs, dtype=np.float64),
+    }
+
+
+def optimize_sites(
+    capability: str,
+    k: int = 5,
+    radius_km: float = 40.0,
+    candidates: str = "towns",
+    grid_step_deg: float = 0.25,
+    facility_type: Optional[str] = None,
+) -> dict:
+    """Maximal-coverage siting: pick up to k sites that newly cover the most people.
+
+    Demand cells already within ``radius_km`` of a capable facility count as
+    covered. Coverage sets are precomputed once per candidate and the budget is
+    filled by lazy-greedy submodular maximization, which carries the usual
+    (1 - 1/e) approximation guarantee.
+    """
+    grid = population_grid()
+    if grid is None:
+        return {"error": "Data not loaded yet"}
+
+    demand_pop = grid["population"]
+    total_pop = float(demand_pop.sum())
+
+    capable = [
+        f for f in data_store.facilities
+        if f.lat is not None and f.lng is not None
+        and facility_matches(f, facility_type, capability)
+    ]
+    covered = np.zeros(len(demand_pop), dtype=bool)
+    if capable:
+        f_lats = np.array([f.lat for f in capable])
+        f_lngs = np.array([f.lng for f in capable])
+        nearest = haversine_matrix(grid["lat"], grid["lng"], f_lats, f_lngs).min(axis=1)
+        covered = nearest <= radius_km
+    baseline_covered = float(demand_pop[covered].sum())
+
+    sites = candidate_sites(candidates, grid_step_deg)
+    uncovered_idx = np.flatnonzero(~covered)
+    coverage_sets: List[np.ndarray] = []
+    if len(sites["lat"]) and len(uncovered_idx):
+        reach = haversine_matrix(
+            sites["lat"], sites["lng"], grid["lat"][uncovered_idx], grid["lng"][uncovered_idx]
+        ) <= radius_km
+        coverage_sets = [uncovered_idx[row] for row in reach]
+
+    # Lazy greedy: stale upper bounds are re-evaluated only when they reach the top.
+    heap = [(-float(demand_pop[cells].sum()), i) for i, cells in enumerate(coverage_sets)]
+    heapq.heapify(heap)
+    selected = []
+    while heap and len(selected) < k:
+        neg_bound, i = heapq.heappop(heap)
+        cells = coverage_sets[i]
+        gain = float(demand_pop[cells[~covered[cells]]].sum())
+        if heap and gain < -heap[0][0]:
+            heapq.heappush(heap, (-gain, i))
+            continue
+        if gain <= 0:
+            break
+        covered[cells] = True
+        selected.append((i, gain))
+
+    site_regions = assign_regions(
+        np.array([sites["lat"][i] for i, _ in selected]),
+        np.array([sites["lng"][i] for i, _ in selected]),
+    ) if selected else []
+
+    cumulative = baseline_covered
+    recommended = []
+    for rank, ((i, gain), region) in enumerate(zip(selected, site_regions), start=1):
+        cumulative += gain
+        recommended.append({
+            "rank": rank,
+            "name": str(sites["name"][i]),
+            "lat": round(float(sites["lat"][i]), 4),
+            "lng": round(float(sites["lng"][i]), 4),
+            "region": region,
+            "newly_covered_population": int(round(gain)),
+            "cumulative_coverage_pct": round(cumulative / max(total_pop, 1) * 100, 1),
+        })
+
+    return {
+        "capability": capability,
+        "facility_type": facility_type,
+        "radius_km": radius_km,
+        "budget": k,
+        "candidates": candidates,
+        "candidates_evaluated": len(coverage_sets),
+        "existing_capable_facilities": len(capable),
+        "total_population": int(round(total_pop)),
+        "baseline_coverage_pct": round(baseline_covered / max(total_pop, 1) * 100, 1),
+        "final_coverage_pct": round(cumulative / max(total_pop, 1) * 100, 1),
+        "sites": recommended,
+        "plan_drafts": [_site_to_plan(site, capability, radius_km) for site in recommended],
+    }
+
+
+def _site_to_plan(site: dict, capability: str, radius_km: float) -> dict:
+    """Shape a recommended site as a Strategic Planner plan payload."""
+    return {
+        "title": f"{capability} deployment — {site['name']}",
+        "region": site["region"],
+        "capability_gap": capability,
+        "priority": "High" if site["rank"] <= 2 else "Medium",
+        "assets": [f"{capability} unit at {site['name']} ({site['lat']}, {site['lng']})"],
+        "actions": [
+            f"Establish {capability.lower()} services at {site['name']}",
+            f"Extend coverage to ~{site['newly_covered_population']:,} people within {radius_km:g} km",
+        ],
+        "notes": f"Siting optimizer rank {site['rank']}; cumulative coverage "
+                 f"{site['cumulative_coverage_pct']}% of population.",
+    }
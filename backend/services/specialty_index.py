@@ -0,0 +1,152 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from models.facility import Facility
+from services.admin_hierarchy import admin_hierarchy
+from services.data_loader import data_store
+from services.region_index import region_index
+
+
+class SpecialtyIndex:
+    """Sparse facility x specialty incidence in CSR form, with derived aggregates.
+
+    ``indptr``/``indices`` hold each facility's specialty ids. Unit x specialty
+    counts are one ``np.bincount`` over the nonzeros per leaf district, rolled
+    up the admin hierarchy; specialty co-occurrence is the sparse product
+    ``A.T @ A`` computed from the within-row index pairs in row chunks. All
+    aggregates are rebuilt once per data version.
+    """
+
+    def __init__(self, chunk_nnz: int = 1_000_000):
+        self.chunk_nnz = chunk_nnz
+        self.version = -1
+        self.specialties: List[str] = []
+        self._specialty_id: Dict[str, int] = {}
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.indices = np.zeros(0, dtype=np.int32)
+        self.unit_counts = np.zeros((0, 0), dtype=np.int64)
+        self.facility_counts = np.zeros(0, dtype=np.int64)
+        self.cooccurrence = np.zeros((0, 0), dtype=np.int64)
+
+    def build(self, facilities: List[Facility]):
+        """Build the CSR matrix and its aggregates for the given facilities."""
+        rows = [sorted(set(f.specialties)) for f in facilities]
+        self.specialties = sorted({s for row in rows for s in row})
+        self._specialty_id = {s: i for i, s in enumerate(self.specialties)}
+        lengths = np.array([len(row) for row in rows], dtype=np.int64)
+        self.indptr = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        self.indices = np.array(
+            [self._specialty_id[s] for row in rows for s in row], dtype=np.int32
+        )
+        n_spec = len(self.specialties)
+
+        # Unit x specialty counts: bincount over (leaf, specialty) of every nonzero, then roll up
+        leaf_of = {admin_hierarchy.names[leaf]: i for i, leaf in enumerate(admin_hierarchy.leaves.tolist())}
+        leaf = np.array([leaf_of.get(f.district, -1) for f in facilities], dtype=np.int64)
+        nnz_leaf = np.repeat(leaf, lengths)
+        keep = nnz_leaf >= 0
+        n_leaves = len(admin_hierarchy.leaves)
+        leaf_counts = np.bincount(
+            nnz_leaf[keep] * n_spec + self.indices[keep], minlength=n_leaves * n_spec
+        ).reshape(n_leaves, n_spec)
+        self.unit_counts = admin_hierarchy.rollup(leaf_counts).astype(np.int64)
+        self.facility_counts = np.bincount(self.indices, minlength=n_spec).astype(np.int64)
+
+        # Co-occurrence A.T @ A: every ordered pair of specialties within a row
+        self.cooccurrence = np.zeros((n_spec, n_spec), dtype=np.int64)
+        row_of_nnz = np.repeat(np.arange(len(facilities)), lengths)
+        r0, n_rows = 0, len(facilities)
+        while r0 < n_rows:
+            # whole rows only, about chunk_nnz nonzeros per chunk
+            r1 = max(int(np.searchsorted(self.indptr, self.indptr[r0] + self.chunk_nnz, side="right")) - 1, r0 + 1)
+            left = np.arange(self.indptr[r0], self.indptr[min(r1, n_rows)])
+            partners = lengths[row_of_nnz[left]]
+            left_rep = np.repeat(left, partners)
+            offset = np.arange(len(left_rep)) - np.repeat(np.cumsum(partners) - partners, partners)
+            right = self.indptr[row_of_nnz[left_rep]] + offset
+            self.cooccurrence += np.bincount(
+                self.indices[left_rep].astype(np.int64) * n_spec + self.indices[right],
+                minlength=n_spec * n_spec,
+            ).reshape(n_spec, n_spec)
+            r0 = r1
+        self.version = data_store.version
+        return self
+
+    def _current(self) -> "SpecialtyIndex":
+        if self.version != data_store.version:
+            self.build(data_store.facilities)
+        return self
+
+    def unit_matrix(self, level: str = "region") -> dict:
+        """Nonzero specialty counts per unit at ``level``."""
+        self._current()
+        nodes = admin_hierarchy.nodes_at(level)
+        return {
+            admin_hierarchy.names[node]: {
+                self.specialties[s]: int(self.unit_counts[node, s])
+                for s in np.flatnonzero(self.unit_counts[node])
+            }
+            for node in nodes
+        }
+
+    def cooccurring(self, specialty: Optional[str] = None, top: int = 20) -> List[dict]:
+        """Strongest co-occurring specialty pairs, optionally involving one specialty."""
+        self._current()
+        n = len(self.specialties)
+        if n == 0:
+            return []
+        co = self.cooccurrence
+        df = self.facility_counts
+        union = df[:, None] + df[None, :] - co
+        jaccard = np.divide(co, union, out=np.zeros(co.shape), where=union > 0)
+        if specialty is not None:
+            s = self._specialty_id[specialty]
+            candidates = [(s, j) for j in np.flatnonzero(co[s]) if j != s]
+        else:
+            upper = np.triu(co, k=1)
+            candidates = list(zip(*np.nonzero(upper)))
+        candidates.sort(key=lambda p: (-co[p], -jaccard[p]))
+        total = max(len(data_store.facilities), 1)
+        return [
+            {
+                "specialty": self.specialties[i],
+                "with": self.specialties[j],
+                "facilities": int(co[i, j]),
+                "jaccard": round(float(jaccard[i, j]), 3),
+                "lift": round(float(co[i, j] * total / (df[i] * df[j])), 2),
+            }
+            for i, j in candidates[:top]
+        ]
+
+    def neighbour_gaps(self, region: str) -> Optional[dict]:
+        """Specialties absent from ``region`` but offered in adjacent regions."""
+        self._current()
+        node = admin_hierarchy.node(region)
+        if node is None or admin_hierarchy.levels[node] != "region":
+            return None
+        neighbours = [r for r in region_index.adjacency().get(region, []) if admin_hierarchy.node(r) is not None]
+        neighbour_nodes = [admin_hierarchy.node(r) for r in neighbours]
+        absent = self.unit_counts[node] == 0
+        nearby = self.unit_counts[neighbour_nodes] if neighbour_nodes else np.zeros((0, len(self.specialties)))
+        missing = np.flatnonzero(absent & (nearby.sum(axis=0) > 0))
+        gaps = [
+            {
+                "specialty": self.specialties[s],
+                "neighbour_facilities": int(nearby[:, s].sum()),
+                "available_in": {
+                    neighbours[k]: int(nearby[k, s]) for k in np.flatnonzero(nearby[:, s])
+                },
+            }
+            for s in missing
+        ]
+        gaps.sort(key=lambda g: -g["neighbour_facilities"])
+        return {"region": region, "neighbours": neighbours, "missing_specialties": gaps}
+
+    def has_specialty(self, specialty: str) -> bool:
+        self._current()
+        return specialty in self._specialty_id
+
+
+# Global specialty index instance
+specialty_index = SpecialtyIndex()
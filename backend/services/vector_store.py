@@ -6,6 +6,7 @@ from openai import OpenAI, NotFoundError
 
 from config import get_settings
 from models.facility import Facility
+from services.llm import llm_gateway
 
 logger = logging.getLogger(__name__)
 
@@ -49,8 +50,22 @@ class VectorStore:
         """Search for facilities matching a natural language query."""
         if self.index is None:
             return []
+        return self._nearest(self._embed_texts([query]), top_k)
 
-        query_embedding = self._embed_texts([query])
+    async def asearch(self, query: str, top_k: int = 10, timeout: Optional[float] = None,
+                      embedding: Optional[np.ndarray] = None) -> List[Tuple[Facility, float]]:
+        """Async :meth:`search`; the query embedding goes through the shared LLM gateway.
+
+        Pass ``embedding`` (normalized, from this store's model) to skip embedding the query again.
+        """
+        if self.index is None:
+            return []
+        if embedding is not None:
+            return self._nearest(embedding.reshape(1, -1), top_k)
+        timeout = timeout if timeout is not None else get_settings().retrieval_timeout_s
+        return self._nearest(await llm_gateway.embed([query], self.model_name, timeout), top_k)
+
+    def _nearest(self, query_embedding: np.ndarray, top_k: int) -> List[Tuple[Facility, float]]:
         scores, indices = self.index.search(query_embedding, min(top_k, len(self.facility_ids)))
 
         results = []
@@ -0,0 +1,43 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.data_loader import data_store
+from services.map_index import map_index
+from services.referral_graph import referral_graph
+from services.cube import aggregation_cube
+from services.specialty_index import specialty_index
+
+
+def load_indexes():
+    """Load the dataset and build the in-memory indexes the startup hook builds (all but the vector index)."""
+    data_store.load()
+    map_index.build(data_store.facilities)
+    referral_graph.build(data_store.facilities, data_store.capability_matrix)
+    aggregation_cube.build(data_store.facilities, data_store.capability_matrix)
+    specialty_index.build(data_store.facilities)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def store():
+    load_indexes()
+    return data_store
+
+
+@pytest.fixture(scope="session")
+def client(store):
+    from fastapi.testclient import TestClient
+    from main import app
+
+    # Not used as a context manager, so the lifespan (which embeds every facility) does not run
+    return TestClient(app)
+
+
+@pytest.fixture
+def restore_store(store):
+    """Reload the dataset after a test that upserts or removes facilities."""
+    yield store
+    load_indexes()
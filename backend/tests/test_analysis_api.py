@@ -0,0 +1,94 @@
+import pytest
+
+
+def test_siting(client):
+    response = client.post("/api/analysis/siting", json={"capability": "Surgery", "k": 3})
+    assert response.status_code == 200
+    body = response.json()
+    assert len(body["sites"]) == 3
+    assert body["final_coverage_pct"] >= body["baseline_coverage_pct"]
+
+
+def test_siting_unknown_capability(client):
+    assert client.post("/api/analysis/siting", json={"capability": "Telepathy"}).status_code == 400
+
+
+def test_scenario(client, store):
+    removed = store.facilities[0].unique_id
+    response = client.post("/api/analysis/scenario", json={
+        "add": [{"lat": 9.4, "lng": -0.85, "region": "Northern", "capabilities": ["Surgery"]}],
+        "remove": [removed, "no-such-facility"],
+    })
+    assert response.status_code == 200
+    body = response.json()
+    assert body["added"] == 1
+    assert body["removed"] == 1
+    assert body["not_found"] == ["no-such-facility"]
+
+
+@pytest.mark.parametrize("item", [
+    {"lat": 9.4, "lng": -0.85, "region": "Atlantis"},
+    {"lat": 9.4, "lng": -0.85, "capabilities": ["Telepathy"]},
+])
+def test_scenario_rejects_unknown_values(client, item):
+    assert client.post("/api/analysis/scenario", json={"add": [item]}).status_code == 400
+
+
+def test_aggregate(client):
+    response = client.get("/api/analysis/aggregate",
+                          params={"group_by": "region", "filter": "facility_type:hospital"})
+    assert response.status_code == 200
+    rows = {row["region"]: row for row in response.json()["rows"]}
+    assert rows["Ashanti"]["facilities"] == 53
+    assert rows["Greater Accra"]["facilities"] == 119
+
+
+@pytest.mark.parametrize("params", [
+    {"group_by": "planet"},
+    {"group_by": "region,region"},
+    {"group_by": "region", "filter": "facility_type"},
+])
+def test_aggregate_rejects_bad_dimensions(client, params):
+    assert client.get("/api/analysis/aggregate", params=params).status_code == 400
+
+
+def test_access_scores(client):
+    response = client.get("/api/analysis/access-scores", params={"capability": "Surgery"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["capability"] == "Surgery"
+    assert "Ashanti" in body["regions"]
+
+
+def test_access_scores_unknown_capability(client):
+    assert client.get("/api/analysis/access-scores", params={"capability": "Telepathy"}).status_code == 400
+
+
+def test_map_viewport_covers_all_points(client, store):
+    response = client.get("/api/facilities/map", params={"bbox": "-3.5,4.5,1.5,11.5", "zoom": 6})
+    assert response.status_code == 200
+    body = response.json()
+    located = sum(1 for f in store.facilities if f.lat is not None and f.lng is not None)
+    assert sum(c["count"] for c in body["clusters"]) + len(body["points"]) == located
+
+
+@pytest.mark.parametrize("bbox", ["1,2,3", "a,b,c,d", "2,0,1,1", "0,2,1,1"])
+def test_map_rejects_bad_bbox(client, bbox):
+    assert client.get("/api/facilities/map", params={"bbox": bbox, "zoom": 6}).status_code == 400
+
+
+def test_map_rejects_bad_zoom(client):
+    assert client.get("/api/facilities/map", params={"bbox": "-3.5,4.5,1.5,11.5", "zoom": 40}).status_code == 422
+
+
+@pytest.mark.parametrize("path, params", [
+    ("/api/facilities/map", {"bbox": "-3.5,4.5,1.5,11.5", "zoom": 6}),
+    ("/api/analysis/aggregate", {"group_by": "region"}),
+    ("/api/analysis/access-scores", {}),
+])
+def test_etag_not_modified(client, path, params):
+    first = client.get(path, params=params)
+    etag = first.headers["etag"]
+    second = client.get(path, params=params, headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.content == b""
@@ -0,0 +1,90 @@
+import json
+
+import pytest
+
+from agents.answer_engine import answer_engine
+from agents.fast_classifier import fast_classifier, EVAL_FILE
+
+
+def answer(query: str, context: str = ""):
+    return answer_engine.try_answer(query, fast_classifier.classify(query)[0], context)
+
+
+@pytest.mark.parametrize("query, matches", [
+    ("How many hospitals are in the Ashanti Region?", 53),
+    ("How many hospitals in Ashanti?", 53),
+    ("How many hospitals are in Volta?", 13),
+    ("List clinics in Greater Accra", 101),
+    ("How many dentists are in Greater Accra?", 11),
+    ("number of pharmacies in Ashanti", 1),
+])
+def test_counts_and_lists(query, matches):
+    result = answer(query)
+    assert result is not None
+    assert result["plan"]["matches"] == matches
+    assert f"**{matches}**" in result["answer"]
+
+
+def test_rank_regions():
+    result = answer("Which regions have the most hospitals?")
+    assert result["plan"]["operation"] == "rank_regions"
+    assert result["answer"].splitlines()[1] == "1. Greater Accra: 119"
+
+
+def test_compare_regions():
+    result = answer("Compare hospitals in Ashanti and Volta")
+    assert result["plan"]["operation"] == "compare_regions"
+    assert "Ashanti vs Volta" in result["answer"]
+
+
+def test_follow_up_swaps_type():
+    classification = {"category": "basic", "filters": {"region": "Ashanti", "facility_type": "clinic"}}
+    result = answer_engine.try_answer("And clinics?", classification, "How many hospitals in Ashanti?")
+    assert result["plan"]["matches"] == 23
+
+
+@pytest.mark.parametrize("query", [
+    # Thresholds, dates and quantities
+    "How many hospitals were established after 2000 in Ashanti?",
+    "How many hospitals in Ashanti have more than 10 doctors?",
+    "How many hospitals in Ashanti have over 100 beds?",
+    "What is the total capacity of hospitals in Ashanti?",
+    "How many hospitals in Greater Accra have greater than 5 doctors?",
+    # Several types or capabilities
+    "how many doctors work in ashanti hospitals",
+    "List hospitals in Ashanti offering surgery or cardiology",
+    "Which facilities in Volta offer emergency care and surgery?",
+    # Superlatives about facilities rather than a region ranking
+    "Which hospital in Accra has the most doctors?",
+    # Cities rather than regions
+    "How many hospitals are in Tamale?",
+    "How many hospitals in Kumasi offer surgery?",
+])
+def test_declines(query):
+    assert answer(query) is None
+
+
+def test_declines_eval_queries():
+    with open(EVAL_FILE) as f:
+        declines = json.load(f)["answer_engine_declines"]
+    assert [q for q in declines if answer(q) is not None] == []
+
+
+@pytest.mark.parametrize("filters, matches", [
+    ({"region": "Ashanti Region", "facility_type": "hospital"}, 53),
+    ({"region": "ashanti", "facility_type": "Hospital"}, 53),
+    ({"region": "Ashanti", "facility_type": "pharmacy"}, 1),
+])
+def test_llm_filters_are_canonicalised(filters, matches):
+    result = answer_engine.try_answer("How many are there?", {"category": "basic", "filters": filters})
+    assert result["plan"]["matches"] == matches
+
+
+@pytest.mark.parametrize("filters", [
+    {"region": "Kumasi", "facility_type": "hospital"},
+    {"region": "Ashanti", "capability": "telepathy"},
+    {"region": "Ashanti", "facility_type": "spaceport"},
+    {"region": "Ashanti", "district": "Kumasi Metropolitan"},
+])
+def test_unmappable_llm_filters_decline(filters):
+    assert answer_engine.try_answer("How many are there?", {"category": "basic", "filters": filters}) is None
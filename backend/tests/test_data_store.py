@@ -0,0 +1,102 @@
+import pytest
+
+from agents.answer_engine import answer_engine
+from models.facility import Facility
+from services.data_loader import CAPABILITY_CATEGORIES
+from services.map_index import map_index
+from services.referral_graph import referral_graph
+
+
+def ashanti_hospitals() -> int:
+    return int(answer_engine.mask("Ashanti", "hospital", None, None).sum())
+
+
+def new_facility(**overrides) -> Facility:
+    fields = {
+        "unique_id": "test-facility",
+        "name": "Test Surgical Hospital",
+        "facility_type": "hospital",
+        "address_city": "Kumasi",
+        "address_region": "Ashanti",
+        "normalized_region": "Ashanti",
+        "capabilities": ["General surgery", "24-hour emergency care"],
+        "lat": 6.69,
+        "lng": -1.62,
+    }
+    return Facility(**{**fields, **overrides})
+
+
+@pytest.fixture
+def events(restore_store):
+    seen = []
+    listener = lambda event, facility: seen.append((event, facility.unique_id))
+    restore_store.on_change(listener)
+    yield seen
+    restore_store._listeners.remove(listener)
+
+
+def test_upsert_inserts(restore_store, events):
+    store = restore_store
+    count, version, points = len(store.facilities), store.version, len(map_index.points)
+
+    facility = store.upsert_facility(new_facility())
+
+    assert len(store.facilities) == count + 1
+    assert store.facilities[store._facility_index["test-facility"]] is facility
+    assert store.capability_matrix.shape == (count + 1, len(CAPABILITY_CATEGORIES))
+    assert store.capability_matrix[-1, CAPABILITY_CATEGORIES.index("Surgery")]
+    assert store.version > version
+    assert events == [("upsert", "test-facility")]
+    # Listeners and version-keyed columns see the new facility
+    assert ashanti_hospitals() == 54
+    assert len(map_index.points) == points + 1
+    assert referral_graph.referrals("test-facility") is not None
+
+
+def test_upsert_replaces(restore_store, events):
+    store = restore_store
+    store.upsert_facility(new_facility())
+    count = len(store.facilities)
+
+    store.upsert_facility(new_facility(facility_type="clinic", capabilities=["surgery"]))
+
+    assert len(store.facilities) == count
+    assert ashanti_hospitals() == 53
+    replaced = store.facilities[store._facility_index["test-facility"]]
+    assert "Clinic claims surgical capabilities — verify" in replaced.anomalies
+    assert events == [("upsert", "test-facility"), ("upsert", "test-facility")]
+
+
+def test_remove(restore_store, events):
+    store = restore_store
+    removed_id = store.facilities[0].unique_id
+    count, version = len(store.facilities), store.version
+
+    removed = store.remove_facility(removed_id)
+
+    assert removed.unique_id == removed_id
+    assert len(store.facilities) == count - 1
+    assert removed_id not in store._facility_index
+    assert store.capability_matrix.shape[0] == count - 1
+    assert all(store.facilities[i].unique_id == uid for uid, i in store._facility_index.items())
+    assert store.version > version
+    assert events == [("remove", removed_id)]
+    assert referral_graph.referrals(removed_id) is None
+
+
+def test_remove_unknown(restore_store, events):
+    version = restore_store.version
+    assert restore_store.remove_facility("no-such-facility") is None
+    assert restore_store.version == version
+    assert events == []
+
+
+def test_upsert_invalidates_response_cache(client, restore_store):
+    params = {"group_by": "region", "filter": "facility_type:hospital"}
+    etag = client.get("/api/analysis/aggregate", params=params).headers["etag"]
+
+    restore_store.upsert_facility(new_facility())
+
+    response = client.get("/api/analysis/aggregate", params=params, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
@@ -0,0 +1,19 @@
+import pytest
+
+from agents.tool_agent import tool_agent, TOOLS, MAX_LIMIT
+
+
+@pytest.mark.parametrize("limit, returned", [(1000, MAX_LIMIT), (0, 1), (-5, 1), (3, 3)])
+def test_search_limit_is_clamped(limit, returned):
+    assert len(tool_agent._search_facilities(limit=limit)["facilities"]) == returned
+
+
+def test_anomaly_limit_is_clamped():
+    assert len(tool_agent._anomalies(limit=500)["facilities"]) == MAX_LIMIT
+
+
+def test_limit_schema_states_maximum():
+    limits = [t["function"]["parameters"]["properties"]["limit"] for t in TOOLS
+              if "limit" in t["function"]["parameters"]["properties"]]
+    assert len(limits) == 3
+    assert all(p["maximum"] == MAX_LIMIT and f"at most {MAX_LIMIT}" in p["description"] for p in limits)
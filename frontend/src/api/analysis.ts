@@ -1,10 +1,53 @@
 import api from "./axiosConfig";
 
+export interface ScenarioPayload {
+    name?: string;
+    add?: {
+        name?: string;
+        lat: number;
+        lng: number;
+        region?: string;
+        facility_type?: string;
+        capabilities: string[];
+    }[];
+    remove?: string[];
+    radius_km?: number;
+}
+
 export const analysisApi = {
-    medicalDeserts: () => api.get("/analysis/medical-deserts"),
+    medicalDeserts: (level: "country" | "region" | "district" = "region") =>
+        api.get("/analysis/medical-deserts", { params: { level } }),
     regionDesert: (region: string) => api.get(`/analysis/medical-deserts/${region}`),
     anomalies: () => api.get("/analysis/anomalies"),
     dataQuality: () => api.get("/analysis/data-quality"),
-    regionStats: () => api.get("/analysis/region-stats"),
+    dataProfile: () => api.get("/analysis/data-profile"),
+    compareDataProfiles: (base?: number, target?: number) =>
+        api.get("/analysis/data-profile/compare", { params: { base, target } }),
+    regionStats: (level: "country" | "region" | "district" = "region") =>
+        api.get("/analysis/region-stats", { params: { level } }),
     specialtyCoverage: () => api.get("/analysis/specialty-coverage"),
+    regionNetwork: () => api.get("/analysis/regions/network"),
+    nearestCapable: (region?: string, capability?: string) =>
+        api.get("/analysis/nearest-capable", { params: { region, capability } }),
+    specialtyMatrix: (level: "country" | "region" | "district" = "region") =>
+        api.get("/analysis/specialties/matrix", { params: { level } }),
+    specialtyCooccurrence: (specialty?: string, top = 20) =>
+        api.get("/analysis/specialties/cooccurrence", { params: { specialty, top } }),
+    specialtyGaps: (region: string) => api.get(`/analysis/specialties/gaps/${encodeURIComponent(region)}`),
+    aggregate: (groupBy: string[], filters: Record<string, string[]> = {}) => {
+        const params = new URLSearchParams({ group_by: groupBy.join(",") });
+        Object.entries(filters).forEach(([dim, values]) => params.append("filter", `${dim}:${values.join(",")}`));
+        return api.get(`/analysis/aggregate?${params.toString()}`);
+    },
+    siting: (payload: {
+        capability: string;
+        k?: number;
+        radius_km?: number;
+        candidates?: "towns" | "grid";
+        grid_step_deg?: number;
+        facility_type?: string;
+        create_plans?: boolean;
+    }) => api.post("/analysis/siting", payload),
+    scenario: (payload: ScenarioPayload) => api.post("/analysis/scenario", payload),
+    compareScenarios: (scenarios: ScenarioPayload[]) => api.post("/analysis/scenarios/compare", { scenarios }),
 };
@@ -1,8 +1,42 @@
 import api from "./axiosConfig";
 
+export type ChatStreamEvent =
+    | { type: "step"; data: Record<string, unknown> }
+    | { type: "token"; data: { text: string } }
+    | { type: "done"; data: Record<string, unknown> };
+
+// "pipeline" classifies, retrieves and generates; "tools" lets the model call data tools
+export type ChatMode = "pipeline" | "tools";
+
 export const chatApi = {
-    query: (message: string, conversationId?: string) =>
-        api.post("/chat/query", { message, conversationId }),
+    query: (message: string, conversationId?: string, mode?: ChatMode) =>
+        api.post("/chat/query", { message, conversationId, mode }),
+
+    // NDJSON stream: trace steps as they complete, answer tokens, then the full response
+    stream: async (
+        message: string,
+        onEvent: (event: ChatStreamEvent) => void,
+        conversationId?: string,
+        mode?: ChatMode,
+    ) => {
+        const response = await fetch(`${api.defaults.baseURL}/chat/stream?format=ndjson`, {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({ message, conversation_id: conversationId, mode }),
+        });
+        if (!response.ok || !response.body) throw new Error(`Chat stream failed: ${response.status}`);
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffered = "";
+        for (;;) {
+            const { done, value } = await reader.read();
+            if (done) break;
+            buffered += decoder.decode(value, { stream: true });
+            const lines = buffered.split("\n");
+            buffered = lines.pop() ?? "";
+            lines.filter(Boolean).forEach((line) => onEvent(JSON.parse(line)));
+        }
+    },
 
     suggestedQueries: () => api.get("/chat/suggested-queries"),
 };
@@ -19,5 +19,8 @@ export const facilitiesApi = {
 
     mapData: () => api.get("/facilities/all-map-data"),
 
+    mapViewport: (bbox: [number, number, number, number], zoom: number) =>
+        api.get("/facilities/map", { params: { bbox: bbox.join(","), zoom } }),
+
     regions: () => api.get("/facilities/regions"),
 };
@@ -122,6 +122,8 @@ export interface AgentStep {
   output_summary: string;
   data_sources: string[];
   duration_ms?: number;
+  started_ms?: number;
+  cached?: boolean;
 }
 
 export interface ChatMessage {
@@ -140,6 +142,7 @@ export interface ChatResponse {
   visualization_hint?: string;
   conversation_id: string;
   geospatial?: Record<string, unknown>;
+  cached?: boolean;
 }
 
 /* ── IDP ──────────────────────────────────────────────────────────────────── */